@@ -0,0 +1,225 @@
+import collections
+import hashlib
+import os
+import pathlib
+import threading
+import typing
+
+import graphql
+import strawberry
+import strawberry.extensions
+import strawberry.schema.schema
+import strawberry.types.execution
+
+
+PERSISTED_QUERY_NOT_FOUND = 'PersistedQueryNotFound'
+PERSISTED_QUERY_HASH_MISMATCH = 'provided sha does not match query'
+
+
+class Document(typing.NamedTuple):
+    document: graphql.DocumentNode
+    errors: typing.Optional[typing.Tuple[graphql.GraphQLError, ...]]
+
+
+class DocumentStore:
+    """
+    Thread-safe LRU cache of parsed and validated documents, keyed by the query text.
+
+    Persisted queries are pinned: they are never evicted and not counted towards the size of the LRU cache.
+    """
+
+    def __init__(self, maxsize: int = 256) -> None:
+        self.maxsize = maxsize
+        self._entries: collections.OrderedDict[str, Document] = collections.OrderedDict()
+        self._persisted: typing.Dict[str, str] = {}
+        self._pinned: typing.Dict[str, Document] = {}
+        self._lock = threading.Lock()
+        self._counters = collections.Counter()
+
+    def register(self, query: str, schema: strawberry.Schema) -> str:
+        """
+        Register a persisted query, it is parsed and validated right away so that an invalid document fails
+        at startup instead of being served without validation.
+
+        :param query:
+        :param schema: schema executing the query, its extensions provide the parse options and validation rules
+        :return: sha256 hash of the query, which clients send instead of the query
+        """
+        document = validate_query(query=query, schema=schema)
+        sha256_hash = hashlib.sha256(query.encode('utf-8')).hexdigest()
+        with self._lock:
+            self._persisted[sha256_hash] = query
+            self._pinned[query] = document
+        return sha256_hash
+
+    def register_directory(self, directory: typing.Union[str, os.PathLike],
+                           schema: strawberry.Schema) -> typing.Dict[str, str]:
+        """
+        Register all *.graphql files of the directory as persisted queries.
+
+        :param directory:
+        :param schema:
+        :return: mapping of the file names to the hashes
+        """
+        return {path.name: self.register(query=path.read_text(encoding='utf-8'), schema=schema)
+                for path in sorted(pathlib.Path(directory).glob('*.graphql'))}
+
+    def persisted_query(self, sha256_hash: str) -> typing.Optional[str]:
+        """
+
+        :param sha256_hash:
+        :return: the query registered for the hash, None if unknown
+        """
+        with self._lock:
+            query = self._persisted.get(sha256_hash)
+            self._counters['persisted_hits' if query is not None else 'persisted_misses'] += 1
+        return query
+
+    def get(self, query: str) -> typing.Optional[Document]:
+        """
+
+        :param query:
+        :return: the cached document, None on a miss
+        """
+        with self._lock:
+            entry = self._pinned.get(query)
+            if entry is None:
+                entry = self._entries.get(query)
+                if entry is not None:
+                    self._entries.move_to_end(query)
+            self._counters['hits' if entry is not None else 'misses'] += 1
+            return entry
+
+    def set(self, query: str, entry: Document) -> None:
+        """
+        Cache the document, evicting the least recently used ad-hoc document if the cache is full.
+
+        :param query:
+        :param entry:
+        :return:
+        """
+        with self._lock:
+            if query in self._pinned:
+                self._pinned[query] = entry
+                return
+            self._entries[query] = entry
+            self._entries.move_to_end(query)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def statistics(self) -> dict:
+        """
+
+        :return:
+        """
+        with self._lock:
+            hits, misses = self._counters['hits'], self._counters['misses']
+            return {'size': len(self._entries),
+                    'maxsize': self.maxsize,
+                    'persisted': len(self._persisted),
+                    'hits': hits,
+                    'misses': misses,
+                    'evictions': self._counters['evictions'],
+                    'hit_rate': hits / (hits + misses) if hits + misses else None,
+                    'persisted_hits': self._counters['persisted_hits'],
+                    'persisted_misses': self._counters['persisted_misses']}
+
+    def clear(self) -> None:
+        """
+        Drop the ad-hoc documents and reset the counters, the persisted queries are kept.
+
+        :return:
+        """
+        with self._lock:
+            self._entries.clear()
+            self._counters.clear()
+
+
+def validate_query(query: str, schema: strawberry.Schema) -> Document:
+    """
+    Parse and validate the query like an operation of the schema, i.e. with the parse options and validation rules,
+    which the extensions of the schema set up on operation.
+
+    :param query:
+    :param schema:
+    :return: the document without errors
+    :raises ValueError: if the query is invalid
+    """
+    execution_context = strawberry.types.execution.ExecutionContext(query=query, schema=schema,
+                                                                     allowed_operations=())
+    for extension in schema.extensions:
+        if not isinstance(extension, strawberry.extensions.SchemaExtension):
+            extension = extension()
+        extension.execution_context = execution_context
+        operation = extension.on_operation()
+        # the extensions set up the operation before their first yield
+        next(operation, None)
+        operation.close()
+    try:
+        document = graphql.parse(query, **execution_context.parse_options)
+    except graphql.GraphQLError as error:
+        raise ValueError(f'Invalid persisted query: {error.message}') from error
+    errors = strawberry.schema.schema.validate_document(schema._schema, document,
+                                                        execution_context.validation_rules)
+    if errors:
+        raise ValueError(f'Invalid persisted query: {"; ".join(error.message for error in errors)}')
+    return Document(document=document, errors=())
+
+
+class DocumentCache(strawberry.extensions.SchemaExtension):
+    """
+    Resolve persisted queries and skip parsing and validating documents, which have been seen before.
+
+    Persisted queries follow the automatic persisted queries protocol: the client sends
+    extensions.persistedQuery.sha256Hash and may omit the query. Unknown hashes are answered with
+    a PersistedQueryNotFound error, a query sent along with a hash must match the hash.
+
+    The validation result depends on the validation rules, which are the same for all operations of a schema,
+    so one store must not be shared by schemas with different extensions.
+    """
+
+    def __init__(self, *, store: DocumentStore) -> None:
+        self.store = store
+
+    def on_operation(self) -> typing.Iterator[None]:
+        persisted_query = (self.execution_context.operation_extensions or {}).get('persistedQuery')
+        if persisted_query:
+            sha256_hash = persisted_query.get('sha256Hash', '')
+            if self.execution_context.query:
+                if hashlib.sha256(self.execution_context.query.encode('utf-8')).hexdigest() != sha256_hash:
+                    raise graphql.GraphQLError(PERSISTED_QUERY_HASH_MISMATCH,
+                                               extensions={'code': 'PERSISTED_QUERY_HASH_MISMATCH'})
+            else:
+                query = self.store.persisted_query(sha256_hash=sha256_hash)
+                if query is None:
+                    raise graphql.GraphQLError(PERSISTED_QUERY_NOT_FOUND,
+                                               extensions={'code': 'PERSISTED_QUERY_NOT_FOUND'})
+                self.execution_context.query = query
+        yield
+
+    def on_parse(self) -> typing.Iterator[None]:
+        execution_context = self.execution_context
+        query = execution_context.query
+        if query and execution_context.graphql_document is None:
+            entry = self.store.get(query=query)
+            if entry is None:
+                entry = Document(document=graphql.parse(query, **execution_context.parse_options), errors=None)
+                self.store.set(query=query, entry=entry)
+            execution_context.graphql_document = entry.document
+            if entry.errors is not None:
+                execution_context.pre_execution_errors = list(entry.errors)
+        yield
+
+    def on_validate(self) -> typing.Iterator[None]:
+        execution_context = self.execution_context
+        query = execution_context.query
+        if query and execution_context.pre_execution_errors is None:
+            # strawberry adds its own rules to the validation rules of the extensions
+            errors = strawberry.schema.schema.validate_document(execution_context.schema._schema,
+                                                                execution_context.graphql_document,
+                                                                execution_context.validation_rules)
+            self.store.set(query=query, entry=Document(document=execution_context.graphql_document,
+                                                       errors=tuple(errors)))
+            execution_context.pre_execution_errors = errors
+        yield
@@ -1,10 +1,71 @@
+import asyncio
 import datetime
+import typing
 import uuid
 
+import sqlalchemy.ext.asyncio
 import strawberry
+import strawberry.dataloader
+import strawberry.fastapi
+import strawberry.types
 
 import backend.database.models
-import backend.database.queries_v2
+import backend.database.queries_async
+
+
+MAX_PAGE_SIZE = 100
+
+
+class Context(strawberry.fastapi.BaseContext):
+    """
+    Context of a GraphQL request, the database session and the data loaders are shared by all its resolvers.
+    """
+
+    def __init__(self, db: sqlalchemy.ext.asyncio.AsyncSession) -> None:
+        super().__init__()
+        self.db = db
+        self.caretime_loader = strawberry.dataloader.DataLoader(load_fn=self.load_caretimes)
+        self._lock = asyncio.Lock()
+
+    async def query(self, query_function: typing.Callable[..., typing.Awaitable[typing.Any]], **kwargs) -> typing.Any:
+        """
+        Run a query of queries_async on the session of the request.
+        Resolvers run concurrently, but an AsyncSession must not be used concurrently, so the queries are serialised.
+
+        :param query_function:
+        :param kwargs:
+        :return:
+        """
+        async with self._lock:
+            return await query_function(db=self.db, **kwargs)
+
+    async def load_caretimes(self, child_ids: typing.List[uuid.UUID]) -> typing.List[typing.List['Caretime']]:
+        """
+        Load the caretimes of all children requested in one tick of the event loop with a single query.
+
+        :param child_ids:
+        :return:
+        """
+        caretimes = {child_id: [] for child_id in child_ids}
+        result = await self.query(backend.database.queries_async.fetch_caretimes_of_children, child_ids=child_ids)
+        for caretime in result:
+            caretimes[caretime.child_id].append(Caretime.marshal(caretime))
+        return [caretimes[child_id] for child_id in child_ids]
+
+
+@strawberry.type
+class Caretime:
+    caretime_id: uuid.UUID
+    child_id: uuid.UUID
+    start_time: datetime.datetime
+    stop_time: typing.Optional[datetime.datetime]
+
+    @classmethod
+    def marshal(cls, model: backend.database.models.Caretime):
+        return Caretime(caretime_id=model.caretime_id,
+                        child_id=model.child_id,
+                        start_time=model.start_time,
+                        stop_time=model.stop_time)
 
 
 @strawberry.type
@@ -23,37 +84,38 @@ class Child:
                      birth_day=model.birth_day,
                      created_at=model.created_at)
 
+    @strawberry.field
+    async def caretimes(self, info: strawberry.types.Info[Context, None]) -> list[Caretime]:
+        return await info.context.caretime_loader.load(self.child_id)
+
 
 @strawberry.type
 class Query:
     @strawberry.field(name='children')
-    def fetch_children(self) -> list[Child]:
-        db_config = backend.database.queries_v2.get_database_config()
-        db = backend.database.queries_v2.create_session(db_config=db_config)
-        result = backend.database.queries_v2.fetch_children(db=db, limit=30)
+    async def fetch_children(self, info: strawberry.types.Info[Context, None],
+                             skip: int = 0, limit: int = 30) -> list[Child]:
+        if skip < 0 or not 0 < limit <= MAX_PAGE_SIZE:
+            raise ValueError(f'skip must not be negative and limit must be between 1 and {MAX_PAGE_SIZE}')
+        result = await info.context.query(backend.database.queries_async.fetch_children, skip=skip, limit=limit)
         return [Child.marshal(child) for child in result]
 
     @strawberry.field(name='child')
-    def fetch_child(self, child_id: uuid.UUID) -> Child:
-        db_config = backend.database.queries_v2.get_database_config()
-        db = backend.database.queries_v2.create_session(db_config=db_config)
-        result = backend.database.queries_v2.fetch_child(db=db, child_id=child_id)
-        return Child.marshal(result)
+    async def fetch_child(self, info: strawberry.types.Info[Context, None],
+                          child_id: uuid.UUID) -> typing.Optional[Child]:
+        result = await info.context.query(backend.database.queries_async.fetch_child, child_id=child_id)
+        return Child.marshal(result) if result else None
 
 
 @strawberry.type
 class Mutation:
     @strawberry.mutation
-    def create_child(self, name: str, sur_name: str, birth_day: datetime.date) -> uuid.UUID:
-        db_config = backend.database.queries_v2.get_database_config()
-        db = backend.database.queries_v2.create_session(db_config=db_config)
-
+    async def create_child(self, info: strawberry.types.Info[Context, None],
+                           name: str, sur_name: str, birth_day: datetime.date) -> uuid.UUID:
         child_id = uuid.uuid4()
         child_dict = dict()
         child_dict['child_id'] = child_id
         child_dict['name'] = name
         child_dict['sur_name'] = sur_name
         child_dict['birth_day'] = birth_day
-        _ = backend.database.queries_v2.create_child(db=db, child=child_dict)
-        db.close()
+        _ = await info.context.query(backend.database.queries_async.create_child, child=child_dict)
         return child_id
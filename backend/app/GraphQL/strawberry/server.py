@@ -1,22 +1,72 @@
+import functools
+import os
+import pathlib
 import typing
 
 import fastapi
+import strawberry.extensions
 import strawberry.fastapi
 import uvicorn
 
+import backend.app.GraphQL.strawberry.documents
 import backend.app.GraphQL.strawberry.schema
 import backend.app.REST.fastapi.server
+import backend.database.queries_async
+import backend.database.queries_v2
 
 
+MAX_QUERY_DEPTH = 6
+MAX_ALIASES = 15
+MAX_TOKENS = 1000
+PERSISTED_QUERIES = pathlib.Path(__file__).parent / 'persisted_queries'
+
+
+async def get_context() -> typing.AsyncIterator[backend.app.GraphQL.strawberry.schema.Context]:
+    """
+    Request-scoped context with one session of the pooled async engine, which is closed after the request.
+
+    :return:
+    """
+    db_config = backend.database.queries_v2.get_database_config()
+    db = backend.database.queries_async.create_session(db_config=db_config)
+    try:
+        yield backend.app.GraphQL.strawberry.schema.Context(db=db)
+    finally:
+        await db.close()
+
+
+document_store = backend.app.GraphQL.strawberry.documents.DocumentStore(
+    maxsize=int(os.environ.get('GRAPHQL_DOCUMENT_CACHE_SIZE', 256)))
+
 schema = strawberry.Schema(query=backend.app.GraphQL.strawberry.schema.Query,
-                           mutation=backend.app.GraphQL.strawberry.schema.Mutation)
-graphql_app = strawberry.fastapi.GraphQLRouter(schema)
+                           mutation=backend.app.GraphQL.strawberry.schema.Mutation,
+                           # factories, strawberry creates the extensions per request
+                           extensions=[functools.partial(strawberry.extensions.QueryDepthLimiter,
+                                                         max_depth=MAX_QUERY_DEPTH),
+                                       functools.partial(strawberry.extensions.MaxAliasesLimiter,
+                                                         max_alias_count=MAX_ALIASES),
+                                       functools.partial(strawberry.extensions.MaxTokensLimiter,
+                                                         max_token_count=MAX_TOKENS),
+                                       functools.partial(backend.app.GraphQL.strawberry.documents.DocumentCache,
+                                                         store=document_store)])
+document_store.register_directory(os.environ.get('GRAPHQL_PERSISTED_QUERIES', PERSISTED_QUERIES), schema=schema)
+graphql_app = strawberry.fastapi.GraphQLRouter(schema, context_getter=get_context)
 
 
 app = fastapi.FastAPI(root_path='/graphql/strawberry/v1')
 app.include_router(graphql_app, prefix='/graphql')
 
 
+@app.get('/statistics/documents')
+def fetch_document_statistics():
+    """
+    Hit rate of the cache of parsed and validated documents and of the persisted queries.
+
+    :return:
+    """
+    return document_store.statistics()
+
+
 @app.get('/is_alive')
 def is_alive():
     return {'message': 'Server is alive'}
@@ -0,0 +1,176 @@
+import asyncio
+import datetime
+import hashlib
+import unittest.mock
+import uuid
+
+import graphql
+import pytest
+import sqlalchemy.engine.result
+import strawberry.extensions
+import strawberry.schema.schema
+
+import backend.app.GraphQL.strawberry.documents
+import backend.app.GraphQL.strawberry.schema
+import backend.app.GraphQL.strawberry.server
+
+
+ChildRow = sqlalchemy.engine.result.result_tuple(['child_id', 'name', 'sur_name', 'birth_day', 'created_at'])
+CaretimeRow = sqlalchemy.engine.result.result_tuple(['caretime_id', 'child_id', 'start_time', 'stop_time'])
+
+
+@pytest.fixture
+def children():
+    return [ChildRow((uuid.uuid4(), f'name_{i}', f'sur_name_{i}', datetime.date(2020, 1, 1),
+                      datetime.datetime(2023, 1, 1))) for i in range(3)]
+
+
+def execute(query, children, caretime_queries, **kwargs):
+    running = []
+
+    async def fetch_children(db, skip, limit):
+        running.append(1)
+        assert len(running) == 1
+        await asyncio.sleep(0)
+        running.pop()
+        return children[skip:skip + limit]
+
+    async def fetch_caretimes_of_children(db, child_ids):
+        caretime_queries.append(list(child_ids))
+        return [CaretimeRow((uuid.uuid4(), child_id, datetime.datetime(2023, 1, 2, 7), None))
+                for child_id in child_ids]
+
+    context = backend.app.GraphQL.strawberry.schema.Context(db=unittest.mock.MagicMock())
+    with unittest.mock.patch('backend.database.queries_async.fetch_children', fetch_children), \
+            unittest.mock.patch('backend.database.queries_async.fetch_caretimes_of_children',
+                                fetch_caretimes_of_children):
+        return asyncio.run(backend.app.GraphQL.strawberry.server.schema.execute(query, context_value=context,
+                                                                                **kwargs))
+
+
+def test_caretimes_are_batched(children):
+    caretime_queries = []
+
+    result = execute('{ children { name caretimes { childId stopTime } } }', children=children,
+                     caretime_queries=caretime_queries)
+
+    assert result.errors is None
+    assert caretime_queries == [[child.child_id for child in children]]
+    assert [child['caretimes'][0]['childId'] for child in result.data['children']] == \
+           [str(child.child_id) for child in children]
+
+
+def test_query_aliases_are_limited(children):
+    max_aliases = backend.app.GraphQL.strawberry.server.MAX_ALIASES
+    aliases = ' '.join(f'alias_{i}: children {{ name }}' for i in range(max_aliases + 1))
+
+    result = execute(f'{{ {aliases} }}', children=children, caretime_queries=[])
+
+    assert result.errors
+    assert 'aliases' in result.errors[0].message
+
+
+def test_children_pagination(children):
+    result = execute('{ first: children(limit: 2) { name } second: children(skip: 2, limit: 2) { name } }',
+                     children=children, caretime_queries=[])
+
+    assert result.errors is None
+    assert [child['name'] for child in result.data['first']] == ['name_0', 'name_1']
+    assert [child['name'] for child in result.data['second']] == ['name_2']
+
+
+def test_children_limit_is_bounded(children):
+    result = execute('{ children(limit: 1000) { name } }', children=children, caretime_queries=[])
+
+    assert result.errors
+
+
+def test_persisted_query(children):
+    store = backend.app.GraphQL.strawberry.server.document_store
+    query = (backend.app.GraphQL.strawberry.server.PERSISTED_QUERIES / 'children.graphql').read_text()
+    persisted_query = {'persistedQuery': {'version': 1, 'sha256Hash': hashlib.sha256(query.encode()).hexdigest()}}
+    hits = store.statistics()['persisted_hits']
+
+    result = execute(None, children=children, caretime_queries=[], variable_values={'limit': 2},
+                     operation_extensions=persisted_query)
+
+    assert result.errors is None
+    assert [child['name'] for child in result.data['children']] == ['name_0', 'name_1']
+    assert store.statistics()['persisted_hits'] == hits + 1
+
+
+def test_persisted_query_not_found(children):
+    result = execute(None, children=children, caretime_queries=[],
+                     operation_extensions={'persistedQuery': {'version': 1, 'sha256Hash': 'unknown'}})
+
+    assert result.errors[0].message == backend.app.GraphQL.strawberry.documents.PERSISTED_QUERY_NOT_FOUND
+
+
+def test_persisted_query_must_match_hash(children):
+    query = '{ children { name } }'
+    persisted_query = {'persistedQuery': {'version': 1, 'sha256Hash': hashlib.sha256(query.encode()).hexdigest()}}
+
+    matching = execute(query, children=children, caretime_queries=[], operation_extensions=persisted_query)
+    mismatching = execute('{ children { surName } }', children=children, caretime_queries=[],
+                          operation_extensions=persisted_query)
+
+    assert matching.errors is None
+    assert mismatching.errors[0].message == backend.app.GraphQL.strawberry.documents.PERSISTED_QUERY_HASH_MISMATCH
+
+
+TOO_MANY_ALIASES = ' '.join(f'alias_{i}: children {{ name }}'
+                            for i in range(backend.app.GraphQL.strawberry.server.MAX_ALIASES + 1))
+
+
+@pytest.mark.parametrize('query', ['{ children { unknown } }', f'{{ {TOO_MANY_ALIASES} }}'])
+def test_invalid_persisted_query_is_rejected(query):
+    store = backend.app.GraphQL.strawberry.documents.DocumentStore()
+
+    with pytest.raises(ValueError):
+        store.register(query=query, schema=backend.app.GraphQL.strawberry.server.schema)
+    assert store.statistics()['persisted'] == 0
+
+
+def test_validation_errors_are_cached(children):
+    store = backend.app.GraphQL.strawberry.server.document_store
+    max_aliases = backend.app.GraphQL.strawberry.server.MAX_ALIASES
+    query = '{ ' + ' '.join(f'cached_{i}: children {{ name }}' for i in range(max_aliases + 1)) + ' }'
+    hits = store.statistics()['hits']
+
+    first = execute(query, children=children, caretime_queries=[])
+    second = execute(query, children=children, caretime_queries=[])
+
+    assert 'aliases' in first.errors[0].message
+    assert [error.message for error in second.errors] == [error.message for error in first.errors]
+    assert store.statistics()['hits'] == hits + 1
+
+
+def test_document_store_evicts_least_recently_used():
+    store = backend.app.GraphQL.strawberry.documents.DocumentStore(maxsize=2)
+    persisted = '{ children { name } }'
+    store.register(query=persisted, schema=backend.app.GraphQL.strawberry.server.schema)
+    for query in ['{ a }', '{ b }', '{ c }']:
+        store.set(query=query, entry=backend.app.GraphQL.strawberry.documents.Document(
+            document=graphql.parse(query), errors=()))
+
+    assert store.get(query='{ a }') is None
+    assert store.get(query='{ c }') is not None
+    assert store.get(query=persisted) is not None
+    assert store.statistics() | {'hit_rate': None} == {
+        'size': 2, 'maxsize': 2, 'persisted': 1, 'hits': 2, 'misses': 1, 'evictions': 1, 'hit_rate': None,
+        'persisted_hits': 0, 'persisted_misses': 0}
+
+
+def test_extensions_are_created_per_request():
+    extensions = backend.app.GraphQL.strawberry.server.schema.extensions
+
+    assert not any(isinstance(extension, strawberry.extensions.SchemaExtension) for extension in extensions)
+
+
+def test_cached_validation_uses_strawberry_rules(children):
+    with unittest.mock.patch('strawberry.schema.schema.validate_document',
+                             wraps=strawberry.schema.schema.validate_document) as validate_document:
+        result = execute('{ uncached: children { name } }', children=children, caretime_queries=[])
+
+    assert result.errors is None
+    validate_document.assert_called_once()
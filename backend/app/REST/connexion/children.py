@@ -2,6 +2,7 @@ import typing
 import uuid
 
 import connexion
+import flask
 
 import backend.app.REST.utils.json_handling
 import backend.database.queries
@@ -14,8 +15,9 @@ def fetch_children(recent: bool, limit: int):
     :return:
     """
     result = backend.database.queries.fetch_children(recent=recent, limit=limit)
-    result_ = backend.app.REST.utils.json_handling.serialize_result(result=result)
-    return result_, 200
+    return flask.Response(response=backend.app.REST.utils.json_handling.dumps_result(result=result),
+                          status=200,
+                          content_type='application/json')
 
 
 def create_child(child: typing.Dict):
@@ -39,8 +41,9 @@ def fetch_child(child_id: uuid.UUID):
     """
     result = backend.database.queries.fetch_child(child_id=child_id)
     if result:
-        result_ = backend.app.REST.utils.json_handling.serialize_result(result=result)
-        return result_
+        return flask.Response(response=backend.app.REST.utils.json_handling.dumps_result(result=result),
+                              status=200,
+                              content_type='application/json')
     return 'Not found', 404
 
 
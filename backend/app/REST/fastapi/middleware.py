@@ -1,35 +1,213 @@
 import asyncio
 import base64
+import collections
 import datetime
+import fnmatch
+import functools
+import hashlib
+import inspect
 import json
+import logging
+import random
+import re
+import time
 import typing
 import uuid
+import weakref
 
 import fastapi
 import httpx
 import starlette.authentication
 import starlette.types
 
+import backend.app.REST.utils.body_capture
+import backend.app.REST.utils.json_handling
+import backend.app.REST.utils.log_writer
+import backend.database.models
 import backend.database.queries_v2
 
 
-async def snatch_body(receive: starlette.types.Receive):
+logger = logging.getLogger(__name__)
+
+LOG_BODY_LIMIT = backend.database.models.Log.body.type.length
+
+
+class CloneTarget:
     """
-    Snatch the body of the request.
+    Server the requests are cloned to.
 
-    :param receive:
-    :return:
+    Only requests matching methods and the include patterns, but none of the exclude patterns (fnmatch-style,
+    matched against the path) are cloned. Of these, a share of sample_rate is cloned. The sampling is deterministic
+    by the hash of the x-request-id header (sample_by='request_id') or the user (sample_by='user'),
+    so the requests of a session are consistently cloned or not. Requests without that key are sampled randomly.
+    With compare=True, the responses of the target are compared with the responses of the primary server.
+    """
+
+    def __init__(self, url: str, timeout: float = 5.0, sample_rate: float = 1.0,
+                 methods: typing.Optional[typing.Iterable[str]] = None,
+                 include: typing.Optional[typing.Iterable[str]] = None,
+                 exclude: typing.Optional[typing.Iterable[str]] = None,
+                 sample_by: typing.Literal['request_id', 'user'] = 'request_id', compare: bool = False) -> None:
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError(f'sample_rate must be between 0 and 1, got {sample_rate}')
+        self.url = url
+        self.timeout = timeout
+        self.sample_rate = sample_rate
+        self.methods = {method.upper() for method in methods} if methods is not None else None
+        self.include = list(include) if include is not None else None
+        self.exclude = list(exclude or [])
+        self.sample_by = sample_by
+        self.compare = compare
+
+    def matches(self, method: str, path: str) -> bool:
+        """
+        Check, if the request is cloned to this target, regardless of the sampling.
+
+        :param method:
+        :param path:
+        :return:
+        """
+        if self.methods is not None and method.upper() not in self.methods:
+            return False
+        if self.include is not None and not any(fnmatch.fnmatchcase(path, pattern) for pattern in self.include):
+            return False
+        return not any(fnmatch.fnmatchcase(path, pattern) for pattern in self.exclude)
+
+    def sampled(self, scope: starlette.types.Scope) -> bool:
+        """
+        Check, if the request is in the sample of this target.
+
+        :param scope:
+        :return:
+        """
+        if self.sample_rate >= 1.0:
+            return True
+        if self.sample_rate <= 0.0:
+            return False
+        key = self.sample_key(scope=scope)
+        if key is None:
+            return random.random() < self.sample_rate
+        digest = hashlib.blake2b(key, digest_size=8, key=self.url.encode('utf-8')).digest()
+        return int.from_bytes(digest, 'big') < self.sample_rate * 2 ** 64
+
+    def sample_key(self, scope: starlette.types.Scope) -> typing.Optional[bytes]:
+        """
+
+        :param scope:
+        :return:
+        """
+        if self.sample_by == 'user':
+            user = scope.get('user')
+            if user is None or not user.is_authenticated:
+                return None
+            user_name = user.display_name
+            return user_name if isinstance(user_name, bytes) else user_name.encode('utf-8')
+        for name, value in scope['headers']:
+            if name == b'x-request-id':
+                return value
+        return None
+
+
+UUID_PATTERN = re.compile(r'[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}')
+
+
+class ComparisonReport:
+    """
+    Aggregated comparison of the responses of the primary server and of the clone targets,
+    per target, method and path (with the ids replaced by {id}).
     """
-    messages = []
-    more_body = True
-    while more_body:
-        message = await receive()
-        messages.append(message)
-        more_body = message.get('more_body', False)
 
-    body = b''.join([message.get('body', b'') for message in messages])
+    def __init__(self) -> None:
+        self._entries: typing.Dict[typing.Tuple[str, str, str], typing.Dict[str, typing.Any]] = dict()
 
-    return body, messages
+    def record(self, target: str, method: str, path: str, status_match: bool, body_match: typing.Optional[bool],
+               primary_latency: float, shadow_latency: float) -> None:
+        """
+
+        :param target:
+        :param method:
+        :param path:
+        :param status_match:
+        :param body_match: None, if the bodies were not compared
+        :param primary_latency: in seconds
+        :param shadow_latency: in seconds
+        :return:
+        """
+        key = (target, method, UUID_PATTERN.sub('{id}', path))
+        entry = self._entries.setdefault(key, {'count': 0, 'status_mismatches': 0, 'body_mismatches': 0,
+                                               'bodies_not_compared': 0, 'primary_latency': 0.0,
+                                               'shadow_latency': 0.0})
+        entry['count'] += 1
+        entry['status_mismatches'] += not status_match
+        entry['body_mismatches'] += body_match is False
+        entry['bodies_not_compared'] += body_match is None
+        entry['primary_latency'] += primary_latency
+        entry['shadow_latency'] += shadow_latency
+
+    def summary(self) -> typing.List[typing.Dict[str, typing.Any]]:
+        """
+        Mismatch counts and average latencies in milliseconds.
+
+        :return:
+        """
+        summary = []
+        for (target, method, path), entry in sorted(self._entries.items()):
+            primary_latency_ms = entry['primary_latency'] / entry['count'] * 1000
+            shadow_latency_ms = entry['shadow_latency'] / entry['count'] * 1000
+            summary.append({'target': target, 'method': method, 'path': path, 'count': entry['count'],
+                            'status_mismatches': entry['status_mismatches'],
+                            'body_mismatches': entry['body_mismatches'],
+                            'bodies_not_compared': entry['bodies_not_compared'],
+                            'primary_latency_ms': round(primary_latency_ms, 3),
+                            'shadow_latency_ms': round(shadow_latency_ms, 3),
+                            'latency_delta_ms': round(shadow_latency_ms - primary_latency_ms, 3)})
+        return summary
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class _PrimaryResponse:
+    """
+    Status, body (up to max_body bytes) and latency of the response of the primary server.
+    """
+
+    def __init__(self, max_body: int) -> None:
+        self.max_body = max_body
+        self.status: typing.Optional[int] = None
+        self.chunks: typing.List[bytes] = []
+        self.size = 0
+        self.truncated = False
+        self.latency: typing.Optional[float] = None
+        self._start = time.perf_counter()
+
+    def wrap(self, send: starlette.types.Send) -> starlette.types.Send:
+        async def send_wrapper(message: starlette.types.Message) -> None:
+            if message['type'] == 'http.response.start':
+                self.status = message['status']
+            elif message['type'] == 'http.response.body':
+                body = message.get('body', b'')
+                self.size += len(body)
+                if self.size <= self.max_body:
+                    self.chunks.append(body)
+                else:
+                    self.truncated = True
+                if not message.get('more_body', False):
+                    self.latency = time.perf_counter() - self._start
+            await send(message)
+
+        return send_wrapper
+
+
+class _LoopState:
+    """
+    Pooled client and in-flight clones of one event loop.
+    """
+
+    def __init__(self, limits: httpx.Limits) -> None:
+        self.client = httpx.AsyncClient(limits=limits)
+        self.in_flight: typing.Deque[asyncio.Task] = collections.deque()
+        self.comparisons: typing.Set[asyncio.Task] = set()
 
 
 class CloneRequestMiddleware:
@@ -37,39 +215,165 @@ class CloneRequestMiddleware:
     Middleware for cloning the request (sending them to another server)
     Implementation is following:
     https://github.com/encode/starlette/pull/1519#issuecomment-1060633787
+
+    The clones are sent by a long-lived pooled client, in the background of the request.
+    At most max_in_flight clones are pending, the oldest clone is dropped if a slow target holds up more.
+    For targets with compare=True, the primary response is captured (up to max_compare_body bytes of its body)
+    and compared with the response of the target in the background, the result is recorded in the report.
     """
 
-    def __init__(self, app: starlette.types.ASGIApp, servers: typing.List[str]) -> None:
+    def __init__(self, app: starlette.types.ASGIApp, servers: typing.List[typing.Union[str, CloneTarget]],
+                 max_connections: int = 20, max_keepalive_connections: int = 10, max_in_flight: int = 100,
+                 timeout: float = 5.0, report: typing.Optional[ComparisonReport] = None,
+                 max_compare_body: int = 1024 * 1024) -> None:
         self.app = app
-        self.servers = servers
+        self.targets = [server if isinstance(server, CloneTarget) else CloneTarget(url=server, timeout=timeout)
+                        for server in servers]
+        self.limits = httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_keepalive_connections)
+        self.max_in_flight = max_in_flight
+        self.sent = 0
+        self.dropped = 0
+        self.failed = 0
+        self.report = report if report is not None else ComparisonReport()
+        self.max_compare_body = max_compare_body
+        self._loop_states: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
 
     async def __call__(self, scope: starlette.types.Scope, receive: starlette.types.Receive,
                        send: starlette.types.Send) -> None:
+        if scope['type'] == 'lifespan':
+            async def lifespan_receive():
+                message = await receive()
+                if message['type'] == 'lifespan.shutdown':
+                    await self.aclose()
+                return message
+
+            return await self.app(scope, lifespan_receive, send)
         if scope['type'] != 'http':
             return await self.app(scope, receive, send)
 
+        targets = [target for target in self.targets
+                   if target.matches(method=scope['method'], path=scope['path']) and target.sampled(scope=scope)]
+        if not targets:
+            return await self.app(scope, receive, send)
+
         kw_args = {'method': scope['method'],
                    'params': scope['query_string'],
                    'headers': dict(scope['headers'])}
         if scope['method'] in ('POST', 'PUT', ):
-            body, messages = await snatch_body(receive=receive)
-            kw_args.update({'data': body})
-
-        for server in self.servers:
-            kw_args.update({'url': f'{server}{scope["path"]}'})
-            client = httpx.AsyncClient()
-            asyncio.ensure_future(client.request(**kw_args))
+            captured = await backend.app.REST.utils.body_capture.capture_body(scope=scope, receive=receive)
+            kw_args.update({'data': captured.body})
+            receive = captured.replay()
+
+        loop_state = self._get_loop_state()
+        clones = []
+        for target in targets:
+            clones.append((target, self._clone(loop_state=loop_state,
+                                               request=loop_state.client.request(url=f'{target.url}{scope["path"]}',
+                                                                                 timeout=target.timeout,
+                                                                                 **kw_args))))
+        primary = None
+        if any(target.compare for target in targets):
+            primary = _PrimaryResponse(max_body=self.max_compare_body)
+            send = primary.wrap(send)
+
+        await self.app(scope, receive, send)
+
+        if primary is not None and primary.latency is not None:
+            for target, clone in clones:
+                if target.compare:
+                    comparison = asyncio.ensure_future(self._compare(target=target, scope=scope, primary=primary,
+                                                                     clone=clone))
+                    loop_state.comparisons.add(comparison)
+                    comparison.add_done_callback(loop_state.comparisons.discard)
+
+    def statistics(self) -> typing.Dict[str, int]:
+        """
 
-        # Dispatch to the ASGI callable
-        async def wrapped_receive():
-            # First up we want to return any messages we've stashed.
-            if messages:
-                return messages.pop(0)
+        :return:
+        """
+        return {'sent': self.sent, 'dropped': self.dropped, 'failed': self.failed,
+                'in_flight': sum(len(loop_state.in_flight) for loop_state in self._loop_states.values())}
 
-            # Once that's done we can just await any other messages.
-            return await receive()
+    async def aclose(self) -> None:
+        """
+        Cancel the pending clones and close the client of the running event loop.
 
-        await self.app(scope, wrapped_receive, send)
+        :return:
+        """
+        loop_state = self._loop_states.pop(asyncio.get_running_loop(), None)
+        if loop_state is None:
+            return
+        for task in [*loop_state.in_flight, *loop_state.comparisons]:
+            task.cancel()
+        await loop_state.client.aclose()
+
+    def _get_loop_state(self) -> _LoopState:
+        loop = asyncio.get_running_loop()
+        loop_state = self._loop_states.get(loop)
+        if loop_state is None:
+            loop_state = self._loop_states[loop] = _LoopState(limits=self.limits)
+        return loop_state
+
+    def _clone(self, loop_state: _LoopState, request: typing.Awaitable[httpx.Response]) -> asyncio.Task:
+        while len(loop_state.in_flight) >= self.max_in_flight:
+            oldest = loop_state.in_flight.popleft()
+            if not oldest.done():
+                oldest.cancel()
+                self.dropped += 1
+
+        task = asyncio.ensure_future(self._send(request=request))
+        loop_state.in_flight.append(task)
+        task.add_done_callback(functools.partial(self._discard, loop_state.in_flight, request))
+        return task
+
+    async def _send(self, request: typing.Awaitable[httpx.Response]) \
+            -> typing.Optional[typing.Tuple[httpx.Response, float]]:
+        start = time.perf_counter()
+        try:
+            response = await request
+        except Exception as exc:
+            logger.debug('Cloning the request failed: %r', exc)
+            self.failed += 1
+            return None
+        self.sent += 1
+        return response, time.perf_counter() - start
+
+    async def _compare(self, target: CloneTarget, scope: starlette.types.Scope, primary: _PrimaryResponse,
+                       clone: asyncio.Task) -> None:
+        try:
+            result = await clone
+        except asyncio.CancelledError:
+            return
+        if result is None:
+            return
+        response, shadow_latency = result
+        body_match = None
+        if not primary.truncated:
+            body_match = self._bodies_match(b''.join(primary.chunks), response.content)
+        self.report.record(target=target.url, method=scope['method'], path=scope['path'],
+                           status_match=primary.status == response.status_code, body_match=body_match,
+                           primary_latency=primary.latency, shadow_latency=shadow_latency)
+
+    @staticmethod
+    def _bodies_match(primary_body: bytes, shadow_body: bytes) -> bool:
+        if primary_body == shadow_body:
+            return True
+        try:
+            return json.loads(primary_body) == json.loads(shadow_body)
+        except ValueError:
+            return False
+
+    @staticmethod
+    def _discard(in_flight: typing.Deque[asyncio.Task], request: typing.Awaitable[httpx.Response],
+                 task: asyncio.Task) -> None:
+        if task.cancelled() and inspect.iscoroutine(request):
+            # a clone dropped before it started was never awaited
+            request.close()
+        try:
+            in_flight.remove(task)
+        except ValueError:
+            pass
 
 
 class BasicAuthBackend(starlette.authentication.AuthenticationBackend):
@@ -143,38 +447,36 @@ async def authenticate_user(request: fastapi.Request, call_next: typing.Callable
 
 class DBLoggingMiddleware:
     """
-
+    Middleware for logging the requests and their responses to the database.
+    The log entries are handed to a write-behind LogWriter, so no database write happens on the request path.
+    Request bodies are logged up to the length of the body column.
     """
-    def __init__(self, app: starlette.types.ASGIApp) -> None:
+    def __init__(self, app: starlette.types.ASGIApp,
+                 log_writer: typing.Optional[backend.app.REST.utils.log_writer.LogWriter] = None) -> None:
         self.app = app
+        self.log_writer = log_writer or backend.app.REST.utils.log_writer.get_log_writer()
 
     async def __call__(self, scope: starlette.types.Scope,
                        receive: starlette.types.Receive,
                        send: starlette.types.Send) -> None:
         if scope['type'] == 'http':
-            db_config = backend.database.queries_v2.get_database_config()
-            db = backend.database.queries_v2.create_session(db_config=db_config)
             body = None
             if scope['method'] in ('POST', 'PUT',):
-                body, messages = await snatch_body(receive=receive)
+                captured = await backend.app.REST.utils.body_capture.capture_body(scope=scope, receive=receive)
+                body = captured.text(limit=LOG_BODY_LIMIT)
+                receive = captured.replay()
             request_id = uuid.uuid4()
+            user = scope.get('user')
             log_entry = {
                 'request_id': request_id,
-                'user_name': scope['user'].display_name.decode('utf-8'),
+                'user_name': user.display_name.decode('utf-8') if user else None,
                 'endpoint': f'{scope["root_path"]}{scope["path"]}',
                 'method': scope['method'],
                 'request_timestamp': datetime.datetime.now(),
-                'body': body.decode('utf-8') if body else None,
+                'body': body,
                 'query': scope['query_string'].decode('utf-8')
             }
-            backend.database.queries_v2.write_logging(db=db,
-                                                      log_entry=log_entry,
-                                                      insert=True)
-
-            async def wrapped_receive():
-                if messages:
-                    return messages.pop(0)
-                return await receive()
+            self.log_writer.submit(log_entry)
 
             async def send_wrapper(message: starlette.types.Message) -> None:
                 if not scope.get('state', None):
@@ -182,56 +484,86 @@ class DBLoggingMiddleware:
                 if message['type'] == 'http.response.start':
                     scope['state']['http.response.start'] = message
                 elif message['type'] == 'http.response.body':
-                    if scope['state'].get('http.response.body'):
-                        scope['state']['http.response.body'].append(message)
-                    else:
-                        scope['state']['http.response.body'] = [message]
                     if not message.get('more_body', None):
                         log_entry = {
                             'request_id': request_id,
                             'status_code': scope['state']['http.response.start']['status'],
                             'response_timestamp': datetime.datetime.now()}
-                        backend.database.queries_v2.write_logging(db=db,
-                                                                  log_entry=log_entry,
-                                                                  insert=False)
-                        db.close()
+                        self.log_writer.submit(log_entry)
                 await send(message)
 
-            await self.app(scope, wrapped_receive, send_wrapper)
+            await self.app(scope, receive, send_wrapper)
         else:
             await self.app(scope, receive, send)
 
 
+def truncate_fields(document: typing.Any, fields: typing.Dict[str, int]) -> bool:
+    """
+    Truncate the string values at the dotted paths of fields to their limits.
+    Lists on the path are traversed element-wise, e.g. 'children.name'.
+
+    :param document: parsed JSON
+    :param fields: dotted path -> limit
+    :return: True, if a value was truncated
+    """
+    truncated = False
+    for path, limit in fields.items():
+        *parents, key = path.split('.')
+        containers = [document]
+        for parent in parents:
+            containers = [child for container in containers for child in _children(container, parent)]
+        for container in containers:
+            for item in (container if isinstance(container, list) else [container]):
+                if isinstance(item, dict) and isinstance(value := item.get(key), str) and len(value) > limit:
+                    item[key] = value[:limit]
+                    truncated = True
+    return truncated
+
+
+def _children(container: typing.Any, key: str) -> typing.List[typing.Any]:
+    if isinstance(container, list):
+        return [child for item in container for child in _children(item, key)]
+    if isinstance(container, dict) and key in container:
+        return [container[key]]
+    return []
+
+
 class TruncateMiddleware:
     """
-    Middleware for truncating a long param to a limit
+    Middleware for truncating long params to a limit
+
+    The fields are given as dotted paths with their limits, e.g. {'long_txt': 10, 'child.name': 20},
+    long_param and limit add a single field. The assembled body is parsed only if it is JSON
+    and contains the key of a field, the content-length header is updated to the truncated body.
     """
     def __init__(self, app: starlette.types.ASGIApp,
-                 long_param: str,
-                 limit: int) -> None:
+                 long_param: typing.Optional[str] = None,
+                 limit: typing.Optional[int] = None,
+                 fields: typing.Optional[typing.Dict[str, int]] = None) -> None:
         self.app = app
-        self.long_param = long_param
-        self.limit = limit
+        self.fields = dict(fields or {})
+        if long_param is not None:
+            if limit is None:
+                raise ValueError('limit must be given with long_param')
+            self.fields[long_param] = limit
+        self._keys = {f'"{path.rsplit(".", 1)[-1]}"'.encode('utf-8') for path in self.fields}
 
     async def __call__(self, scope: starlette.types.Scope,
                        receive: starlette.types.Receive,
                        send: starlette.types.Send) -> None:
         if scope['type'] == 'http':
             if scope['method'] in ('POST', 'PUT',):
-                body, messages = await snatch_body(receive=receive)
-                trunc_messages = []
-                for m in messages:
-                    bd = eval(m['body'])
-                    if long_param := bd.get(self.long_param):
-                        bd[self.long_param] = long_param[:self.limit]
-                        m.update({'body': json.dumps(bd).encode('utf-8')})
-                    trunc_messages.append(m)
-
-            async def wrapped_receive():
-                if trunc_messages:
-                    return trunc_messages.pop(0)
-                return await receive()
-
-            await self.app(scope, wrapped_receive, send)
+                captured = await backend.app.REST.utils.body_capture.capture_body(scope=scope, receive=receive)
+                body = captured.body
+                if any(key in body for key in self._keys):
+                    try:
+                        document = backend.app.REST.utils.json_handling.loads(body)
+                    except ValueError:
+                        document = None
+                    if document is not None and truncate_fields(document=document, fields=self.fields):
+                        captured.replace(backend.app.REST.utils.json_handling.dumps(document), scope=scope)
+                receive = captured.replay()
+
+            await self.app(scope, receive, send)
         else:
             await self.app(scope, receive, send)
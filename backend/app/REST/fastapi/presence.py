@@ -0,0 +1,202 @@
+import asyncio
+import contextlib
+import datetime
+import logging
+import os
+import typing
+import uuid
+
+import dotenv
+
+import backend.app.REST.utils.json_handling
+import backend.database.queries_async
+import backend.database.queries_v2
+
+
+logger = logging.getLogger(__name__)
+
+KEEP_ALIVE = b': keep-alive\n\n'
+
+
+class PresenceBoard:
+    """
+    In-memory board of the children in the building, i.e. with an open caretime.
+
+    The board is updated by the check-in and check-out endpoints of this process and resynchronised
+    with the database periodically, which picks up the changes by other processes and by the generic caretime
+    endpoints. Every change is published to the subscribers of the feed. Subscribers, which cannot keep up,
+    lose their pending events and receive a snapshot instead.
+    """
+
+    def __init__(self, resync_interval: float = 30.0, max_pending: int = 100) -> None:
+        self.resync_interval = resync_interval
+        self.max_pending = max_pending
+        self._present: typing.Dict[uuid.UUID, dict] = {}
+        self.changes = 0
+        self._subscribers: typing.Set[asyncio.Queue] = set()
+        self._resync_requested: typing.Optional[asyncio.Event] = None
+        self._task: typing.Optional[asyncio.Task] = None
+
+    def snapshot(self) -> typing.List[dict]:
+        """
+
+        :return: the children present, ordered by the time they were checked in
+        """
+        return sorted(self._present.values(), key=lambda entry: (entry['checked_in_at'], str(entry['child_id'])))
+
+    def check_in(self, child_id: uuid.UUID, caretime_id: uuid.UUID, checked_in_at: datetime.datetime) -> None:
+        """
+
+        :param child_id:
+        :param caretime_id:
+        :param checked_in_at:
+        :return:
+        """
+        entry = {'child_id': child_id, 'caretime_id': caretime_id, 'checked_in_at': checked_in_at}
+        if self._present.get(child_id) != entry:
+            self._present[child_id] = entry
+            self.changes += 1
+            self._publish(event='check_in', data=entry)
+
+    def check_out(self, child_id: uuid.UUID) -> None:
+        """
+
+        :param child_id:
+        :return:
+        """
+        entry = self._present.pop(child_id, None)
+        if entry is not None:
+            self.changes += 1
+            self._publish(event='check_out', data=entry)
+
+    def resync(self, rows: typing.Iterable[typing.Any], changes: typing.Optional[int] = None) -> bool:
+        """
+        Replace the board by the open caretimes of the database, the differences are published as events.
+
+        :param rows: child_id, caretime_id and checked_in_at of the open caretimes
+        :param changes: changes of the board before the rows were queried, the rows are outdated,
+            if the board has been changed meanwhile
+        :return: False, if the rows were outdated
+        """
+        if changes is not None and changes != self.changes:
+            return False
+        present = {row.child_id: {'child_id': row.child_id, 'caretime_id': row.caretime_id,
+                                  'checked_in_at': row.checked_in_at} for row in rows}
+        for child_id in [child_id for child_id in self._present if child_id not in present]:
+            self.check_out(child_id=child_id)
+        for entry in present.values():
+            self.check_in(**entry)
+        return True
+
+    def request_resync(self) -> None:
+        """
+        Resynchronise soon, after caretimes were changed by other endpoints than check-in and check-out.
+
+        :return:
+        """
+        if self._resync_requested is not None:
+            self._resync_requested.set()
+
+    def _publish(self, event: str, data: typing.Any) -> None:
+        for subscriber in self._subscribers:
+            if subscriber.full():
+                while not subscriber.empty():
+                    subscriber.get_nowait()
+                subscriber.put_nowait(('snapshot', self.snapshot()))
+            else:
+                subscriber.put_nowait((event, data))
+
+    async def subscribe(self, keep_alive: float = 15.0) -> typing.AsyncIterator[bytes]:
+        """
+        Server-sent events: a snapshot of the board, then the check-ins and check-outs.
+
+        :param keep_alive: seconds after which a comment is sent, if nothing happened
+        :return:
+        """
+        subscriber: asyncio.Queue = asyncio.Queue(maxsize=self.max_pending)
+        self._subscribers.add(subscriber)
+        try:
+            yield format_event(event='snapshot', data=self.snapshot())
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(subscriber.get(), timeout=keep_alive)
+                except asyncio.TimeoutError:
+                    yield KEEP_ALIVE
+                    continue
+                yield format_event(event=event, data=data)
+        finally:
+            self._subscribers.discard(subscriber)
+
+    async def run(self, db_config: dict[str, str]) -> None:
+        """
+        Resynchronise with the database every resync_interval seconds or when requested.
+
+        :param db_config:
+        :return:
+        """
+        self._resync_requested = asyncio.Event()
+        while True:
+            try:
+                changes = self.changes
+                db = backend.database.queries_async.create_session(db_config=db_config)
+                try:
+                    rows = await backend.database.queries_async.fetch_checked_in_children(db=db)
+                finally:
+                    await db.close()
+                # outdated rows are dropped, the next resync catches up
+                self.resync(rows=rows, changes=changes)
+            except Exception:
+                logger.exception('Resync of the presence board failed')
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._resync_requested.wait(), timeout=self.resync_interval)
+            self._resync_requested.clear()
+
+    async def start(self) -> None:
+        """
+        Start the resynchronisation, on startup of the app.
+
+        :return:
+        """
+        if self._task is None:
+            db_config = backend.database.queries_v2.get_database_config()
+            self._task = asyncio.create_task(self.run(db_config=db_config))
+
+    async def stop(self) -> None:
+        """
+        Stop the resynchronisation, on shutdown of the app.
+
+        :return:
+        """
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+            self._resync_requested = None
+
+
+def format_event(event: str, data: typing.Any) -> bytes:
+    """
+
+    :param event:
+    :param data:
+    :return: the server-sent event
+    """
+    return b'event: ' + event.encode('utf-8') + b'\ndata: ' + \
+        backend.app.REST.utils.json_handling.dumps(data) + b'\n\n'
+
+
+_presence_board: typing.Optional[PresenceBoard] = None
+
+
+def get_presence_board() -> PresenceBoard:
+    """
+    Return the process-wide presence board, configured from the environment.
+
+    :return:
+    """
+    global _presence_board
+    if _presence_board is None:
+        dotenv.load_dotenv()
+        _presence_board = PresenceBoard(resync_interval=float(os.environ.get('PRESENCE_RESYNC_SECONDS', 30)))
+    return _presence_board
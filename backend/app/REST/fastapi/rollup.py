@@ -0,0 +1,82 @@
+import asyncio
+import contextlib
+import logging
+import os
+import typing
+
+import dotenv
+
+import backend.database.queries_async
+import backend.database.queries_v2
+
+
+logger = logging.getLogger(__name__)
+
+
+class CareDaysRefresher:
+    """
+    Background job bringing the care_days rollup up to date every refresh_interval seconds,
+    so that the summary endpoints only read and lag behind the caretimes by at most refresh_interval.
+    """
+
+    def __init__(self, refresh_interval: float = 60.0) -> None:
+        self.refresh_interval = refresh_interval
+        self._task: typing.Optional[asyncio.Task] = None
+
+    async def run(self, db_config: dict[str, str]) -> None:
+        """
+        Refresh the rollup every refresh_interval seconds.
+
+        :param db_config:
+        :return:
+        """
+        while True:
+            try:
+                db = backend.database.queries_async.create_session(db_config=db_config)
+                try:
+                    # skipped, if another process refreshes right now
+                    await backend.database.queries_async.refresh_care_days(db=db)
+                finally:
+                    await db.close()
+            except Exception:
+                logger.exception('Refresh of the care days failed')
+            await asyncio.sleep(self.refresh_interval)
+
+    async def start(self) -> None:
+        """
+        Start the refreshes, on startup of the app.
+
+        :return:
+        """
+        if self._task is None:
+            db_config = backend.database.queries_v2.get_database_config()
+            self._task = asyncio.create_task(self.run(db_config=db_config))
+
+    async def stop(self) -> None:
+        """
+        Stop the refreshes, on shutdown of the app.
+
+        :return:
+        """
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+
+_care_days_refresher: typing.Optional[CareDaysRefresher] = None
+
+
+def get_care_days_refresher() -> CareDaysRefresher:
+    """
+    Return the process-wide refresher of the rollup, configured from the environment.
+
+    :return:
+    """
+    global _care_days_refresher
+    if _care_days_refresher is None:
+        dotenv.load_dotenv()
+        _care_days_refresher = CareDaysRefresher(
+            refresh_interval=float(os.environ.get('CARE_DAYS_REFRESH_SECONDS', 60)))
+    return _care_days_refresher
@@ -1,4 +1,6 @@
 import base64
+import datetime
+import json
 import typing
 import uuid
 
@@ -8,30 +10,82 @@ import fastapi.exceptions
 import fastapi.requests
 import fastapi.responses
 import fastapi.security
-import sqlalchemy.orm
+import pydantic
+import sqlalchemy.ext.asyncio
 import starlette.authentication
 import starlette.middleware.authentication
 import starlette.types
 import uvicorn
 
 import backend.app.REST.fastapi.middleware
+import backend.app.REST.fastapi.presence
+import backend.app.REST.fastapi.rollup
+import backend.app.REST.utils.etag
+import backend.app.REST.utils.export
+import backend.app.REST.utils.json_handling
+import backend.app.REST.utils.log_writer
+import backend.app.REST.utils.pagination
+import backend.database.models
+import backend.database.occupancy
 import backend.database.queries
+import backend.database.queries_async
 import backend.database.queries_v2
+import backend.database.reporting
 import backend.database.schemas
 import backend.database.usermanagement
 
 
-def get_db():
+async def get_db():
     """
 
     :return:
     """
     db_config = backend.database.queries_v2.get_database_config()
-    db = backend.database.queries_v2.create_session(db_config=db_config)
+    db = backend.database.queries_async.create_session(db_config=db_config)
     try:
         yield db
     finally:
-        db.close()
+        await db.close()
+
+
+def decode_cursor(cursor: typing.Optional[str],
+                  parse_sort_value: typing.Callable[[str], typing.Any] = datetime.datetime.fromisoformat) \
+        -> typing.Optional[typing.Tuple[typing.Any, uuid.UUID]]:
+    """
+
+    :param cursor:
+    :param parse_sort_value: parser restoring the sort value of the cursor
+    :return:
+    """
+    if cursor is None:
+        return None
+    try:
+        return backend.app.REST.utils.pagination.decode_cursor(cursor=cursor, parse_sort_value=parse_sort_value)
+    except ValueError:
+        raise fastapi.HTTPException(status_code=fastapi.status.HTTP_400_BAD_REQUEST, detail='Invalid cursor')
+
+
+def not_modified(request: fastapi.Request, response: fastapi.Response, rows: typing.List[typing.Any],
+                 id_column: str, cache_control: str = backend.app.REST.utils.etag.CACHE_CONTROL,
+                 ) -> typing.Optional[fastapi.Response]:
+    """
+    Set the ETag and Cache-Control headers of the response to the rows.
+
+    :param request:
+    :param response:
+    :param rows:
+    :param id_column:
+    :param cache_control: PRIVATE_CACHE_CONTROL, if the rows depend on the authenticated user
+    :return: 304 response, if the client already has the current version, else None
+    """
+    etag = backend.app.REST.utils.etag.compute_etag(rows=rows, id_column=id_column)
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = cache_control
+    if backend.app.REST.utils.etag.etag_matches(if_none_match=request.headers.get('if-none-match'), etag=etag):
+        return fastapi.Response(status_code=fastapi.status.HTTP_304_NOT_MODIFIED,
+                                headers={key: value for key, value in response.headers.items()
+                                         if key != 'content-length'})
+    return None
 
 
 async def forbidden(request: fastapi.Request, exc: fastapi.HTTPException):
@@ -66,14 +120,33 @@ exception_handlers = {
     fastapi.exceptions.RequestValidationError: request_validation_error,
 }
 
-Session = typing.Annotated[sqlalchemy.orm.Session, fastapi.Depends(get_db)]
+Session = typing.Annotated[sqlalchemy.ext.asyncio.AsyncSession, fastapi.Depends(get_db)]
+GRANULARITY_REGEX = f'^({"|".join(backend.database.reporting.GRANULARITIES)})$'
+CHILDREN_SORT_REGEX = f'^-?({"|".join(backend.database.queries_v2.CHILDREN_SORT_COLUMNS)})$'
+CHILDREN_CURSOR_PARSERS = {'created_at': datetime.datetime.fromisoformat,
+                           'name': str,
+                           'sur_name': str,
+                           'birth_day': datetime.date.fromisoformat}
+
+presence_board = backend.app.REST.fastapi.presence.get_presence_board()
+care_days_refresher = backend.app.REST.fastapi.rollup.get_care_days_refresher()
 
 app = fastapi.FastAPI(root_path='/rest/fastapi/v1',
-                      exception_handlers=exception_handlers)
+                      exception_handlers=exception_handlers,
+                      on_startup=[presence_board.start, care_days_refresher.start],
+                      on_shutdown=[backend.app.REST.utils.log_writer.get_log_writer().close, presence_board.stop,
+                                   care_days_refresher.stop])
 
 
+clone_report = backend.app.REST.fastapi.middleware.ComparisonReport()
+
 app.add_middleware(backend.app.REST.fastapi.middleware.CloneRequestMiddleware,
-                   servers=['http://localhost:8000/rest/flask/v2', ])
+                   servers=[backend.app.REST.fastapi.middleware.CloneTarget(url='http://localhost:8000/rest/flask/v2',
+                                                                            exclude=['/is_alive', '/presence*',
+                                                                                     '/children/*/check_in',
+                                                                                     '/children/*/check_out'],
+                                                                            compare=True), ],
+                   report=clone_report)
 
 app.add_middleware(backend.app.REST.fastapi.middleware.DBLoggingMiddleware)
 
@@ -92,15 +165,52 @@ app.add_middleware(starlette.middleware.authentication.AuthenticationMiddleware,
          })
 @starlette.authentication.requires(['admin'])
 async def fetch_children(request: fastapi.Request,
+                         response: fastapi.Response,
                          db: Session,
                          recent: bool = False, skip: int = 0, limit: int = 10,
+                         cursor: typing.Optional[str] = None,
+                         recent_days: int = fastapi.Query(backend.database.queries_v2.RECENT_DAYS, gt=0),
+                         name: typing.Optional[str] = fastapi.Query(None, max_length=20),
+                         sur_name: typing.Optional[str] = fastapi.Query(None, max_length=20),
+                         birth_day_from: typing.Optional[datetime.date] = None,
+                         birth_day_to: typing.Optional[datetime.date] = None,
+                         sort: str = fastapi.Query('created_at', regex=CHILDREN_SORT_REGEX),
                          ) -> list[backend.database.schemas.Child]:
     """
+    Children filtered by the start of name and sur_name (case-insensitive), the birth_day range and,
+    if recent, by creation within the last recent_days days. sort is one of the sortable columns,
+    with a leading - for descending order.
+    A full page carries the cursor of the next page in the X-Next-Cursor header.
+    The ETag of the page is derived from the ids and modification times of its rows.
+
+    :return:
+    """
+    descending = sort.startswith('-')
+    sort = sort.lstrip('-')
+    after = decode_cursor(cursor=cursor, parse_sort_value=CHILDREN_CURSOR_PARSERS[sort])
+    result = await backend.database.queries_async.fetch_children(db=db, recent=recent, skip=skip, limit=limit,
+                                                                 after=after, recent_days=recent_days,
+                                                                 name_prefix=name, sur_name_prefix=sur_name,
+                                                                 birth_day_from=birth_day_from,
+                                                                 birth_day_to=birth_day_to,
+                                                                 sort=sort, descending=descending)
+    if result and len(result) == limit:
+        response.headers[backend.app.REST.utils.pagination.NEXT_CURSOR_HEADER] = \
+            backend.app.REST.utils.pagination.encode_cursor(getattr(result[-1], sort), result[-1].child_id)
+    return not_modified(request=request, response=response, rows=result, id_column='child_id') or result
+
+
+@app.get('/children/checked_in', response_model=typing.List[backend.database.schemas.CheckedInChild])
+@starlette.authentication.requires(['admin'])
+async def fetch_checked_in_children(request: fastapi.Request,
+                                    db: Session,
+                                    ):
+    """
+    Children with an open caretime, ordered by the time they were checked in.
 
     :return:
     """
-    result = backend.database.queries_v2.fetch_children(db=db, recent=recent, skip=skip, limit=limit)
-    return result
+    return await backend.database.queries_async.fetch_checked_in_children(db=db)
 
 
 @app.get('/children/{child_id}',
@@ -116,6 +226,7 @@ async def fetch_children(request: fastapi.Request,
          })
 @starlette.authentication.requires(['admin'])
 async def fetch_child(request: fastapi.Request,
+                      response: fastapi.Response,
                       db: Session,
                       child_id: uuid.UUID = fastapi.Path(..., title='ID of the child to get'),
                       ) -> typing.Any:
@@ -123,9 +234,9 @@ async def fetch_child(request: fastapi.Request,
 
     :return:
     """
-    result = backend.database.queries_v2.fetch_child(db=db, child_id=child_id)
+    result = await backend.database.queries_async.fetch_child(db=db, child_id=child_id)
     if result:
-        return result
+        return not_modified(request=request, response=response, rows=[result], id_column='child_id') or result
     raise fastapi.HTTPException(status_code=404)
 
 
@@ -148,7 +259,7 @@ async def fetch_one_child(request: fastapi.Request, db: Session,
 
     :return:
     """
-    result = backend.database.queries_v2.fetch_child(db=db, child_id=body['child_id'])
+    result = await backend.database.queries_async.fetch_child(db=db, child_id=body['child_id'])
     if result:
         return result
     raise fastapi.HTTPException(status_code=404)
@@ -172,7 +283,7 @@ async def create_child(request: fastapi.Request,
     child_id = uuid.uuid4()
     child_dict = child.dict()
     child_dict['child_id'] = child_id
-    _ = backend.database.queries_v2.create_child(db=db, child=child_dict)
+    _ = await backend.database.queries_async.create_child(db=db, child=child_dict)
     return {'child_id': child_id}
 
 
@@ -187,11 +298,11 @@ async def update_child(request: fastapi.Request,
 
     :return:
     """
-    child = backend.database.queries_v2.fetch_child(db=db, child_id=child_id)
-    if not child:
-        raise fastapi.HTTPException(status_code=404)
     updates_dict = {key: values for key, values in updates_for_child.dict().items() if values is not None}
-    _ = backend.database.queries_v2.update_child(db=db, child_id=child_id, updates_for_child=updates_dict)
+    updated_child_id = await backend.database.queries_async.update_child(db=db, child_id=child_id,
+                                                                         updates_for_child=updates_dict)
+    if not updated_child_id:
+        raise fastapi.HTTPException(status_code=404)
     return
 
 
@@ -205,32 +316,61 @@ async def delete_child(request: fastapi.Request,
 
     :return:
     """
-    child = backend.database.queries_v2.fetch_child(db=db, child_id=child_id)
-    if not child:
+    deleted_child_id = await backend.database.queries_async.delete_child(db=db, child_id=child_id)
+    if not deleted_child_id:
         raise fastapi.HTTPException(status_code=404)
-    backend.database.queries_v2.delete_child(db=db, child_id=child_id)
+    presence_board.check_out(child_id=child_id)
     return
 
 
 @app.get('/children/{child_id}/caretimes', response_model=typing.List[backend.database.schemas.Caretime])
 @starlette.authentication.requires(['admin'])
 async def fetch_caretimes(request: fastapi.Request,
+                          response: fastapi.Response,
                           db: Session,
                           child_id: uuid.UUID,
                           skip: int = 0,
                           limit: int = 10,
+                          cursor: typing.Optional[str] = None,
                           ):
     """
+    A full page carries the cursor of the next page in the X-Next-Cursor header.
+    The ETag of the page is derived from the ids and modification times of its rows.
+
+    :return:
+    """
+    after = decode_cursor(cursor=cursor)
+    result = await backend.database.queries_async.fetch_caretimes(db=db, child_id=child_id, skip=skip, limit=limit,
+                                                                  after=after)
+    if result and len(result) == limit:
+        response.headers[backend.app.REST.utils.pagination.NEXT_CURSOR_HEADER] = \
+            backend.app.REST.utils.pagination.encode_cursor(result[-1].start_time, result[-1].caretime_id)
+    return not_modified(request=request, response=response, rows=result, id_column='caretime_id') or result
+
+
+@app.get('/children/{child_id}/caretimes/summary', response_model=typing.List[backend.database.schemas.CareSummary])
+@starlette.authentication.requires(['admin'])
+async def fetch_caretimes_summary(request: fastapi.Request,
+                                  db: Session,
+                                  child_id: uuid.UUID,
+                                  granularity: str = fastapi.Query('month', regex=GRANULARITY_REGEX),
+                                  start: typing.Optional[datetime.date] = None,
+                                  end: typing.Optional[datetime.date] = None,
+                                  ):
+    """
+    Care hours of the child per day, week or month from start (included) to end (excluded),
+    read from the rollup, which is refreshed in the background.
 
     :return:
     """
-    result = backend.database.queries_v2.fetch_caretimes(db=db, child_id=child_id, skip=skip, limit=limit)
-    return result
+    return await backend.database.queries_async.fetch_care_summary(db=db, granularity=granularity, child_id=child_id,
+                                                                   start=start, end=end)
 
 
 @app.get('/children/{child_id}/caretimes/{caretime_id}', response_model=backend.database.schemas.Caretime)
 @starlette.authentication.requires(['admin'])
 async def fetch_single_caretime(request: fastapi.Request,
+                                response: fastapi.Response,
                                 child_id: uuid.UUID,
                                 caretime_id: uuid.UUID,
                                 db: Session,
@@ -239,9 +379,10 @@ async def fetch_single_caretime(request: fastapi.Request,
 
     :return:
     """
-    result = backend.database.queries_v2.fetch_single_caretime(db=db, child_id=child_id, caretime_id=caretime_id)
+    result = await backend.database.queries_async.fetch_single_caretime(db=db, child_id=child_id,
+                                                                        caretime_id=caretime_id)
     if result:
-        return result
+        return not_modified(request=request, response=response, rows=[result], id_column='caretime_id') or result
     raise fastapi.HTTPException(status_code=404)
 
 
@@ -249,14 +390,14 @@ async def fetch_single_caretime(request: fastapi.Request,
 @starlette.authentication.requires(['admin'])
 async def add_caretime(request: fastapi.Request,
                        child_id: uuid.UUID,
-                       time_interval: backend.database.schemas.CaretimeBase,
+                       time_interval: backend.database.schemas.CaretimeCreate,
                        db: Session,
                        ):
     """
 
     :return:
     """
-    child = backend.database.queries_v2.fetch_child(db=db, child_id=child_id)
+    child = await backend.database.queries_async.fetch_child(db=db, child_id=child_id)
     if not child:
         raise fastapi.HTTPException(status_code=404)
 
@@ -267,11 +408,124 @@ async def add_caretime(request: fastapi.Request,
     caretime_entry['start_time'] = time_interval.start_time
     if time_interval.stop_time:
         caretime_entry['stop_time'] = time_interval.stop_time
-    backend.database.queries_v2.create_caretime(db=db, caretime_entry=caretime_entry)
+    try:
+        await backend.database.queries_async.create_caretime(db=db, caretime_entry=caretime_entry)
+    except backend.database.queries_v2.OverlappingCaretimeError:
+        raise fastapi.HTTPException(status_code=fastapi.status.HTTP_409_CONFLICT,
+                                    detail='Caretime overlaps another caretime of the child')
+    presence_board.request_resync()
 
     return caretime_id
 
 
+@app.get('/caretimes/overlapping', response_model=typing.List[backend.database.schemas.Caretime])
+@starlette.authentication.requires(['admin'])
+async def fetch_overlapping_caretimes(request: fastapi.Request,
+                                      db: Session,
+                                      start: datetime.datetime,
+                                      end: datetime.datetime,
+                                      child_id: typing.Optional[uuid.UUID] = None,
+                                      ):
+    """
+    Caretimes overlapping [start, end], of one child or of all children.
+
+    :return:
+    """
+    if end < start:
+        raise fastapi.HTTPException(status_code=fastapi.status.HTTP_422_UNPROCESSABLE_ENTITY,
+                                    detail='end must not be before start')
+    return await backend.database.queries_async.fetch_overlapping_caretimes(db=db, start=start, end=end,
+                                                                            child_id=child_id)
+
+
+@app.get('/caretimes/summary', response_model=typing.List[backend.database.schemas.FacilityCareSummary])
+@starlette.authentication.requires(['admin'])
+async def fetch_facility_summary(request: fastapi.Request,
+                                 db: Session,
+                                 granularity: str = fastapi.Query('month', regex=GRANULARITY_REGEX),
+                                 start: typing.Optional[datetime.date] = None,
+                                 end: typing.Optional[datetime.date] = None,
+                                 ):
+    """
+    Care hours of all children and number of children cared for per day, week or month,
+    read from the rollup, which is refreshed in the background.
+
+    :return:
+    """
+    return await backend.database.queries_async.fetch_care_summary(db=db, granularity=granularity,
+                                                                   start=start, end=end)
+
+
+@app.post('/caretimes/bulk',
+          response_model=backend.database.schemas.CaretimeBulkResult,
+          responses={
+              200: {'description': 'Number of inserted caretimes and the rejected entries by index'},
+              400: {'description': 'Body is neither a JSON array nor NDJSON'},
+          })
+@starlette.authentication.requires(['admin'])
+async def add_caretimes_bulk(request: fastapi.Request,
+                             db: Session,
+                             ):
+    """
+    Add caretimes of many children at once.
+    The body is either a JSON array or, with content type application/x-ndjson, one JSON object per line.
+    Valid entries of existing children are inserted, all others are reported with their index.
+
+    :return:
+    """
+    body = await request.body()
+    errors = []
+    invalid_json = set()
+    if request.headers.get('content-type', '').startswith('application/x-ndjson'):
+        raw_entries = []
+        for index, line in enumerate(line for line in body.splitlines() if line.strip()):
+            try:
+                raw_entries.append(json.loads(line))
+            except ValueError:
+                raw_entries.append(None)
+                invalid_json.add(index)
+                errors.append({'index': index, 'error': 'Invalid JSON'})
+    else:
+        try:
+            raw_entries = json.loads(body)
+        except ValueError:
+            raw_entries = None
+        if not isinstance(raw_entries, list):
+            raise fastapi.HTTPException(status_code=fastapi.status.HTTP_400_BAD_REQUEST,
+                                        detail='Body must be a JSON array or NDJSON')
+
+    entries = []
+    for index, raw_entry in enumerate(raw_entries):
+        if index in invalid_json:
+            continue
+        try:
+            entries.append((index, backend.database.schemas.CaretimeEntry.parse_obj(raw_entry)))
+        except pydantic.ValidationError as exc:
+            errors.append({'index': index, 'error': str(exc)})
+
+    existing_child_ids = await backend.database.queries_async.fetch_existing_child_ids(
+        db=db, child_ids={entry.child_id for _, entry in entries}) if entries else set()
+    indexes = []
+    caretime_entries = []
+    for index, entry in entries:
+        if entry.child_id not in existing_child_ids:
+            errors.append({'index': index, 'error': 'Child not found'})
+            continue
+        caretime_entry = entry.dict()
+        caretime_entry['caretime_id'] = uuid.uuid4()
+        indexes.append(index)
+        caretime_entries.append(caretime_entry)
+
+    inserted = 0
+    if caretime_entries:
+        # entries, which violate a constraint of the database, e.g. overlap, are rejected one by one
+        rejected = await backend.database.queries_async.create_caretimes_bulk(db=db, caretime_entries=caretime_entries)
+        errors.extend({'index': indexes[position], 'error': error} for position, error in rejected.items())
+        inserted = len(caretime_entries) - len(rejected)
+        presence_board.request_resync()
+    return {'inserted': inserted, 'errors': sorted(errors, key=lambda error: error['index'])}
+
+
 @app.post('/children/{child_id}/caretimes/{caretime_id}')
 @starlette.authentication.requires(['admin'])
 async def edit_caretime(request: fastapi.Request,
@@ -284,11 +538,6 @@ async def edit_caretime(request: fastapi.Request,
 
     :return:
     """
-    child = backend.database.queries_v2.fetch_child(db=db, child_id=child_id)
-    caretime = backend.database.queries_v2.fetch_single_caretime(db=db, child_id=child_id, caretime_id=caretime_id)
-    if not child or not caretime:
-        raise fastapi.HTTPException(status_code=404)
-
     caretime_entry = dict()
     caretime_entry['caretime_id'] = caretime_id
     caretime_entry['child_id'] = child_id
@@ -297,7 +546,18 @@ async def edit_caretime(request: fastapi.Request,
     if time_interval.stop_time:
         caretime_entry['stop_time'] = time_interval.stop_time
 
-    backend.database.queries_v2.edit_caretime(db=db, caretime_entry=caretime_entry)
+    try:
+        updated_caretime_id = await backend.database.queries_async.edit_caretime(db=db,
+                                                                                 caretime_entry=caretime_entry)
+    except backend.database.queries_v2.OverlappingCaretimeError:
+        raise fastapi.HTTPException(status_code=fastapi.status.HTTP_409_CONFLICT,
+                                    detail='Caretime overlaps another caretime of the child')
+    except backend.database.queries_v2.InvalidCaretimeError:
+        raise fastapi.HTTPException(status_code=fastapi.status.HTTP_422_UNPROCESSABLE_ENTITY,
+                                    detail='stop_time must not be before start_time')
+    if not updated_caretime_id:
+        raise fastapi.HTTPException(status_code=404)
+    presence_board.request_resync()
 
 
 @app.delete('/children/{child_id}/caretimes/{caretime_id}')
@@ -311,14 +571,189 @@ async def delete_caretime(request: fastapi.Request,
 
     :return:
     """
-    child = backend.database.queries_v2.fetch_child(db=db, child_id=child_id)
-    caretime = backend.database.queries_v2.fetch_single_caretime(db=db, child_id=child_id, caretime_id=caretime_id)
-    if not child or not caretime:
+    deleted_caretime_id = await backend.database.queries_async.delete_caretime(db=db, child_id=child_id,
+                                                                               caretime_id=caretime_id)
+    if not deleted_caretime_id:
         raise fastapi.HTTPException(status_code=404)
-    backend.database.queries_v2.delete_caretime(db=db, child_id=child_id, caretime_id=caretime_id)
+    presence_board.request_resync()
     return
 
 
+@app.post('/children/{child_id}/check_in',
+          status_code=fastapi.status.HTTP_201_CREATED,
+          response_model=backend.database.schemas.CheckIn,
+          responses={
+              404: {'description': 'Child not found'},
+              409: {'description': 'Child is already checked in or at is within another caretime of the child'},
+          })
+@starlette.authentication.requires(['admin'])
+async def check_in(request: fastapi.Request,
+                   child_id: uuid.UUID,
+                   db: Session,
+                   at: typing.Optional[datetime.datetime] = None,
+                   ):
+    """
+    Open a caretime of the child with a single statement, at the given time or now.
+
+    :return:
+    """
+    try:
+        caretime = await backend.database.queries_async.check_in(db=db, child_id=child_id, start_time=at)
+    except backend.database.queries_v2.AlreadyCheckedInError:
+        raise fastapi.HTTPException(status_code=fastapi.status.HTTP_409_CONFLICT,
+                                    detail='Child is already checked in')
+    except backend.database.queries_v2.OverlappingCaretimeError:
+        raise fastapi.HTTPException(status_code=fastapi.status.HTTP_409_CONFLICT,
+                                    detail='Check-in overlaps another caretime of the child')
+    if caretime is None:
+        raise fastapi.HTTPException(status_code=404)
+    presence_board.check_in(child_id=child_id, caretime_id=caretime.caretime_id, checked_in_at=caretime.start_time)
+    return caretime
+
+
+@app.post('/children/{child_id}/check_out',
+          response_model=backend.database.schemas.CheckOut,
+          responses={
+              404: {'description': 'Child is not checked in'},
+              422: {'description': 'Check-out before the check-in'},
+          })
+@starlette.authentication.requires(['admin'])
+async def check_out(request: fastapi.Request,
+                    child_id: uuid.UUID,
+                    db: Session,
+                    at: typing.Optional[datetime.datetime] = None,
+                    ):
+    """
+    Close the open caretime of the child with a single statement, at the given time or now.
+
+    :return:
+    """
+    try:
+        caretime = await backend.database.queries_async.check_out(db=db, child_id=child_id, stop_time=at)
+    except backend.database.queries_v2.InvalidCaretimeError:
+        raise fastapi.HTTPException(status_code=fastapi.status.HTTP_422_UNPROCESSABLE_ENTITY,
+                                    detail='Check-out must not be before the check-in')
+    if caretime is None:
+        raise fastapi.HTTPException(status_code=404)
+    presence_board.check_out(child_id=child_id)
+    return caretime
+
+
+@app.get('/presence', response_model=typing.List[backend.database.schemas.Presence])
+@starlette.authentication.requires(['admin'])
+async def fetch_presence(request: fastapi.Request):
+    """
+    Children in the building, served from the in-memory presence board.
+
+    :return:
+    """
+    return presence_board.snapshot()
+
+
+@app.get('/presence/stream')
+@starlette.authentication.requires(['admin'])
+async def stream_presence(request: fastapi.Request):
+    """
+    Server-sent events of the presence board: a snapshot event, then check_in and check_out events.
+
+    :return:
+    """
+    return fastapi.responses.StreamingResponse(presence_board.subscribe(), media_type='text/event-stream',
+                                               headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def export_response(partitions: typing.AsyncIterator[list], columns: typing.List[str], export_format: str,
+                    file_name: str) -> fastapi.responses.StreamingResponse:
+    """
+
+    :return:
+    """
+    if export_format == 'csv':
+        chunks = backend.app.REST.utils.export.csv_chunks(partitions=partitions, columns=columns)
+    else:
+        chunks = backend.app.REST.utils.export.ndjson_chunks(partitions=partitions)
+    return fastapi.responses.StreamingResponse(
+        chunks,
+        media_type=backend.app.REST.utils.export.MEDIA_TYPES[export_format],
+        headers={'Content-Disposition': f'attachment; filename="{file_name}.{export_format}"'})
+
+
+@app.get('/export/children',
+         response_class=fastapi.responses.StreamingResponse,
+         responses={
+             200: {'description': 'All children as NDJSON or CSV stream'}
+         })
+@starlette.authentication.requires(['admin'])
+async def export_children(request: fastapi.Request,
+                          db: Session,
+                          export_format: str = fastapi.Query('ndjson', alias='format', regex='^(ndjson|csv)$'),
+                          since: typing.Optional[datetime.datetime] = None,
+                          ):
+    """
+    Export all children (created at or after since) with constant memory.
+
+    :return:
+    """
+    partitions = backend.database.queries_async.stream_children(db=db, since=since)
+    return export_response(partitions=partitions,
+                           columns=[column.name for column in backend.database.models.Child.__table__.columns],
+                           export_format=export_format, file_name='children')
+
+
+@app.get('/export/caretimes',
+         response_class=fastapi.responses.StreamingResponse,
+         responses={
+             200: {'description': 'All caretimes as NDJSON or CSV stream'}
+         })
+@starlette.authentication.requires(['admin'])
+async def export_caretimes(request: fastapi.Request,
+                           db: Session,
+                           export_format: str = fastapi.Query('ndjson', alias='format', regex='^(ndjson|csv)$'),
+                           since: typing.Optional[datetime.datetime] = None,
+                           ):
+    """
+    Export all caretimes (modified at or after since) with constant memory.
+
+    :return:
+    """
+    partitions = backend.database.queries_async.stream_caretimes(db=db, since=since)
+    return export_response(partitions=partitions,
+                           columns=[column.name for column in backend.database.models.Caretime.__table__.columns],
+                           export_format=export_format, file_name='caretimes')
+
+
+@app.get('/occupancy')
+@starlette.authentication.requires(['admin'])
+async def fetch_occupancy(request: fastapi.Request,
+                          db: Session,
+                          start: typing.Optional[datetime.date] = None,
+                          end: typing.Optional[datetime.date] = None,
+                          slot_minutes: int = fastapi.Query(15, gt=0, le=24 * 60),
+                          ):
+    """
+    Number of children present at the start of each slot and their peak during the slot, from start (included)
+    to end (excluded), by default today. Open caretimes count as present until now.
+
+    :return:
+    """
+    start = start or datetime.date.today()
+    end = end or start + datetime.timedelta(days=1)
+    range_start = datetime.datetime.combine(start, datetime.time())
+    range_end = datetime.datetime.combine(end, datetime.time())
+    intervals = await backend.database.queries_async.fetch_caretime_intervals(db=db, start=range_start, end=range_end)
+    try:
+        occupancy = backend.database.occupancy.compute_occupancy(
+            starts=backend.database.occupancy.to_datetime64([interval.start_time for interval in intervals],
+                                                            default=range_start),
+            stops=backend.database.occupancy.to_datetime64([interval.stop_time for interval in intervals],
+                                                           default=datetime.datetime.now()),
+            start=range_start, end=range_end, slot=datetime.timedelta(minutes=slot_minutes))
+    except ValueError as error:
+        raise fastapi.HTTPException(status_code=fastapi.status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(error))
+    return fastapi.Response(content=backend.app.REST.utils.json_handling.dumps(occupancy.records()),
+                            media_type='application/json')
+
+
 @app.get('/parents')
 @starlette.authentication.requires(['admin'])
 async def fetch_parents(request: fastapi.Request,
@@ -332,6 +767,28 @@ async def fetch_parents(request: fastapi.Request,
     return []
 
 
+@app.get('/statistics/pool')
+@starlette.authentication.requires(['admin'])
+async def fetch_pool_statistics(request: fastapi.Request):
+    """
+
+    :return:
+    """
+    return backend.database.queries_v2.get_pool_statistics() + \
+        backend.database.queries_async.get_pool_statistics()
+
+
+@app.get('/statistics/clones')
+@starlette.authentication.requires(['admin'])
+async def fetch_clone_statistics(request: fastapi.Request):
+    """
+    Comparison of the responses of this server and of the clone targets.
+
+    :return:
+    """
+    return clone_report.summary()
+
+
 @app.get('/is_alive')
 def is_alive():
     return {'message': 'Server is alive'}
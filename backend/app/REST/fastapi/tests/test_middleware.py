@@ -7,6 +7,7 @@ import uuid
 import fastapi
 import fastapi.testclient
 import freezegun
+import httpx
 import pytest
 import pydantic
 import starlette
@@ -15,6 +16,8 @@ import starlette.datastructures
 import time_machine
 
 import backend.app.REST.fastapi.middleware
+import backend.app.REST.utils.log_writer
+import backend.database.models
 
 
 # Testing of CloneRequestMiddleware #
@@ -72,6 +75,126 @@ def test_post_call_bytes_as_data(testclient):
     assert mock_requests.call_args.kwargs['data'] == b'{"int_param": 7, "str_param": "teststr"}'
 
 
+def run_clones(middleware, request, count):
+    scope = {'type': 'http', 'method': 'GET', 'path': '/test/abc', 'query_string': b'', 'headers': []}
+
+    async def app(scope, receive, send):
+        pass
+
+    async def run():
+        middleware.app = app
+        with unittest.mock.patch('httpx.AsyncClient.request', request):
+            for _ in range(count):
+                await middleware(scope, None, None)
+            await asyncio.sleep(0.01)
+            statistics = middleware.statistics()
+            await middleware.aclose()
+        return statistics
+
+    return asyncio.run(run())
+
+
+def test_clone_drops_oldest_when_target_is_slow():
+    middleware = backend.app.REST.fastapi.middleware.CloneRequestMiddleware(
+        app=None, servers=['http://test_url:9000'], max_in_flight=2)
+
+    async def slow_request(*args, **kwargs):
+        await asyncio.sleep(10)
+
+    statistics = run_clones(middleware=middleware, request=slow_request, count=3)
+
+    assert statistics == {'sent': 0, 'dropped': 1, 'failed': 0, 'in_flight': 2}
+
+
+def test_clone_counts_sent_and_failed():
+    middleware = backend.app.REST.fastapi.middleware.CloneRequestMiddleware(
+        app=None, servers=['http://test_url:9000', backend.app.REST.fastapi.middleware.CloneTarget(
+            url='http://other_url:9000', timeout=0.5)])
+
+    async def request(*args, **kwargs):
+        if kwargs['url'].startswith('http://other_url:9000'):
+            assert kwargs['timeout'] == 0.5
+            raise httpx.ConnectError('Connection refused')
+
+    statistics = run_clones(middleware=middleware, request=request, count=2)
+
+    assert statistics == {'sent': 2, 'dropped': 0, 'failed': 2, 'in_flight': 0}
+
+
+def test_clone_target_matches():
+    target = backend.app.REST.fastapi.middleware.CloneTarget(url='http://test_url:9000', methods=['get', 'post'],
+                                                             include=['/children*'], exclude=['*/caretimes/*'])
+
+    assert target.matches(method='GET', path='/children/abc')
+    assert not target.matches(method='DELETE', path='/children/abc')
+    assert not target.matches(method='GET', path='/is_alive')
+    assert not target.matches(method='POST', path='/children/abc/caretimes/def')
+
+
+def test_clone_target_sampling_is_deterministic():
+    target = backend.app.REST.fastapi.middleware.CloneTarget(url='http://test_url:9000', sample_rate=0.05)
+    scopes = [{'headers': [(b'x-request-id', str(uuid.uuid4()).encode('utf-8'))]} for _ in range(4000)]
+
+    sampled = [target.sampled(scope=scope) for scope in scopes]
+
+    assert sampled == [target.sampled(scope=scope) for scope in scopes]
+    assert 100 < sum(sampled) < 300
+
+
+def test_clone_target_sampling_by_user():
+    target = backend.app.REST.fastapi.middleware.CloneTarget(url='http://test_url:9000', sample_rate=0.5,
+                                                             sample_by='user')
+    users = [starlette.authentication.SimpleUser(f'user_{i}'.encode('utf-8')) for i in range(200)]
+
+    sampled = {user.username: target.sampled(scope={'headers': [], 'user': user}) for user in users}
+
+    assert all(target.sampled(scope={'headers': [(b'x-request-id', b'other')], 'user': user}) == sampled[user.username]
+               for user in users)
+    assert 0 < sum(sampled.values()) < 200
+
+
+def test_clone_compare_records_report():
+    report = backend.app.REST.fastapi.middleware.ComparisonReport()
+    middleware = backend.app.REST.fastapi.middleware.CloneRequestMiddleware(
+        app=None, servers=[backend.app.REST.fastapi.middleware.CloneTarget(url='http://test_url:9000', compare=True)],
+        report=report)
+    child_id = uuid.uuid4()
+    scope = {'type': 'http', 'method': 'GET', 'path': f'/children/{child_id}', 'query_string': b'', 'headers': []}
+    sent = []
+
+    async def app(scope, receive, send):
+        await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+        await send({'type': 'http.response.body', 'body': b'{"name": "Anna",', 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b' "sur_name": "Meyer"}'})
+
+    async def send(message):
+        sent.append(message)
+
+    responses = iter([httpx.Response(200, content=b'{"sur_name":"Meyer","name":"Anna"}'),
+                      httpx.Response(404, content=b'Not found')])
+
+    async def request(*args, **kwargs):
+        return next(responses)
+
+    async def run():
+        middleware.app = app
+        with unittest.mock.patch('httpx.AsyncClient.request', request):
+            for _ in range(2):
+                await middleware(scope, None, send)
+            await asyncio.sleep(0.01)
+            await middleware.aclose()
+
+    asyncio.run(run())
+
+    assert len(sent) == 6
+    [summary] = report.summary()
+    assert summary['path'] == '/children/{id}'
+    assert summary['count'] == 2
+    assert summary['status_mismatches'] == 1
+    assert summary['body_mismatches'] == 1
+    assert summary['bodies_not_compared'] == 0
+
+
 # Testing of BasicAuthBackend
 def test_authenticate_all_is_working(monkeypatch):
     headers = starlette.datastructures.Headers(
@@ -155,9 +278,14 @@ def test_authenticate_user_error(monkeypatch):
 
 # Testing of DBLoggingMiddleware
 @pytest.fixture
-def logging_testclient():
+def log_writer():
+    return unittest.mock.MagicMock()
+
+
+@pytest.fixture
+def logging_testclient(log_writer):
     app = fastapi.FastAPI()
-    app.add_middleware(backend.app.REST.fastapi.middleware.DBLoggingMiddleware)
+    app.add_middleware(backend.app.REST.fastapi.middleware.DBLoggingMiddleware, log_writer=log_writer)
 
     @app.post('/test')
     def post_call():
@@ -168,57 +296,73 @@ def logging_testclient():
 
 
 @freezegun.freeze_time('2023-07-24 18:00')
-def test_logging_post_call_freezegun(logging_testclient):
-    with unittest.mock.patch('backend.database.queries_v2') as mock_queries, \
-         unittest.mock.patch.object(uuid, 'uuid4', side_effect=[uuid.UUID('7d90a67b-282b-431f-b090-8f3f0cf78eb3')]):
-
-        mock_queries.get_database_config.return_value = {}
-        db_mock = unittest.mock.MagicMock()
-        mock_queries.create_session.return_value = db_mock
+def test_logging_post_call_freezegun(logging_testclient, log_writer):
+    with unittest.mock.patch.object(uuid, 'uuid4', side_effect=[uuid.UUID('7d90a67b-282b-431f-b090-8f3f0cf78eb3')]):
 
         logging_testclient.post('/test', json={'txt_key': 'txt_value'})
 
-    assert mock_queries.write_logging.call_args_list[0].kwargs == {
-        'db': db_mock,
-        'insert': True,
-        'log_entry': {'body': '{"txt_key": "txt_value"}', 'endpoint': '/test', 'method': 'POST', 'query': '',
-                      'request_id': uuid.UUID('7d90a67b-282b-431f-b090-8f3f0cf78eb3'),
-                      'request_timestamp': datetime.datetime(2023, 7, 24, 18)}
-    }
-    assert mock_queries.write_logging.call_args_list[1].kwargs == {
-        'db': db_mock,
-        'insert': False,
-        'log_entry': {'request_id': uuid.UUID('7d90a67b-282b-431f-b090-8f3f0cf78eb3'),
-                      'status_code': 200,
-                      'response_timestamp': datetime.datetime(2023, 7, 24, 18)}
-    }
+    assert log_writer.submit.call_args_list[0].args == (
+        {'body': '{"txt_key": "txt_value"}', 'endpoint': '/test', 'method': 'POST', 'query': '',
+         'request_id': uuid.UUID('7d90a67b-282b-431f-b090-8f3f0cf78eb3'),
+         'request_timestamp': datetime.datetime(2023, 7, 24, 18), 'user_name': None},
+    )
+    assert log_writer.submit.call_args_list[1].args == (
+        {'request_id': uuid.UUID('7d90a67b-282b-431f-b090-8f3f0cf78eb3'),
+         'status_code': 200,
+         'response_timestamp': datetime.datetime(2023, 7, 24, 18)},
+    )
 
 
 @time_machine.travel('2023-07-24 18:00', tick=False)
-def test_logging_post_call_time_machine(logging_testclient):
-    with unittest.mock.patch('backend.database.queries_v2') as mock_queries, \
-         unittest.mock.patch.object(uuid, 'uuid4', side_effect=[uuid.UUID('7d90a67b-282b-431f-b090-8f3f0cf78eb3')]):
-        mock_queries.get_database_config.return_value = {}
-        db_mock = unittest.mock.MagicMock()
-        mock_queries.create_session.return_value = db_mock
+def test_logging_post_call_time_machine(logging_testclient, log_writer):
+    with unittest.mock.patch.object(uuid, 'uuid4', side_effect=[uuid.UUID('7d90a67b-282b-431f-b090-8f3f0cf78eb3')]):
 
         logging_testclient.post('/test', json={'txt_key': 'txt_value'})
 
-    assert mock_queries.write_logging.call_args_list[0].kwargs == {
-        'db': db_mock,
-        'insert': True,
-        'log_entry': {'body': '{"txt_key": "txt_value"}', 'endpoint': '/test', 'method': 'POST', 'query': '',
-                      'request_id': uuid.UUID('7d90a67b-282b-431f-b090-8f3f0cf78eb3'),
-                      'request_timestamp': datetime.datetime(2023, 7, 24, 18)}
+    assert log_writer.submit.call_args_list[0].args == (
+        {'body': '{"txt_key": "txt_value"}', 'endpoint': '/test', 'method': 'POST', 'query': '',
+         'request_id': uuid.UUID('7d90a67b-282b-431f-b090-8f3f0cf78eb3'),
+         'request_timestamp': datetime.datetime(2023, 7, 24, 18), 'user_name': None},
+    )
+    assert log_writer.submit.call_args_list[1].args == (
+        {'request_id': uuid.UUID('7d90a67b-282b-431f-b090-8f3f0cf78eb3'),
+         'status_code': 200,
+         'response_timestamp': datetime.datetime(2023, 7, 24, 18)},
+    )
+
+
+def test_logging_post_call_truncates_body(logging_testclient, log_writer):
+    logging_testclient.post('/test', json={'txt_key': 'ä' * 1000})
+
+    body = log_writer.submit.call_args_list[0].args[0]['body']
+    assert len(body.encode('utf-8')) <= backend.database.models.Log.body.type.length
+    assert body.startswith('{"txt_key": "')
+
+
+def test_log_writer_batches_and_merges(monkeypatch):
+    written = []
+    monkeypatch.setattr('backend.database.queries_v2.get_database_config', lambda: {})
+    monkeypatch.setattr('backend.database.queries_v2.create_session', lambda **kwargs: unittest.mock.MagicMock())
+    monkeypatch.setattr('backend.database.queries_v2.write_logging_batch',
+                        lambda db, log_entries: written.append(log_entries))
+    log_writer = backend.app.REST.utils.log_writer.LogWriter(batch_size=10, flush_interval=60)
+    request_id = uuid.uuid4()
+
+    log_writer.submit({'request_id': request_id, 'method': 'GET'})
+    log_writer.submit({'request_id': request_id, 'status_code': 200})
+    log_writer.close()
+
+    assert written == [[{'request_id': request_id, 'method': 'GET', 'status_code': 200}]]
+    assert log_writer.statistics() == {'pending': 0, 'written': 2, 'dropped': 0, 'failed': 0}
 
-    }
-    assert mock_queries.write_logging.call_args_list[1].kwargs == {
-        'db': db_mock,
-        'insert': False,
-        'log_entry': {'request_id': uuid.UUID('7d90a67b-282b-431f-b090-8f3f0cf78eb3'),
-                      'status_code': 200,
-                      'response_timestamp': datetime.datetime(2023, 7, 24, 18)}
-    }
+
+def test_log_writer_drops_when_full():
+    log_writer = backend.app.REST.utils.log_writer.LogWriter(max_pending=1)
+    log_writer._ensure_started = lambda: None
+
+    assert log_writer.submit({'request_id': uuid.uuid4()})
+    assert not log_writer.submit({'request_id': uuid.uuid4()})
+    assert log_writer.statistics()['dropped'] == 1
 
 
 # Testing of TruncateMiddleware
@@ -265,3 +409,40 @@ def test_truncate_post_call1(truncate_testclient):
                                     json={'other_txt': 'AaBbCcDdEeFf'})
 
     assert resp.status_code == 200
+
+
+def test_truncate_post_call_chunked_body():
+    app = fastapi.FastAPI()
+    app.add_middleware(backend.app.REST.fastapi.middleware.TruncateMiddleware, long_param='long_txt', limit=10)
+
+    @app.post('/test')
+    async def post_call(request: fastapi.Request):
+        body = await request.body()
+        return {'body': body.decode('utf-8'), 'content_length': request.headers['content-length']}
+
+    client = fastapi.testclient.TestClient(app)
+
+    resp = client.post('/test', content=iter([b'{"long_txt": "AaBb', b'CcDdEeFf", "other": 1}']),
+                       headers={'content-length': '38'})
+
+    assert resp.json() == {'body': '{"long_txt":"AaBbCcDdEe","other":1}', 'content_length': '35'}
+
+
+def test_truncate_fields_nested_paths():
+    document = {'child': {'name': 'Alexandra', 'notes': 'x' * 50},
+                'caretimes': [{'comment': 'abcdef'}, {'comment': 'ab'}, {'other': 'abcdef'}],
+                'long_txt': 7}
+
+    truncated = backend.app.REST.fastapi.middleware.truncate_fields(
+        document=document, fields={'child.name': 4, 'child.notes': 10, 'caretimes.comment': 3, 'long_txt': 1,
+                                   'missing.path': 1})
+
+    assert truncated
+    assert document == {'child': {'name': 'Alex', 'notes': 'x' * 10},
+                        'caretimes': [{'comment': 'abc'}, {'comment': 'ab'}, {'other': 'abcdef'}],
+                        'long_txt': 7}
+
+
+def test_truncate_long_param_requires_limit():
+    with pytest.raises(ValueError):
+        backend.app.REST.fastapi.middleware.TruncateMiddleware(app=fastapi.FastAPI(), long_param='long_txt')
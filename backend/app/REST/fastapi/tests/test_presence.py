@@ -0,0 +1,72 @@
+import asyncio
+import collections
+import datetime
+import uuid
+
+import pytest
+
+import backend.app.REST.fastapi.presence
+
+
+OpenCaretime = collections.namedtuple('OpenCaretime', ['child_id', 'caretime_id', 'checked_in_at'])
+
+
+@pytest.fixture
+def open_caretimes():
+    return [OpenCaretime(uuid.uuid4(), uuid.uuid4(), datetime.datetime(2023, 7, 24, 7, minute)) for minute in range(3)]
+
+
+async def next_event(events):
+    return (await asyncio.wait_for(events.__anext__(), timeout=1)).decode()
+
+
+def test_presence_board_check_in_and_out(open_caretimes):
+    board = backend.app.REST.fastapi.presence.PresenceBoard()
+    for caretime in reversed(open_caretimes):
+        board.check_in(**caretime._asdict())
+
+    board.check_out(child_id=open_caretimes[1].child_id)
+    board.check_out(child_id=uuid.uuid4())
+
+    assert [entry['child_id'] for entry in board.snapshot()] == \
+        [open_caretimes[0].child_id, open_caretimes[2].child_id]
+    assert board.changes == 4
+
+
+def test_presence_board_resync(open_caretimes):
+    board = backend.app.REST.fastapi.presence.PresenceBoard()
+    board.check_in(**open_caretimes[0]._asdict())
+    changes = board.changes
+    board.check_in(**open_caretimes[1]._asdict())
+
+    assert board.resync(rows=open_caretimes[2:], changes=changes) is False
+    assert len(board.snapshot()) == 2
+
+    assert board.resync(rows=open_caretimes[1:]) is True
+    assert [entry['caretime_id'] for entry in board.snapshot()] == \
+        [open_caretimes[1].caretime_id, open_caretimes[2].caretime_id]
+
+
+def test_presence_board_stream(open_caretimes):
+    async def stream():
+        board = backend.app.REST.fastapi.presence.PresenceBoard(max_pending=2)
+        board.check_in(**open_caretimes[0]._asdict())
+        events = board.subscribe(keep_alive=0.01)
+        snapshot = await next_event(events)
+        board.check_out(child_id=open_caretimes[0].child_id)
+        check_out = await next_event(events)
+        keep_alive = await next_event(events)
+        for caretime in open_caretimes:
+            board.check_in(**caretime._asdict())
+        lagging = await next_event(events)
+        await events.aclose()
+        return board, snapshot, check_out, keep_alive, lagging
+
+    board, snapshot, check_out, keep_alive, lagging = asyncio.run(stream())
+
+    assert snapshot.startswith('event: snapshot\ndata: [{') and str(open_caretimes[0].child_id) in snapshot
+    assert check_out.startswith('event: check_out\n') and check_out.endswith('\n\n')
+    assert keep_alive == backend.app.REST.fastapi.presence.KEEP_ALIVE.decode()
+    assert lagging.startswith('event: snapshot\n')
+    assert all(str(caretime.child_id) in lagging for caretime in open_caretimes)
+    assert not board._subscribers
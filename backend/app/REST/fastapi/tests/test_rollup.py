@@ -0,0 +1,35 @@
+import asyncio
+
+import backend.app.REST.fastapi.rollup
+import backend.database.queries_async
+
+
+class FakeSession:
+    closed = 0
+
+    async def close(self):
+        FakeSession.closed += 1
+
+
+def test_care_days_refresher_keeps_refreshing(monkeypatch):
+    refreshes = []
+
+    async def refresh_care_days(db):
+        refreshes.append(db)
+        if len(refreshes) == 1:
+            raise RuntimeError('database is down')
+        return True
+
+    monkeypatch.setattr(backend.database.queries_async, 'create_session', lambda db_config: FakeSession())
+    monkeypatch.setattr(backend.database.queries_async, 'refresh_care_days', refresh_care_days)
+
+    async def refresh():
+        refresher = backend.app.REST.fastapi.rollup.CareDaysRefresher(refresh_interval=0.01)
+        task = asyncio.create_task(refresher.run(db_config={}))
+        await asyncio.sleep(0.05)
+        task.cancel()
+
+    asyncio.run(refresh())
+
+    assert len(refreshes) >= 2
+    assert FakeSession.closed == len(refreshes)
@@ -4,6 +4,7 @@ import fastapi.requests
 import fastapi.testclient
 import pydantic_factories
 import sqlalchemy
+import sqlalchemy.ext.asyncio
 import sqlalchemy.orm
 import sqlalchemy.pool
 
@@ -19,14 +20,14 @@ class ChildBaseFactory(pydantic_factories.ModelFactory):
 
 
 def override_get_db(test_db_name: str):
-    def wrapper():
-        engine = backend.app.REST.utils.testing.create_local_engine(test_db_name=test_db_name)
-        session = sqlalchemy.orm.Session(autocommit=False, autoflush=False, bind=engine)
+    async def wrapper():
+        engine = backend.app.REST.utils.testing.create_local_async_engine(test_db_name=test_db_name)
+        session = sqlalchemy.ext.asyncio.AsyncSession(bind=engine, autoflush=False)
         try:
             yield session
         finally:
-            session.close()
-            engine.dispose()
+            await session.close()
+            await engine.dispose()
     return wrapper
 
 
@@ -54,3 +55,90 @@ class TestingServer(backend.app.REST.utils.testing.TestingServer):
                                    auth=(self.user, self.password))
         self.monkeypatch.undo()
         assert response.status_code == 200
+
+    def test_overlapping_caretimes_are_rejected(self):
+        db_config = backend.database.queries_v2.get_database_config()
+        db_config['database'] = self.test_db_name
+        self.monkeypatch.setattr('backend.database.queries_v2.get_database_config',
+                                 lambda **kwargs: db_config
+                                 )
+        child = ChildBaseFactory.build()
+        response = self.client.post('/children/create', content=child.json(),
+                                    auth=(self.user, self.password))
+        child_id = response.json()['child_id']
+
+        first = self.client.post(f'/children/{child_id}/caretimes', json={'start_time': '2023-07-24T07:00:00'},
+                                 auth=(self.user, self.password))
+        second = self.client.post(f'/children/{child_id}/caretimes', json={'start_time': '2023-07-24T08:00:00'},
+                                  auth=(self.user, self.password))
+        checked_in = self.client.get('/children/checked_in', auth=(self.user, self.password))
+        overlapping = self.client.get('/caretimes/overlapping',
+                                      params={'start': '2023-07-24T12:00:00', 'end': '2023-07-24T13:00:00',
+                                              'child_id': child_id},
+                                      auth=(self.user, self.password))
+        self.monkeypatch.undo()
+        assert first.status_code == 201
+        assert second.status_code == 409
+        assert [child['child_id'] for child in checked_in.json()] == [child_id]
+        assert [caretime['caretime_id'] for caretime in overlapping.json()] == [first.json()]
+
+    def test_inverted_caretimes_are_rejected(self):
+        db_config = backend.database.queries_v2.get_database_config()
+        db_config['database'] = self.test_db_name
+        self.monkeypatch.setattr('backend.database.queries_v2.get_database_config',
+                                 lambda **kwargs: db_config
+                                 )
+        child = ChildBaseFactory.build()
+        response = self.client.post('/children/create', content=child.json(),
+                                    auth=(self.user, self.password))
+        child_id = response.json()['child_id']
+
+        inverted = self.client.post(f'/children/{child_id}/caretimes',
+                                    json={'start_time': '2023-07-24T09:00:00', 'stop_time': '2023-07-24T08:00:00'},
+                                    auth=(self.user, self.password))
+        without_start = self.client.post(f'/children/{child_id}/caretimes', json={'stop_time': '2023-07-24T08:00:00'},
+                                         auth=(self.user, self.password))
+        created = self.client.post(f'/children/{child_id}/caretimes', json={'start_time': '2023-07-24T09:00:00'},
+                                   auth=(self.user, self.password))
+        edited = self.client.post(f'/children/{child_id}/caretimes/{created.json()}',
+                                  json={'stop_time': '2023-07-24T08:00:00'},
+                                  auth=(self.user, self.password))
+        bulk = self.client.post('/caretimes/bulk',
+                                json=[{'child_id': child_id, 'start_time': '2023-07-25T09:00:00',
+                                       'stop_time': '2023-07-25T08:00:00'},
+                                      {'child_id': child_id, 'start_time': '2023-07-25T10:00:00',
+                                       'stop_time': '2023-07-25T11:00:00'}],
+                                auth=(self.user, self.password))
+        self.monkeypatch.undo()
+        assert inverted.status_code == 422
+        assert without_start.status_code == 422
+        assert edited.status_code == 422
+        assert bulk.json()['inserted'] == 1
+        assert [error['index'] for error in bulk.json()['errors']] == [0]
+
+    def test_bulk_caretimes_are_rejected_per_entry(self):
+        db_config = backend.database.queries_v2.get_database_config()
+        db_config['database'] = self.test_db_name
+        self.monkeypatch.setattr('backend.database.queries_v2.get_database_config',
+                                 lambda **kwargs: db_config
+                                 )
+        child = ChildBaseFactory.build()
+        response = self.client.post('/children/create', content=child.json(),
+                                    auth=(self.user, self.password))
+        child_id = response.json()['child_id']
+
+        bulk = self.client.post('/caretimes/bulk',
+                                json=[{'child_id': child_id, 'start_time': '2023-07-26T08:00:00',
+                                       'stop_time': '2023-07-26T12:00:00'},
+                                      None,
+                                      {'child_id': child_id, 'start_time': '2023-07-26T11:00:00',
+                                       'stop_time': '2023-07-26T13:00:00'},
+                                      {'child_id': child_id, 'start_time': '2023-07-26T13:00:00',
+                                       'stop_time': '2023-07-26T15:00:00'}],
+                                auth=(self.user, self.password))
+        self.monkeypatch.undo()
+        assert bulk.status_code == 200
+        assert bulk.json()['inserted'] == 2
+        assert [(error['index'], error['error']) for error in bulk.json()['errors']][1] == \
+            (2, 'Caretime overlaps another caretime of the child')
+        assert [error['index'] for error in bulk.json()['errors']] == [1, 2]
@@ -1,5 +1,3 @@
-import json
-
 import flask
 
 import backend.app.REST.utils.gunicorn_app
@@ -18,9 +16,8 @@ PREFIX = '/rest/flask/v2'
 @auth_required(required_role='admin')
 def handle_get(recent: bool = False, limit: int = 10):
     result = backend.database.queries.fetch_children(recent=recent, limit=limit)
-    result_ = backend.app.REST.utils.json_handling.serialize_result(result=result)
     response = app.response_class(
-        response=json.dumps(result_),
+        response=backend.app.REST.utils.json_handling.dumps_result(result=result),
         status=200,
         content_type='application/json',
     )
@@ -31,9 +28,8 @@ def handle_get(recent: bool = False, limit: int = 10):
 @auth_required(required_role='admin')
 def handle_post():
     result = backend.database.queries.fetch_child(child_id=flask.request.json['child_id'])
-    result_ = backend.app.REST.utils.json_handling.serialize_result(result=result)
     response = app.response_class(
-        response=json.dumps(result_),
+        response=backend.app.REST.utils.json_handling.dumps_result(result=result),
         status=200,
         content_type='application/json',
     )
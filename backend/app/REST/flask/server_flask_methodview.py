@@ -1,5 +1,3 @@
-import json
-
 import flask.views
 
 import backend.app.REST.utils.json_handling
@@ -18,9 +16,8 @@ class Children(flask.views.MethodView):
 
     def get(self, recent: bool = False, limit: int = 10):
         result = backend.database.queries.fetch_children(recent=recent, limit=limit)
-        result_ = backend.app.REST.utils.json_handling.serialize_result(result=result)
         response = app.response_class(
-            response=json.dumps(result_),
+            response=backend.app.REST.utils.json_handling.dumps_result(result=result),
             status=200,
             content_type='application/json',
         )
@@ -1,5 +1,3 @@
-import json
-
 import flask
 import flask_restful
 
@@ -20,8 +18,9 @@ class Children(flask_restful.Resource):
 
     def get(self, recent: bool = False, limit: int = 10):
         result = backend.database.queries.fetch_children(recent=recent, limit=limit)
-        result_ = backend.app.REST.utils.json_handling.serialize_result(result=result)
-        return result_
+        return flask.Response(response=backend.app.REST.utils.json_handling.dumps_result(result=result),
+                              status=200,
+                              content_type='application/json')
 
 
 api.add_resource(Children, f'{PREFIX}/children', '/children')
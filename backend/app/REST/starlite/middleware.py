@@ -1,15 +1,22 @@
 import base64
 import datetime
+import typing
 import uuid
 
 import starlite.middleware.base
 import starlite.types
 import starlite
 
+import backend.app.REST.utils.body_capture
+import backend.app.REST.utils.log_writer
+import backend.database.models
 import backend.database.queries_v2
 import backend.database.usermanagement
 
 
+LOG_BODY_LIMIT = backend.database.models.Log.body.type.length
+
+
 class BasicAuthMiddleware(starlite.AbstractAuthenticationMiddleware):
     """
 
@@ -38,27 +45,24 @@ class BasicAuthMiddleware(starlite.AbstractAuthenticationMiddleware):
 
 class DBLoggingMiddleware(starlite.middleware.base.MiddlewareProtocol):
     """
-
+    Middleware for logging the requests and their responses to the database.
+    The log entries are handed to a write-behind LogWriter, so no database write happens on the request path.
+    Request bodies are logged up to the length of the body column.
     """
-    def __init__(self, app: starlite.types.ASGIApp) -> None:
+    def __init__(self, app: starlite.types.ASGIApp,
+                 log_writer: typing.Optional[backend.app.REST.utils.log_writer.LogWriter] = None) -> None:
         super().__init__(app=app)
         self.app = app
+        self.log_writer = log_writer or backend.app.REST.utils.log_writer.get_log_writer()
 
     async def __call__(self, scope: starlite.types.Scope, receive: starlite.types.Receive, send: starlite.types.Send) \
          -> None:
         if scope['type'] == 'http':
-            db_config = backend.database.queries_v2.get_database_config()
-            db = backend.database.queries_v2.create_session(db_config=db_config)
             body = None
             if scope['method'] in ('POST', 'PUT',):
-                messages = []
-                more_body = True
-                while more_body:
-                    message_ = await receive()
-                    messages.append(message_)
-                    more_body = message_.get('more_body', False)
-
-                body = b''.join([message.get('body', b'') for message in messages])
+                captured = await backend.app.REST.utils.body_capture.capture_body(scope=scope, receive=receive)
+                body = captured.text(limit=LOG_BODY_LIMIT)
+                receive = captured.replay()
             request_id = uuid.uuid4()
             log_entry = {
                 'request_id': request_id,
@@ -66,37 +70,23 @@ class DBLoggingMiddleware(starlite.middleware.base.MiddlewareProtocol):
                 'endpoint': scope['path'],
                 'method': scope['method'],
                 'request_timestamp': datetime.datetime.now(),
-                'body': body.decode('utf-8') if body else None,
+                'body': body,
                 'query': scope['query_string'].decode('utf-8')
             }
-            backend.database.queries_v2.write_logging(db=db,
-                                                      log_entry=log_entry,
-                                                      insert=True)
-
-            async def wrapped_receive():
-                if messages:
-                    return messages.pop(0)
-                return await receive()
+            self.log_writer.submit(log_entry)
 
             async def send_wrapper(message: starlite.types.Message) -> None:
                 if message['type'] == 'http.response.start':
                     scope['state']['http.response.start'] = message
                 elif message['type'] == 'http.response.body':
-                    if scope['state'].get('http.response.body'):
-                        scope['state']['http.response.body'].append(message)
-                    else:
-                        scope['state']['http.response.body'] = [message]
-                    if not message['more_body']:
+                    if not message.get('more_body', False):
                         log_entry = {
                             'request_id': request_id,
                             'status_code': scope['state']['http.response.start']['status'],
                             'response_timestamp': datetime.datetime.now()}
-                        backend.database.queries_v2.write_logging(db=db,
-                                                                  log_entry=log_entry,
-                                                                  insert=False)
-                        db.close()
+                        self.log_writer.submit(log_entry)
                 await send(message)
 
-            await self.app(scope, wrapped_receive, send_wrapper)
+            await self.app(scope, receive, send_wrapper)
         else:
             await self.app(scope, receive, send)
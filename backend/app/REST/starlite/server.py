@@ -1,7 +1,8 @@
 import typing
 import uuid
 
-import sqlalchemy.orm
+import pydantic
+import sqlalchemy.ext.asyncio
 import starlette.status
 import starlite
 import starlite.enums
@@ -11,6 +12,8 @@ import uvicorn.workers
 import backend.app.REST.starlite.guards
 import backend.app.REST.starlite.middleware
 import backend.app.REST.utils.json_handling
+import backend.app.REST.utils.log_writer
+import backend.database.queries_async
 import backend.database.queries_v2
 import backend.database.schemas
 
@@ -40,6 +43,12 @@ def server_error(request: starlite.Request, exc: Exception) -> starlite.Response
                              media_type=starlite.enums.MediaType.JSON)
 
 
+def json_response(result: typing.Any, schema: typing.Type[pydantic.BaseModel]
+                  = backend.database.schemas.Child) -> starlite.Response:
+    return starlite.Response(content=backend.app.REST.utils.json_handling.dumps_result(result=result, schema=schema),
+                             media_type=starlite.enums.MediaType.JSON)
+
+
 class ChildrenController(starlite.Controller):
     """
 
@@ -47,41 +56,42 @@ class ChildrenController(starlite.Controller):
     path = '/rest/starlite/v1/children'
 
     @starlite.get()
-    async def fetch_children(self, db: sqlalchemy.orm.Session, recent: bool = False, skip: int = 0, limit: int = 10)\
-            -> typing.List[backend.database.schemas.Child]:
+    async def fetch_children(self, db: sqlalchemy.ext.asyncio.AsyncSession,
+                             recent: bool = False, skip: int = 0, limit: int = 10)\
+            -> starlite.Response[typing.List[backend.database.schemas.Child]]:
         """
 
         :return:
         """
-        result = backend.database.queries_v2.fetch_children(db=db, recent=recent, skip=skip, limit=limit)
-        return backend.app.REST.utils.json_handling.serialize_result(result=result)
+        result = await backend.database.queries_async.fetch_children(db=db, recent=recent, skip=skip, limit=limit)
+        return json_response(result=result)
 
     @starlite.get('/{child_id: uuid}')
-    async def fetch_child(self, db: sqlalchemy.orm.Session, child_id: uuid.UUID) \
-            -> backend.database.schemas.Child:
+    async def fetch_child(self, db: sqlalchemy.ext.asyncio.AsyncSession, child_id: uuid.UUID) \
+            -> starlite.Response[backend.database.schemas.Child]:
         """
 
         :return:
         """
-        result = backend.database.queries_v2.fetch_child(db=db, child_id=child_id)
+        result = await backend.database.queries_async.fetch_child(db=db, child_id=child_id)
         if result:
-            return backend.app.REST.utils.json_handling.serialize_result(result=result)
+            return json_response(result=result)
         raise starlite.NotFoundException()
 
     @starlite.post(status_code=starlette.status.HTTP_200_OK)
-    async def fetch_one_child(self, db: sqlalchemy.orm.Session, data: dict) \
-            -> backend.database.schemas.Child:
+    async def fetch_one_child(self, db: sqlalchemy.ext.asyncio.AsyncSession, data: dict) \
+            -> starlite.Response[backend.database.schemas.Child]:
         """
 
         :return:
         """
-        result = backend.database.queries_v2.fetch_child(db=db, child_id=data['child_id'])
+        result = await backend.database.queries_async.fetch_child(db=db, child_id=data['child_id'])
         if result:
-            return backend.app.REST.utils.json_handling.serialize_result(result=result)
+            return json_response(result=result)
         raise starlite.NotFoundException()
 
     @starlite.post('/create', status_code=starlette.status.HTTP_201_CREATED)
-    async def create_child(self, db: sqlalchemy.orm.Session, data: dict) -> uuid.UUID:
+    async def create_child(self, db: sqlalchemy.ext.asyncio.AsyncSession, data: dict) -> uuid.UUID:
         """
 
         :return:
@@ -89,22 +99,22 @@ class ChildrenController(starlite.Controller):
         child_id = uuid.uuid4()
         child_dict = data
         child_dict['child_id'] = child_id
-        _ = backend.database.queries_v2.create_child(db=db, child=child_dict)
+        _ = await backend.database.queries_async.create_child(db=db, child=child_dict)
         return child_id
 
 
 app = starlite.Starlite(route_handlers=[ChildrenController],
                         plugins=[starlite.plugins.sql_alchemy.SQLAlchemyPlugin(
                             config=starlite.plugins.sql_alchemy.SQLAlchemyConfig(
-                                engine_instance=backend.database.queries_v2.create_engine(
-                                    url=backend.database.queries_v2.create_url(
-                                        db_config=backend.database.queries_v2.get_database_config())),
-                                use_async_engine=False,
+                                engine_instance=backend.database.queries_async.get_engine(
+                                    db_config=backend.database.queries_v2.get_database_config()),
+                                use_async_engine=True,
                                 dependency_key='db')
                         )],
                         middleware=[backend.app.REST.starlite.middleware.BasicAuthMiddleware,
                                     backend.app.REST.starlite.middleware.DBLoggingMiddleware],
                         guards=[backend.app.REST.starlite.guards.admin_user_guard('admin')],
+                        on_shutdown=[backend.app.REST.utils.log_writer.get_log_writer().close],
                         exception_handlers={starlette.status.HTTP_401_UNAUTHORIZED: not_authorized,
                                             starlette.status.HTTP_403_FORBIDDEN: forbidden,
                                             starlette.status.HTTP_404_NOT_FOUND: not_found,
@@ -7,6 +7,7 @@ import starlite.testing
 import backend.app.REST.starlite.server
 import backend.app.REST.utils.testing
 import backend.database.schemas
+import backend.database.queries_async
 import backend.database.queries_v2
 
 
@@ -25,10 +26,10 @@ class TestingStarliteServer(backend.app.REST.utils.testing.TestingServer):
         db_config['database'] = self.test_db_name
         self.app.plugins = [starlite.plugins.sql_alchemy.SQLAlchemyPlugin(
             config=starlite.plugins.sql_alchemy.SQLAlchemyConfig(
-                engine_instance=backend.database.queries_v2.create_engine(
-                    url=backend.database.queries_v2.create_url(
+                engine_instance=backend.database.queries_async.create_engine(
+                    url=backend.database.queries_async.create_url(
                         db_config=db_config)),
-                use_async_engine=False,
+                use_async_engine=True,
                 dependency_key='db')
         )]
         self.app.plugins[0].on_app_init(app=self.app)
@@ -0,0 +1,119 @@
+import codecs
+import typing
+
+import starlette.types
+
+
+SCOPE_EXTENSION = 'captured_body'
+
+
+class CapturedBody:
+    """
+    Request body, received once per request and shared by all middlewares via the scope extensions.
+
+    The received messages are kept as they are: the chunks are only joined, if the whole body is needed,
+    and a body received in a single message is never copied.
+    """
+
+    def __init__(self, messages: typing.List[starlette.types.Message], receive: starlette.types.Receive) -> None:
+        self.messages = messages
+        self._receive = receive
+        self._body: typing.Optional[bytes] = None
+
+    @property
+    def body(self) -> bytes:
+        """
+        The whole body.
+
+        :return:
+        """
+        if self._body is None:
+            chunks = [message.get('body', b'') for message in self.messages]
+            self._body = chunks[0] if len(chunks) == 1 else b''.join(chunks)
+        return self._body
+
+    @property
+    def size(self) -> int:
+        return sum(len(message.get('body', b'')) for message in self.messages)
+
+    def head(self, limit: int) -> bytes:
+        """
+        The first limit bytes of the body, the remaining chunks are not touched.
+
+        :param limit:
+        :return:
+        """
+        chunks = []
+        remaining = limit
+        for message in self.messages:
+            if remaining <= 0:
+                break
+            chunk = message.get('body', b'')
+            chunks.append(chunk[:remaining] if len(chunk) > remaining else chunk)
+            remaining -= len(chunk)
+        return chunks[0] if len(chunks) == 1 else b''.join(chunks)
+
+    def text(self, limit: int) -> typing.Optional[str]:
+        """
+        The body decoded up to limit bytes, a character cut at the limit is dropped,
+        invalid bytes are replaced by U+FFFD.
+
+        :param limit:
+        :return: None for an empty body
+        """
+        head = self.head(limit=limit)
+        # not final: an incomplete sequence at the end is held back by the decoder instead of being replaced
+        return codecs.getincrementaldecoder('utf-8')(errors='replace').decode(head, final=False) if head else None
+
+    def replace(self, body: bytes, scope: typing.Optional[starlette.types.Scope] = None) -> None:
+        """
+        Replace the body for the downstream middlewares and the app.
+
+        :param body:
+        :param scope: if given, its content-length header is updated
+        :return:
+        """
+        self.messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+        self._body = body
+        if scope is not None:
+            scope['headers'] = [(name, value) for name, value in scope['headers'] if name != b'content-length'] + \
+                [(b'content-length', str(len(body)).encode('latin-1'))]
+
+    def replay(self) -> starlette.types.Receive:
+        """
+        Receive callable returning the captured messages, then the messages of the original receive.
+
+        :return:
+        """
+        messages = iter(self.messages)
+
+        async def receive() -> starlette.types.Message:
+            message = next(messages, None)
+            if message is not None:
+                return message
+            return await self._receive()
+
+        return receive
+
+
+async def capture_body(scope: starlette.types.Scope, receive: starlette.types.Receive) -> CapturedBody:
+    """
+    Receive the body of the request, unless an upstream middleware already did.
+
+    :param scope:
+    :param receive:
+    :return:
+    """
+    if scope.get('extensions') is None:
+        scope['extensions'] = {}
+    extensions = scope['extensions']
+    captured = extensions.get(SCOPE_EXTENSION)
+    if captured is None:
+        messages = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            messages.append(message)
+            more_body = message.get('more_body', False)
+        captured = extensions[SCOPE_EXTENSION] = CapturedBody(messages=messages, receive=receive)
+    return captured
@@ -0,0 +1,40 @@
+import hashlib
+import typing
+
+
+# responses are revalidated before every reuse, so shared caches may store them even for authenticated requests,
+# responses which vary by user must only be stored by the client
+CACHE_CONTROL = 'public, no-cache'
+PRIVATE_CACHE_CONTROL = 'private, no-cache'
+
+
+def compute_etag(rows: typing.Iterable[typing.Any], id_column: str, version_column: str = 'modified_at') -> str:
+    """
+    Strong ETag of the rows, derived from their ids and modification times.
+    The ids are included, so the ETag of a list changes when a row is added or deleted.
+
+    :param rows:
+    :param id_column:
+    :param version_column:
+    :return:
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for row in rows:
+        mapping = row._mapping
+        digest.update(f'{mapping[id_column]}\x00{mapping[version_column]}\x00'.encode('utf-8'))
+    return f'"{digest.hexdigest()}"'
+
+
+def etag_matches(if_none_match: typing.Optional[str], etag: str) -> bool:
+    """
+    Check the If-None-Match header against the ETag (weak comparison as required by RFC 9110).
+
+    :param if_none_match:
+    :param etag:
+    :return:
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    return any(candidate.strip().removeprefix('W/') == etag for candidate in if_none_match.split(','))
@@ -0,0 +1,41 @@
+import csv
+import io
+import typing
+
+import backend.app.REST.utils.json_handling
+
+
+MEDIA_TYPES = {'ndjson': 'application/x-ndjson',
+               'csv': 'text/csv'}
+
+
+async def ndjson_chunks(partitions: typing.AsyncIterator[typing.List[typing.Any]]) -> typing.AsyncIterator[bytes]:
+    """
+    Encode batches of rows as NDJSON, one chunk per batch.
+
+    :param partitions:
+    :return:
+    """
+    async for rows in partitions:
+        yield b''.join(backend.app.REST.utils.json_handling.dumps(dict(row._mapping)) + b'\n' for row in rows)
+
+
+async def csv_chunks(partitions: typing.AsyncIterator[typing.List[typing.Any]], columns: typing.List[str]) \
+        -> typing.AsyncIterator[bytes]:
+    """
+    Encode batches of rows as CSV with a header line, one chunk per batch.
+
+    :param partitions:
+    :param columns:
+    :return:
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    async for rows in partitions:
+        writer.writerows([row._mapping[column] for column in columns] for row in rows)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
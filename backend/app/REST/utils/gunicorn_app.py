@@ -1,5 +1,20 @@
 import gunicorn.app.base
 
+import backend.database.queries_async
+import backend.database.queries_v2
+
+
+def post_fork(server, worker):
+    """
+    Drop the database connections inherited from the master process.
+
+    :param server:
+    :param worker:
+    :return:
+    """
+    backend.database.queries_v2.dispose_engines(close=False)
+    backend.database.queries_async.dispose_engines(close=False)
+
 
 class GunicornApp(gunicorn.app.base.BaseApplication):
     """
@@ -14,6 +29,7 @@ class GunicornApp(gunicorn.app.base.BaseApplication):
     def load_config(self):
         config = {key: value for key, value in self.options.items()
                   if key in self.cfg.settings and value is not None}
+        config.setdefault('post_fork', post_fork)
         for key, value in config.items():
             self.cfg.set(key.lower(), value)
 
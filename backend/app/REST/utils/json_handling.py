@@ -1,21 +1,117 @@
+import datetime
 import json
 import typing
+import uuid
+
+import pydantic
 
 import backend.database.schemas
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _json_default(value: typing.Any) -> str:
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
 
-def serialize_result(result: typing.Union[typing.Any, typing.List[typing.Any]]):
+
+def dumps(value: typing.Any) -> bytes:
     """
+    Serialize to JSON bytes, UUIDs, dates and datetimes are handled natively.
+    orjson is used if it is installed.
 
-    :param result:
+    :param value:
     :return:
     """
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, default=_json_default, separators=(',', ':')).encode('utf-8')
 
-    # Pydantic has currently no functionality to directly create a jsonable dict,
-    # workaround according to the following discussion:
-    # https://stackoverflow.com/questions/65622045/pydantic-convert-to-jsonable-dict-not-full-json-string
-    if isinstance(result, list):
-        result_ = [json.loads(backend.database.schemas.Child.from_orm(r).json()) for r in result]
+
+def loads(value: typing.Union[bytes, str]) -> typing.Any:
+    """
+    Parse JSON, orjson is used if it is installed.
+
+    :param value:
+    :return:
+    """
+    if orjson is not None:
+        return orjson.loads(value)
+    return json.loads(value)
+
+
+def row_to_dict(row: typing.Any, fields: typing.Optional[typing.Iterable[str]] = None) -> dict:
+    """
+    Convert a SQLAlchemy row, a named tuple or an ORM object into a dict.
+
+    :param row:
+    :param fields: fields to keep, default: all fields of the row (required for ORM objects)
+    :return:
+    """
+    if hasattr(row, '_mapping'):
+        mapping = row._mapping
+    elif hasattr(row, '_asdict'):
+        mapping = row._asdict()
+    elif isinstance(row, dict):
+        mapping = row
     else:
-        result_ = json.loads(backend.database.schemas.Child.from_orm(result).json())
-    return result_
+        return {field: getattr(row, field) for field in fields}
+    if fields is None:
+        return dict(mapping)
+    return {field: mapping[field] for field in fields}
+
+
+def project_result(result: typing.Union[typing.Any, typing.List[typing.Any]],
+                   schema: typing.Type[pydantic.BaseModel] = backend.database.schemas.Child) \
+        -> typing.Union[dict, typing.List[dict]]:
+    """
+    Project the result on the fields of the schema, without validation.
+
+    :param result: a row or a list of rows
+    :param schema: pydantic schema, whose fields are kept
+    :return:
+    """
+    fields = list(schema.__fields__)
+    if isinstance(result, list):
+        return [row_to_dict(r, fields=fields) for r in result]
+    return row_to_dict(result, fields=fields)
+
+
+def _jsonable(row: dict) -> dict:
+    return {key: _json_default(value) if isinstance(value, (uuid.UUID, datetime.date)) else value
+            for key, value in row.items()}
+
+
+def serialize_result(result: typing.Union[typing.Any, typing.List[typing.Any]],
+                     schema: typing.Type[pydantic.BaseModel] = backend.database.schemas.Child) \
+        -> typing.Union[dict, typing.List[dict]]:
+    """
+    Convert the result into jsonable dicts with the fields of the schema.
+    Use dumps_result, if the result is serialized to JSON anyway.
+
+    :param result: a row or a list of rows
+    :param schema:
+    :return:
+    """
+    projected = project_result(result=result, schema=schema)
+    if isinstance(projected, list):
+        return [_jsonable(r) for r in projected]
+    return _jsonable(projected)
+
+
+def dumps_result(result: typing.Union[typing.Any, typing.List[typing.Any]],
+                 schema: typing.Type[pydantic.BaseModel] = backend.database.schemas.Child) -> bytes:
+    """
+    Serialize the result directly into JSON bytes with the fields of the schema.
+
+    :param result: a row or a list of rows
+    :param schema:
+    :return:
+    """
+    return dumps(project_result(result=result, schema=schema))
@@ -0,0 +1,141 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+import typing
+
+import dotenv
+
+import backend.database.queries_v2
+
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class LogWriter:
+    """
+    Write-behind queue for the API logging.
+
+    Log entries are buffered in memory and written by a background thread in batches,
+    which are flushed once batch_size entries are collected or flush_interval seconds have passed.
+    The buffer holds at most max_pending entries, further entries are dropped and counted:
+    submit is called on the event loop and must never block.
+    """
+
+    def __init__(self, batch_size: int = 100, flush_interval: float = 1.0, max_pending: int = 10000) -> None:
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=max_pending)
+        self._thread: typing.Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, log_entry: dict) -> bool:
+        """
+        Queue a log entry, entries with the same request_id are merged.
+
+        :param log_entry:
+        :return: False, if the entry was dropped
+        """
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(log_entry)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        return True
+
+    def close(self, timeout: float = 10.0) -> None:
+        """
+        Flush the pending entries and stop the background thread.
+
+        :param timeout:
+        :return:
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout=timeout)
+
+    def statistics(self) -> dict[str, int]:
+        """
+
+        :return:
+        """
+        with self._lock:
+            return {'pending': self._queue.qsize(), 'written': self.written,
+                    'dropped': self.dropped, 'failed': self.failed}
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        stopped = False
+        while not stopped:
+            batch, stopped = self._next_batch()
+            if batch:
+                self._write(batch)
+
+    def _next_batch(self) -> typing.Tuple[list[dict], bool]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size and batch[-1] is not _STOP:
+            try:
+                batch.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0)))
+            except queue.Empty:
+                break
+        if batch[-1] is _STOP:
+            return batch[:-1], True
+        return batch, False
+
+    def _write(self, batch: list[dict]) -> None:
+        log_entries = dict()
+        for log_entry in batch:
+            log_entries.setdefault(log_entry['request_id'], dict()).update(log_entry)
+
+        db_config = backend.database.queries_v2.get_database_config()
+        db = backend.database.queries_v2.create_session(db_config=db_config)
+        try:
+            backend.database.queries_v2.write_logging_batch(db=db, log_entries=list(log_entries.values()))
+        except Exception:
+            logger.exception('Writing %d log entries failed', len(log_entries))
+            with self._lock:
+                self.failed += len(batch)
+        else:
+            with self._lock:
+                self.written += len(batch)
+        finally:
+            db.close()
+
+
+_log_writer: typing.Optional[LogWriter] = None
+
+
+def get_log_writer() -> LogWriter:
+    """
+    Return the process-wide log writer, configured from the environment.
+
+    :return:
+    """
+    global _log_writer
+    if _log_writer is None:
+        dotenv.load_dotenv()
+        _log_writer = LogWriter(batch_size=int(os.environ.get('LOG_BATCH_SIZE', 100)),
+                                flush_interval=float(os.environ.get('LOG_FLUSH_INTERVAL', 1.0)),
+                                max_pending=int(os.environ.get('LOG_MAX_PENDING', 10000)))
+        atexit.register(_log_writer.close)
+    return _log_writer
@@ -0,0 +1,40 @@
+import base64
+import datetime
+import json
+import typing
+import uuid
+
+
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+
+def encode_cursor(sort_value: typing.Any, id_value: uuid.UUID) -> str:
+    """
+    Build an opaque cursor from the sort value and the id of the last row of a page.
+
+    :param sort_value:
+    :param id_value:
+    :return:
+    """
+    if isinstance(sort_value, (datetime.date, datetime.datetime)):
+        sort_value = sort_value.isoformat()
+    payload = json.dumps([sort_value, str(id_value)], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, parse_sort_value: typing.Callable[[str], typing.Any] = datetime.datetime.fromisoformat) \
+        -> typing.Tuple[typing.Any, uuid.UUID]:
+    """
+    Decode a cursor created by encode_cursor.
+
+    :param cursor:
+    :param parse_sort_value: parser restoring the sort value from its JSON representation
+    :return: sort value and id
+    :raises ValueError: if the cursor is malformed
+    """
+    try:
+        payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        sort_value, id_value = json.loads(payload)
+        return parse_sort_value(sort_value), uuid.UUID(id_value)
+    except (TypeError, ValueError, UnicodeDecodeError) as exc:
+        raise ValueError('Invalid cursor') from exc
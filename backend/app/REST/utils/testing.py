@@ -12,6 +12,7 @@ import sqlalchemy.orm
 import sqlalchemy.pool
 
 import backend.database.models
+import backend.database.queries_async
 import backend.database.queries_v2
 import backend.database.usermanagement
 
@@ -57,6 +58,14 @@ def create_local_engine(test_db_name: str):
     return engine
 
 
+def create_local_async_engine(test_db_name: str):
+    db_config = backend.database.queries_v2.get_database_config()
+    db_config['database'] = test_db_name
+    engine = backend.database.queries_async.create_engine(
+        url=backend.database.queries_async.create_url(db_config=db_config))
+    return engine
+
+
 class TestingServer(unittest.TestCase):
 
     test_db_name = 'jqngxgdxla'
@@ -72,7 +81,9 @@ class TestingServer(unittest.TestCase):
         engine = create_local_engine(test_db_name=cls.test_db_name)
         session = sqlalchemy.orm.Session(autocommit=False, autoflush=False, bind=engine, future=True)
 
-        # create tables
+        # create extensions and tables, the exclusion constraint of the caretimes requires btree_gist
+        with engine.begin() as connection:
+            connection.execute(sqlalchemy.text('CREATE EXTENSION IF NOT EXISTS btree_gist'))
         backend.database.models.Base.metadata.create_all(bind=engine)
 
         # add user
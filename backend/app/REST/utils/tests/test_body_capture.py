@@ -0,0 +1,71 @@
+import asyncio
+
+import backend.app.REST.utils.body_capture
+
+
+def create_receive(chunks):
+    messages = [{'type': 'http.request', 'body': chunk, 'more_body': i < len(chunks) - 1}
+                for i, chunk in enumerate(chunks)] + [{'type': 'http.disconnect'}]
+    calls = []
+
+    async def receive():
+        calls.append(1)
+        return messages[len(calls) - 1]
+
+    return receive, calls
+
+
+def test_capture_body_once_per_request():
+    receive, calls = create_receive([b'{"name": ', b'"Anna"}'])
+    scope = {'type': 'http'}
+
+    async def run():
+        first = await backend.app.REST.utils.body_capture.capture_body(scope=scope, receive=receive)
+        second = await backend.app.REST.utils.body_capture.capture_body(scope=scope, receive=first.replay())
+        replay = second.replay()
+        return first, second, [await replay() for _ in range(3)]
+
+    first, second, replayed = asyncio.run(run())
+
+    assert first is second
+    assert first.body == b'{"name": "Anna"}'
+    assert [message.get('body') for message in replayed] == [b'{"name": ', b'"Anna"}', None]
+    assert replayed[-1]['type'] == 'http.disconnect'
+    assert len(calls) == 3
+
+
+def test_captured_body_single_chunk_is_not_copied():
+    chunk = b'x' * 100000
+    captured = backend.app.REST.utils.body_capture.CapturedBody(
+        messages=[{'type': 'http.request', 'body': chunk}], receive=None)
+
+    assert captured.body is chunk
+    assert captured.head(limit=200000) is chunk
+
+
+def test_captured_body_text_is_cut_at_limit():
+    captured = backend.app.REST.utils.body_capture.CapturedBody(
+        messages=[{'type': 'http.request', 'body': 'abc'.encode('utf-8'), 'more_body': True},
+                  {'type': 'http.request', 'body': 'äöü'.encode('utf-8')}], receive=None)
+
+    assert captured.head(limit=6) == b'abc\xc3\xa4\xc3'
+    assert captured.text(limit=6) == 'abcä'
+    assert captured.size == 9
+
+
+def test_captured_body_text_replaces_invalid_bytes():
+    captured = backend.app.REST.utils.body_capture.CapturedBody(
+        messages=[{'type': 'http.request', 'body': b'a\xffb\xc3'}], receive=None)
+
+    assert captured.text(limit=4) == 'a\ufffdb'
+
+
+def test_captured_body_replace():
+    captured = backend.app.REST.utils.body_capture.CapturedBody(
+        messages=[{'type': 'http.request', 'body': b'abc', 'more_body': True},
+                  {'type': 'http.request', 'body': b'def'}], receive=None)
+
+    captured.replace(b'xyz')
+
+    assert captured.body == b'xyz'
+    assert asyncio.run(captured.replay()()) == {'type': 'http.request', 'body': b'xyz', 'more_body': False}
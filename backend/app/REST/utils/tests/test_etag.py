@@ -0,0 +1,32 @@
+import datetime
+import uuid
+
+import sqlalchemy.engine.result
+
+import backend.app.REST.utils.etag
+
+
+Row = sqlalchemy.engine.result.result_tuple(['child_id', 'name', 'modified_at'])
+
+
+def test_compute_etag_changes_with_rows():
+    first = Row((uuid.uuid4(), 'Anna', datetime.datetime(2023, 7, 24, 18)))
+    second = Row((uuid.uuid4(), 'Ben', datetime.datetime(2023, 7, 24, 18)))
+    modified = Row((first.child_id, 'Anna', datetime.datetime(2023, 7, 24, 19)))
+
+    etag = backend.app.REST.utils.etag.compute_etag(rows=[first, second], id_column='child_id')
+
+    assert etag.startswith('"') and etag.endswith('"')
+    assert etag == backend.app.REST.utils.etag.compute_etag(rows=[first, second], id_column='child_id')
+    assert etag != backend.app.REST.utils.etag.compute_etag(rows=[first], id_column='child_id')
+    assert etag != backend.app.REST.utils.etag.compute_etag(rows=[modified, second], id_column='child_id')
+
+
+def test_etag_matches():
+    etag = '"abc"'
+
+    assert backend.app.REST.utils.etag.etag_matches(if_none_match='"abc"', etag=etag)
+    assert backend.app.REST.utils.etag.etag_matches(if_none_match='"xyz", W/"abc"', etag=etag)
+    assert backend.app.REST.utils.etag.etag_matches(if_none_match='*', etag=etag)
+    assert not backend.app.REST.utils.etag.etag_matches(if_none_match='"xyz"', etag=etag)
+    assert not backend.app.REST.utils.etag.etag_matches(if_none_match=None, etag=etag)
@@ -0,0 +1,51 @@
+import datetime
+import json
+import uuid
+
+import sqlalchemy.engine.result
+
+import backend.app.REST.utils.json_handling
+import backend.database.schemas
+
+
+CHILD_FIELDS = ['child_id', 'name', 'sur_name', 'birth_day', 'created_at']
+
+
+def create_child_row():
+    row = sqlalchemy.engine.result.result_tuple(CHILD_FIELDS + ['modified_at'])
+    return row((uuid.UUID('6a0c2e64-2f1a-4f3c-9c55-7f0d2b1e6a11'), 'Anna', 'Meyer', datetime.date(2020, 5, 17),
+                datetime.datetime(2023, 1, 2, 7, 30, 15, 250), datetime.datetime(2023, 1, 3)))
+
+
+def test_dumps_result_matches_pydantic():
+    row = create_child_row()
+
+    result = backend.app.REST.utils.json_handling.dumps_result(result=[row, row])
+
+    expected = [json.loads(backend.database.schemas.Child.from_orm(row).json())] * 2
+    assert json.loads(result) == expected
+
+
+def test_serialize_result_projects_schema_fields():
+    caretime_row = sqlalchemy.engine.result.result_tuple(
+        ['caretime_id', 'child_id', 'start_time', 'stop_time', 'created_at', 'modified_at', 'extra'])(
+        (uuid.uuid4(), uuid.uuid4(), datetime.datetime(2023, 1, 2, 7, 30), None,
+         datetime.datetime(2023, 1, 2), datetime.datetime(2023, 1, 2), 'not in the schema'))
+
+    child = backend.app.REST.utils.json_handling.serialize_result(result=create_child_row())
+    caretime = backend.app.REST.utils.json_handling.serialize_result(result=caretime_row,
+                                                                     schema=backend.database.schemas.Caretime)
+
+    assert sorted(child) == sorted(CHILD_FIELDS)
+    assert child['birth_day'] == '2020-05-17'
+    assert caretime['start_time'] == '2023-01-02T07:30:00'
+    assert caretime['stop_time'] is None
+    assert 'extra' not in caretime
+
+
+def test_dumps_without_orjson(monkeypatch):
+    monkeypatch.setattr(backend.app.REST.utils.json_handling, 'orjson', None)
+
+    result = backend.app.REST.utils.json_handling.dumps_result(result=create_child_row())
+
+    assert json.loads(result) == json.loads(backend.database.schemas.Child.from_orm(create_child_row()).json())
@@ -0,0 +1,148 @@
+"""
+Benchmark of the caretime queries before and after adding the child foreign key and the covering index
+(alembic revision b82f4c0d6e17).
+
+A scratch database is seeded with the caretimes table as created by revision f589d458cf2b,
+the query plans and timings of the caretime queries of queries_v2 are printed, the index and
+the foreign key are added and the queries are explained again. The scratch database is dropped afterwards.
+
+Usage:
+    python -m backend.benchmarks.caretimes_query_plans --children 10000 --caretimes 3000000
+"""
+import argparse
+import time
+
+import psycopg2
+import psycopg2.sql
+
+import backend.database.queries_v2
+
+
+SCRATCH_DB_NAME = 'caretimes_benchmark'
+
+SCHEMA = """
+CREATE TABLE children (
+    child_id uuid PRIMARY KEY,
+    name varchar(20),
+    sur_name varchar(20),
+    birth_day date,
+    created_at timestamp DEFAULT now()
+);
+CREATE TABLE caretimes (
+    caretime_id uuid PRIMARY KEY,
+    child_id uuid,
+    start_time timestamp,
+    stop_time timestamp,
+    created_at timestamp DEFAULT now(),
+    modified_at timestamp DEFAULT now()
+);
+"""
+
+SEED = """
+INSERT INTO children (child_id, name, sur_name, birth_day)
+SELECT md5(i::text || 'child')::uuid, 'name_' || i, 'sur_name_' || i, date '2018-01-01' + (i %% 1500)
+FROM generate_series(1, %(children)s) AS i;
+
+INSERT INTO caretimes (caretime_id, child_id, start_time, stop_time)
+SELECT md5(i::text || 'caretime')::uuid,
+       md5((i %% %(children)s + 1)::text || 'child')::uuid,
+       timestamp '2020-01-01 07:00' + (i / %(children)s) * interval '1 day',
+       timestamp '2020-01-01 15:30' + (i / %(children)s) * interval '1 day'
+FROM generate_series(1, %(caretimes)s) AS i;
+"""
+
+MIGRATION = """
+ALTER TABLE caretimes ADD CONSTRAINT fk_caretimes_child_id_children
+    FOREIGN KEY (child_id) REFERENCES children (child_id) ON DELETE CASCADE;
+CREATE INDEX ix_caretimes_child_id_start_time ON caretimes (child_id, start_time, caretime_id) INCLUDE (stop_time);
+"""
+
+QUERIES = {
+    'fetch_caretimes': """
+        SELECT * FROM caretimes WHERE child_id = %(child_id)s
+        ORDER BY start_time, caretime_id LIMIT 10""",
+    'fetch_caretimes (time range)': """
+        SELECT child_id, start_time, stop_time FROM caretimes
+        WHERE child_id = %(child_id)s AND start_time >= %(start)s AND start_time < %(stop)s""",
+    'fetch_single_caretime': """
+        SELECT * FROM caretimes WHERE child_id = %(child_id)s AND caretime_id = %(caretime_id)s""",
+    'edit_caretime': """
+        UPDATE caretimes SET stop_time = stop_time
+        WHERE child_id = %(child_id)s AND caretime_id = %(caretime_id)s""",
+    'delete_caretime': """
+        DELETE FROM caretimes WHERE child_id = %(child_id)s AND caretime_id = %(caretime_id)s""",
+}
+
+
+def connect(database: str):
+    db_config = backend.database.queries_v2.get_database_config()
+    db_config['user'] = db_config.pop('username')
+    db_config['database'] = database
+    conn = psycopg2.connect(**db_config)
+    conn.autocommit = True
+    return conn
+
+
+def explain(cursor, parameters: dict, repetitions: int) -> None:
+    for name, query in QUERIES.items():
+        cursor.execute('BEGIN')
+        cursor.execute(f'EXPLAIN (ANALYZE, BUFFERS) {query}', parameters)
+        plan = '\n'.join(f'    {row[0]}' for row in cursor.fetchall())
+        cursor.execute('ROLLBACK')
+
+        start = time.perf_counter()
+        for _ in range(repetitions):
+            cursor.execute('BEGIN')
+            cursor.execute(query, parameters)
+            cursor.execute('ROLLBACK')
+        elapsed_ms = (time.perf_counter() - start) / repetitions * 1000
+
+        print(f'-- {name}: {elapsed_ms:.2f} ms per query')
+        print(plan)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--children', type=int, default=10000)
+    parser.add_argument('--caretimes', type=int, default=3000000)
+    parser.add_argument('--repetitions', type=int, default=20)
+    args = parser.parse_args()
+
+    admin_conn = connect(database=backend.database.queries_v2.get_database_config()['database'])
+    admin_cursor = admin_conn.cursor()
+    admin_cursor.execute(psycopg2.sql.SQL('DROP DATABASE IF EXISTS {}').format(
+        psycopg2.sql.Identifier(SCRATCH_DB_NAME)))
+    admin_cursor.execute(psycopg2.sql.SQL('CREATE DATABASE {}').format(psycopg2.sql.Identifier(SCRATCH_DB_NAME)))
+    try:
+        conn = connect(database=SCRATCH_DB_NAME)
+        cursor = conn.cursor()
+        cursor.execute(SCHEMA)
+        print(f'Seeding {args.children} children and {args.caretimes} caretimes ...')
+        cursor.execute(SEED, {'children': args.children, 'caretimes': args.caretimes})
+        cursor.execute('ANALYZE')
+
+        cursor.execute('SELECT child_id, caretime_id, start_time FROM caretimes '
+                       'OFFSET %(offset)s LIMIT 1', {'offset': args.caretimes // 2})
+        child_id, caretime_id, start_time = cursor.fetchone()
+        parameters = {'child_id': child_id, 'caretime_id': caretime_id,
+                      'start': start_time, 'stop': start_time.replace(year=start_time.year + 1)}
+
+        print('\n==== before (no index on caretimes.child_id) ====')
+        explain(cursor=cursor, parameters=parameters, repetitions=args.repetitions)
+
+        cursor.execute(MIGRATION)
+        cursor.execute('ANALYZE')
+        print('\n==== after (foreign key and covering index) ====')
+        explain(cursor=cursor, parameters=parameters, repetitions=args.repetitions)
+
+        cursor.close()
+        conn.close()
+    finally:
+        admin_cursor.execute(psycopg2.sql.SQL('DROP DATABASE IF EXISTS {}').format(
+            psycopg2.sql.Identifier(SCRATCH_DB_NAME)))
+        admin_cursor.close()
+        admin_conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Micro-benchmark of the serialization of query results into a JSON response body.
+
+Compares the previous path (pydantic .json(), json.loads and json.dumps per row)
+with json_handling.dumps_result on in-memory SQLAlchemy rows, no database is needed.
+
+Usage:
+    python -m backend.benchmarks.serialize_result --rows 10000
+"""
+import argparse
+import datetime
+import json
+import timeit
+import uuid
+
+import sqlalchemy.engine.result
+
+import backend.app.REST.utils.json_handling
+import backend.database.schemas
+
+
+def create_rows(count: int) -> list:
+    row = sqlalchemy.engine.result.result_tuple(['child_id', 'name', 'sur_name', 'birth_day', 'created_at'])
+    created_at = datetime.datetime(2023, 1, 2, 7, 30, 15, 250)
+    return [row((uuid.uuid4(), f'name_{i}', f'sur_name_{i}', datetime.date(2018, 1, 1) + datetime.timedelta(i % 1500),
+                 created_at + datetime.timedelta(seconds=i)))
+            for i in range(count)]
+
+
+def pydantic_round_trip(rows: list) -> bytes:
+    result_ = [json.loads(backend.database.schemas.Child.from_orm(r).json()) for r in rows]
+    return json.dumps(result_).encode('utf-8')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repetitions', type=int, default=10)
+    args = parser.parse_args()
+
+    rows = create_rows(count=args.rows)
+    assert json.loads(pydantic_round_trip(rows)) == json.loads(
+        backend.app.REST.utils.json_handling.dumps_result(result=rows))
+
+    candidates = {
+        'pydantic round trip': lambda: pydantic_round_trip(rows),
+        'serialize_result + json.dumps': lambda: json.dumps(
+            backend.app.REST.utils.json_handling.serialize_result(result=rows)).encode('utf-8'),
+        'dumps_result': lambda: backend.app.REST.utils.json_handling.dumps_result(result=rows),
+    }
+    orjson = backend.app.REST.utils.json_handling.orjson
+    print(f'{args.rows} rows, orjson {"installed" if orjson is not None else "not installed"}')
+    for name, candidate in candidates.items():
+        elapsed_ms = min(timeit.repeat(candidate, number=1, repeat=args.repetitions)) * 1000
+        print(f'{name:32s} {elapsed_ms:8.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
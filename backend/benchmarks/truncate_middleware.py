@@ -0,0 +1,102 @@
+"""
+Benchmark of TruncateMiddleware on multi-megabyte JSON request bodies.
+
+Compares the previous implementation (eval and json.dumps of every body chunk)
+with the current one, for a body containing the truncated field and for a body without it.
+The previous implementation is only fed single-chunk bodies, it cannot parse split bodies.
+
+Usage:
+    python -m backend.benchmarks.truncate_middleware --megabytes 5
+"""
+import argparse
+import asyncio
+import json
+import timeit
+
+import backend.app.REST.fastapi.middleware
+
+
+async def app(scope, receive, send):
+    more_body = True
+    while more_body:
+        message = await receive()
+        more_body = message.get('more_body', False)
+
+
+class LegacyTruncateMiddleware:
+    def __init__(self, app, long_param: str, limit: int) -> None:
+        self.app = app
+        self.long_param = long_param
+        self.limit = limit
+
+    async def __call__(self, scope, receive, send) -> None:
+        messages = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            messages.append(message)
+            more_body = message.get('more_body', False)
+        trunc_messages = []
+        for m in messages:
+            bd = eval(m['body'])
+            if long_param := bd.get(self.long_param):
+                bd[self.long_param] = long_param[:self.limit]
+                m.update({'body': json.dumps(bd).encode('utf-8')})
+            trunc_messages.append(m)
+
+        async def wrapped_receive():
+            if trunc_messages:
+                return trunc_messages.pop(0)
+            return await receive()
+
+        await self.app(scope, wrapped_receive, send)
+
+
+def create_body(megabytes: int, with_field: bool) -> bytes:
+    records = []
+    size = 0
+    while size < megabytes * 1024 * 1024:
+        record = {'name': f'name_{len(records)}', 'sur_name': f'sur_name_{len(records)}', 'notes': 'x' * 200}
+        records.append(record)
+        size += len(json.dumps(record))
+    document = {'children': records}
+    if with_field:
+        document['long_txt'] = 'y' * 10000
+    return json.dumps(document).encode('utf-8')
+
+
+def run(middleware, body: bytes, chunk_size: int) -> None:
+    chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+    messages = [{'type': 'http.request', 'body': chunk, 'more_body': i < len(chunks) - 1}
+                for i, chunk in enumerate(chunks)]
+    scope = {'type': 'http', 'method': 'POST', 'headers': [(b'content-length', str(len(body)).encode())]}
+
+    async def receive():
+        return messages.pop(0)
+
+    asyncio.run(middleware(scope, receive, None))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--megabytes', type=int, default=5)
+    parser.add_argument('--repetitions', type=int, default=5)
+    args = parser.parse_args()
+
+    legacy = LegacyTruncateMiddleware(app=app, long_param='long_txt', limit=10)
+    current = backend.app.REST.fastapi.middleware.TruncateMiddleware(app=app, long_param='long_txt', limit=10)
+    for with_field in (True, False):
+        body = create_body(megabytes=args.megabytes, with_field=with_field)
+        print(f'{len(body) / 1024 / 1024:.1f} MB body, {"with" if with_field else "without"} long_txt')
+        candidates = {
+            'eval per chunk (single chunk)': lambda: run(legacy, body=body, chunk_size=len(body)),
+            'json parser (single chunk)': lambda: run(current, body=body, chunk_size=len(body)),
+            'json parser (64 KB chunks)': lambda: run(current, body=body, chunk_size=64 * 1024),
+        }
+        for name, candidate in candidates.items():
+            elapsed_ms = min(timeit.repeat(candidate, number=1, repeat=args.repetitions)) * 1000
+            print(f'    {name:32s} {elapsed_ms:8.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""add pagination indexes
+
+Revision ID: 3c7d2e91a4b6
+Revises: 495568fce361
+Create Date: 2026-10-18 10:12:31.482915
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c7d2e91a4b6'
+down_revision = '495568fce361'
+branch_labels = None
+depends_on = None
+
+CHILDREN_WITHOUT_CREATED_AT = 'SELECT child_id FROM children WHERE created_at IS NULL ORDER BY child_id'
+CARETIMES_WITHOUT_START_TIME = 'SELECT caretime_id FROM caretimes WHERE start_time IS NULL ORDER BY caretime_id'
+
+
+def upgrade():
+    # the keyset pagination compares (created_at, child_id) and (start_time, caretime_id) as rows,
+    # which is served by a range scan of the indexes only for NOT NULL sort columns;
+    # rows without them are reported, they must be corrected first
+    connection = op.get_bind()
+    children = [str(child_id) for child_id, in connection.execute(sa.text(CHILDREN_WITHOUT_CREATED_AT))]
+    caretimes = [str(caretime_id) for caretime_id, in connection.execute(sa.text(CARETIMES_WITHOUT_START_TIME))]
+    if children or caretimes:
+        raise RuntimeError('rows must be corrected first, '
+                           f'children without created_at: {", ".join(children) or "none"}; '
+                           f'caretimes without start_time: {", ".join(caretimes) or "none"}')
+    op.alter_column('children', 'created_at', existing_type=sa.DateTime(), nullable=False)
+    op.alter_column('caretimes', 'start_time', existing_type=sa.DateTime(), nullable=False)
+    op.create_index('ix_children_created_at_child_id', 'children', ['created_at', 'child_id'])
+    op.create_index('ix_caretimes_child_id_start_time_caretime_id', 'caretimes',
+                    ['child_id', 'start_time', 'caretime_id'])
+
+
+def downgrade():
+    op.drop_index('ix_caretimes_child_id_start_time_caretime_id', table_name='caretimes')
+    op.drop_index('ix_children_created_at_child_id', table_name='children')
+    op.alter_column('caretimes', 'start_time', existing_type=sa.DateTime(), nullable=True)
+    op.alter_column('children', 'created_at', existing_type=sa.DateTime(), nullable=True)
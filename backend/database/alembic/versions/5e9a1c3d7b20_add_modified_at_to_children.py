@@ -0,0 +1,25 @@
+"""add modified_at to children table
+
+Revision ID: 5e9a1c3d7b20
+Revises: b82f4c0d6e17
+Create Date: 2026-10-18 14:26:08.531877
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e9a1c3d7b20'
+down_revision = 'b82f4c0d6e17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('children', sa.Column('modified_at', sa.DateTime(), server_default=sa.func.now()))
+    op.execute('UPDATE children SET modified_at = coalesce(created_at, modified_at)')
+
+
+def downgrade():
+    op.drop_column('children', 'modified_at')
@@ -0,0 +1,59 @@
+"""create care_days rollup
+
+Revision ID: 7f3b9e2c5a18
+Revises: 5e9a1c3d7b20
+Create Date: 2026-10-18 16:02:47.215390
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlalchemy.dialects.postgresql
+
+import backend.database.models
+
+
+# revision identifiers, used by Alembic.
+revision = '7f3b9e2c5a18'
+down_revision = '5e9a1c3d7b20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'care_days',
+        sa.Column('child_id', sqlalchemy.dialects.postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('day', sa.Date(), primary_key=True),
+        sa.Column('care_seconds', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['child_id'], ['children.child_id'], name='fk_care_days_child_id_children',
+                                ondelete='CASCADE'),
+    )
+    op.create_index('ix_care_days_day', 'care_days', ['day'])
+    op.create_table(
+        'care_days_dirty',
+        sa.Column('child_id', sqlalchemy.dialects.postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('day', sa.Date(), primary_key=True),
+    )
+    op.create_index('ix_caretimes_modified_at', 'caretimes', ['modified_at'])
+    # the same function and trigger as created with the tables
+    op.execute(backend.database.models.CARE_DAYS_MARK_DIRTY_FUNCTION)
+    op.execute(backend.database.models.CARE_DAYS_DIRTY_TRIGGER)
+    # the days of the existing caretimes are computed by the first refresh
+    op.execute("""
+        INSERT INTO care_days_dirty (child_id, day)
+        SELECT DISTINCT caretimes.child_id, days.day::date
+        FROM caretimes
+        CROSS JOIN LATERAL generate_series(date_trunc('day', caretimes.start_time),
+                                           caretimes.stop_time - interval '1 microsecond',
+                                           interval '1 day') AS days(day)
+        WHERE caretimes.stop_time > caretimes.start_time
+    """)
+
+
+def downgrade():
+    op.execute('DROP TRIGGER caretimes_care_days_dirty ON caretimes')
+    op.execute('DROP FUNCTION care_days_mark_dirty()')
+    op.drop_index('ix_caretimes_modified_at', table_name='caretimes')
+    op.drop_table('care_days_dirty')
+    op.drop_index('ix_care_days_day', table_name='care_days')
+    op.drop_table('care_days')
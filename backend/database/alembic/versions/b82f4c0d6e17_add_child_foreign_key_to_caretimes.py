@@ -0,0 +1,34 @@
+"""add child foreign key and covering index to caretimes table
+
+Revision ID: b82f4c0d6e17
+Revises: 3c7d2e91a4b6
+Create Date: 2026-10-18 11:03:52.207164
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b82f4c0d6e17'
+down_revision = '3c7d2e91a4b6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # children used to be deleted without their caretimes, the orphans would fail the foreign key
+    op.execute('DELETE FROM caretimes c WHERE NOT EXISTS (SELECT 1 FROM children WHERE child_id = c.child_id)')
+    op.create_foreign_key('fk_caretimes_child_id_children', 'caretimes', 'children',
+                          ['child_id'], ['child_id'], ondelete='CASCADE')
+    # the covering index supersedes the pagination index, it additionally serves the time-range scans
+    op.drop_index('ix_caretimes_child_id_start_time_caretime_id', table_name='caretimes')
+    op.create_index('ix_caretimes_child_id_start_time', 'caretimes',
+                    ['child_id', 'start_time', 'caretime_id'], postgresql_include=['stop_time'])
+
+
+def downgrade():
+    op.drop_index('ix_caretimes_child_id_start_time', table_name='caretimes')
+    op.create_index('ix_caretimes_child_id_start_time_caretime_id', 'caretimes',
+                    ['child_id', 'start_time', 'caretime_id'])
+    op.drop_constraint('fk_caretimes_child_id_children', 'caretimes', type_='foreignkey')
@@ -0,0 +1,58 @@
+"""add caretime overlap constraint
+
+Revision ID: c41d8a6f2e93
+Revises: 7f3b9e2c5a18
+Create Date: 2026-10-18 17:41:12.904166
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41d8a6f2e93'
+down_revision = '7f3b9e2c5a18'
+branch_labels = None
+depends_on = None
+
+# caretimes stopping before they start, they fail the check constraint
+INVERTED_CARETIMES = 'SELECT caretime_id FROM caretimes WHERE stop_time < start_time ORDER BY caretime_id'
+
+# pairs of overlapping caretimes of a child, including several open caretimes, they fail the exclusion constraint;
+# caretimes of zero length never overlap, inverted ones are reported above
+OVERLAPPING_CARETIMES = """
+    SELECT earlier.caretime_id, later.caretime_id
+    FROM caretimes AS earlier
+    JOIN caretimes AS later ON later.child_id = earlier.child_id
+        AND (later.start_time, later.caretime_id) > (earlier.start_time, earlier.caretime_id)
+        AND later.start_time < coalesce(earlier.stop_time, 'infinity')
+        AND later.start_time < coalesce(later.stop_time, 'infinity')
+    ORDER BY earlier.start_time, earlier.caretime_id, later.start_time, later.caretime_id
+"""
+
+
+def upgrade():
+    # required for the equality on child_id in a GiST index
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    # caretimes are billing data, they are not corrected automatically but reported
+    connection = op.get_bind()
+    inverted = [str(caretime_id) for caretime_id, in connection.execute(sa.text(INVERTED_CARETIMES))]
+    overlapping = [f'{earlier} and {later}' for earlier, later in connection.execute(sa.text(OVERLAPPING_CARETIMES))]
+    if inverted or overlapping:
+        raise RuntimeError('caretimes must be corrected first, '
+                           f'stopping before they start: {", ".join(inverted) or "none"}; '
+                           f'overlapping: {", ".join(overlapping) or "none"}')
+    op.create_check_constraint('ck_caretimes_stop_time_after_start_time', 'caretimes', 'stop_time >= start_time')
+    op.create_exclude_constraint(
+        'ex_caretimes_child_id_period', 'caretimes',
+        ('child_id', '='),
+        (sa.text("tsrange(start_time, coalesce(stop_time, 'infinity'), '[)')"), '&&'),
+        using='gist')
+    op.create_index('ix_caretimes_open', 'caretimes', ['child_id'],
+                    postgresql_where=sa.text('stop_time IS NULL'), postgresql_include=['start_time'])
+
+
+def downgrade():
+    op.drop_index('ix_caretimes_open', table_name='caretimes')
+    op.drop_constraint('ex_caretimes_child_id_period', 'caretimes')
+    op.drop_constraint('ck_caretimes_stop_time_after_start_time', 'caretimes')
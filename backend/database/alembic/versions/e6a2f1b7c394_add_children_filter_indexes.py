@@ -0,0 +1,48 @@
+"""add children filter indexes
+
+Revision ID: e6a2f1b7c394
+Revises: c41d8a6f2e93
+Create Date: 2026-10-18 19:08:36.512047
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6a2f1b7c394'
+down_revision = 'c41d8a6f2e93'
+branch_labels = None
+depends_on = None
+
+INCOMPLETE_CHILDREN = 'SELECT child_id FROM children WHERE name IS NULL OR sur_name IS NULL OR birth_day IS NULL ' \
+                      'ORDER BY child_id'
+
+
+def upgrade():
+    # the sort columns of the keyset pagination must not be nullable, see keyset_filter;
+    # children are created with all of them, children without them are reported, they must be corrected first
+    connection = op.get_bind()
+    incomplete = [str(child_id) for child_id, in connection.execute(sa.text(INCOMPLETE_CHILDREN))]
+    if incomplete:
+        raise RuntimeError('children without name, sur_name or birth_day must be corrected first: '
+                           f'{", ".join(incomplete)}')
+    op.alter_column('children', 'name', existing_type=sa.String(20), nullable=False)
+    op.alter_column('children', 'sur_name', existing_type=sa.String(20), nullable=False)
+    op.alter_column('children', 'birth_day', existing_type=sa.Date(), nullable=False)
+    op.create_index('ix_children_name_child_id', 'children', ['name', 'child_id'])
+    op.create_index('ix_children_sur_name_child_id', 'children', ['sur_name', 'child_id'])
+    op.create_index('ix_children_birth_day_child_id', 'children', ['birth_day', 'child_id'])
+    op.create_index('ix_children_lower_name', 'children', [sa.text('lower(name) text_pattern_ops')])
+    op.create_index('ix_children_lower_sur_name', 'children', [sa.text('lower(sur_name) text_pattern_ops')])
+
+
+def downgrade():
+    op.drop_index('ix_children_lower_sur_name', table_name='children')
+    op.drop_index('ix_children_lower_name', table_name='children')
+    op.drop_index('ix_children_birth_day_child_id', table_name='children')
+    op.drop_index('ix_children_sur_name_child_id', table_name='children')
+    op.drop_index('ix_children_name_child_id', table_name='children')
+    op.alter_column('children', 'birth_day', existing_type=sa.Date(), nullable=True)
+    op.alter_column('children', 'sur_name', existing_type=sa.String(20), nullable=True)
+    op.alter_column('children', 'name', existing_type=sa.String(20), nullable=True)
@@ -0,0 +1,211 @@
+import collections
+import logging
+import os
+import pickle
+import threading
+import time
+import typing
+
+import dotenv
+
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """
+    Thread-safe in-memory LRU cache, whose entries expire after a time-to-live.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: collections.OrderedDict[str, typing.Tuple[float, typing.Any]] = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default: typing.Any = None) -> typing.Any:
+        """
+        Return the value cached for the key or the default, if missing or expired.
+
+        :param key:
+        :param default:
+        :return:
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: typing.Any) -> None:
+        """
+        Cache the value, evicting the least recently used entry if the cache is full.
+
+        :param key:
+        :param value:
+        :return:
+        """
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        """
+
+        :param key:
+        :return:
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def delete_prefix(self, prefix: str) -> None:
+        """
+        Delete all entries whose key starts with the prefix.
+
+        :param prefix:
+        :return:
+        """
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        """
+
+        :return:
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class NullCache:
+    """
+    Cache that never holds an entry, for disabling a cache.
+    """
+
+    def get(self, key: str, default: typing.Any = None) -> typing.Any:
+        return default
+
+    def set(self, key: str, value: typing.Any) -> None:
+        pass
+
+    def delete(self, key: str) -> None:
+        pass
+
+    def delete_prefix(self, prefix: str) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+
+class RedisCache:
+    """
+    Cache in a Redis-compatible server, shared by all processes. Requires the optional redis package.
+
+    The values are pickled, so the server must be a trusted local one. Errors of the server are logged
+    and treated as cache misses, the cache never fails a query.
+    """
+
+    def __init__(self, url: str = 'redis://localhost:6379/0', ttl: float = 60.0, namespace: str = 'childcareapp:') \
+            -> None:
+        import redis
+
+        self.ttl = ttl
+        self.namespace = namespace
+        self._client = redis.Redis.from_url(url)
+        self._errors = (redis.RedisError, )
+
+    def get(self, key: str, default: typing.Any = None) -> typing.Any:
+        """
+
+        :param key:
+        :param default:
+        :return:
+        """
+        try:
+            value = self._client.get(self.namespace + key)
+        except self._errors:
+            logger.warning('Reading %s from the cache failed', key, exc_info=True)
+            return default
+        return default if value is None else pickle.loads(value)
+
+    def set(self, key: str, value: typing.Any) -> None:
+        """
+
+        :param key:
+        :param value:
+        :return:
+        """
+        try:
+            self._client.set(self.namespace + key, pickle.dumps(value), px=int(self.ttl * 1000))
+        except self._errors:
+            logger.warning('Writing %s to the cache failed', key, exc_info=True)
+
+    def delete(self, key: str) -> None:
+        """
+
+        :param key:
+        :return:
+        """
+        try:
+            self._client.delete(self.namespace + key)
+        except self._errors:
+            logger.warning('Deleting %s from the cache failed', key, exc_info=True)
+
+    def delete_prefix(self, prefix: str) -> None:
+        """
+        Delete all entries whose key starts with the prefix.
+
+        :param prefix:
+        :return:
+        """
+        try:
+            keys = list(self._client.scan_iter(match=f'{self.namespace}{prefix}*'))
+            if keys:
+                self._client.delete(*keys)
+        except self._errors:
+            logger.warning('Deleting %s* from the cache failed', prefix, exc_info=True)
+
+    def clear(self) -> None:
+        """
+
+        :return:
+        """
+        self.delete_prefix('')
+
+
+_query_cache: typing.Optional[typing.Union[TTLCache, RedisCache, NullCache]] = None
+
+
+def get_query_cache() -> typing.Union[TTLCache, RedisCache, NullCache]:
+    """
+    Return the cache of the child and caretime lookups, configured from the environment on first use.
+
+    QUERY_CACHE_BACKEND selects 'memory' (default), 'redis' (at QUERY_CACHE_URL) or 'none'.
+    The memory cache is local to the process, so writes of other processes are picked up after the TTL.
+
+    :return:
+    """
+    global _query_cache
+    if _query_cache is None:
+        dotenv.load_dotenv()
+        backend_name = os.environ.get('QUERY_CACHE_BACKEND', 'memory')
+        ttl = float(os.environ.get('QUERY_CACHE_TTL', 30))
+        if backend_name == 'redis':
+            _query_cache = RedisCache(url=os.environ.get('QUERY_CACHE_URL', 'redis://localhost:6379/0'), ttl=ttl)
+        elif backend_name == 'none':
+            _query_cache = NullCache()
+        else:
+            _query_cache = TTLCache(maxsize=int(os.environ.get('QUERY_CACHE_SIZE', 4096)), ttl=ttl)
+    return _query_cache
@@ -2,6 +2,7 @@ import uuid
 
 import sqlalchemy
 import sqlalchemy.dialects.postgresql
+import sqlalchemy.event
 import sqlalchemy.orm
 
 
@@ -47,10 +48,34 @@ class Child(Base):
     child_id = sqlalchemy.Column(
         sqlalchemy.dialects.postgresql.UUID(as_uuid=True), primary_key=True, index=True, unique=True
     )
-    name = sqlalchemy.Column(sqlalchemy.String(20))
-    sur_name = sqlalchemy.Column(sqlalchemy.String(20))
-    birth_day = sqlalchemy.Column(sqlalchemy.Date())
-    created_at = sqlalchemy.Column(sqlalchemy.DateTime(), server_default=sqlalchemy.func.now())
+    name = sqlalchemy.Column(sqlalchemy.String(20), nullable=False)
+    sur_name = sqlalchemy.Column(sqlalchemy.String(20), nullable=False)
+    birth_day = sqlalchemy.Column(sqlalchemy.Date(), nullable=False)
+    created_at = sqlalchemy.Column(sqlalchemy.DateTime(), nullable=False, server_default=sqlalchemy.func.now())
+    modified_at = sqlalchemy.Column(sqlalchemy.DateTime(),
+                                    server_default=sqlalchemy.func.now(),
+                                    onupdate=sqlalchemy.func.now())
+
+    __table_args__ = (
+        sqlalchemy.Index('ix_children_created_at_child_id', 'created_at', 'child_id'),
+        sqlalchemy.Index('ix_children_name_child_id', 'name', 'child_id'),
+        sqlalchemy.Index('ix_children_sur_name_child_id', 'sur_name', 'child_id'),
+        sqlalchemy.Index('ix_children_birth_day_child_id', 'birth_day', 'child_id'),
+        # case-insensitive prefix search
+        sqlalchemy.Index('ix_children_lower_name', sqlalchemy.func.lower(name).label('lower_name'),
+                         postgresql_ops={'lower_name': 'text_pattern_ops'}),
+        sqlalchemy.Index('ix_children_lower_sur_name', sqlalchemy.func.lower(sur_name).label('lower_sur_name'),
+                         postgresql_ops={'lower_sur_name': 'text_pattern_ops'}),
+    )
+
+
+def caretime_period(start_time, stop_time):
+    """
+    Time range of a caretime, an open caretime lasts until infinity.
+    Queries must use the same expression to be served by the exclusion constraint's GiST index.
+    """
+    stop = sqlalchemy.func.coalesce(stop_time, sqlalchemy.literal_column("'infinity'"))
+    return sqlalchemy.func.tsrange(start_time, stop, sqlalchemy.literal_column("'[)'"))
 
 
 class Caretime(Base):
@@ -62,11 +87,95 @@ class Caretime(Base):
     caretime_id = sqlalchemy.Column(
         sqlalchemy.dialects.postgresql.UUID(as_uuid=True), primary_key=True, index=True, unique=True
     )
-    child_id = sqlalchemy.Column(sqlalchemy.dialects.postgresql.UUID(as_uuid=True))
-    start_time = sqlalchemy.Column(sqlalchemy.DateTime())
+    child_id = sqlalchemy.Column(sqlalchemy.dialects.postgresql.UUID(as_uuid=True),
+                                 sqlalchemy.ForeignKey('children.child_id', name='fk_caretimes_child_id_children',
+                                                       ondelete='CASCADE'))
+    start_time = sqlalchemy.Column(sqlalchemy.DateTime(), nullable=False)
     stop_time = sqlalchemy.Column(sqlalchemy.DateTime())
     created_at = sqlalchemy.Column(sqlalchemy.DateTime(),
                                    server_default=sqlalchemy.func.now())
     modified_at = sqlalchemy.Column(sqlalchemy.DateTime(),
                                     server_default=sqlalchemy.func.now(),
                                     onupdate=sqlalchemy.func.now())
+
+    __table_args__ = (
+        sqlalchemy.Index('ix_caretimes_child_id_start_time', 'child_id', 'start_time', 'caretime_id',
+                         postgresql_include=['stop_time']),
+        sqlalchemy.Index('ix_caretimes_modified_at', 'modified_at'),
+        sqlalchemy.Index('ix_caretimes_open', 'child_id', postgresql_where=stop_time.is_(None),
+                         postgresql_include=['start_time']),
+        # checked before the exclusion constraint, whose tsrange fails on an inverted interval
+        sqlalchemy.CheckConstraint(stop_time >= start_time, name='ck_caretimes_stop_time_after_start_time'),
+        # the caretimes of a child must not overlap, so a child has at most one open caretime
+        sqlalchemy.dialects.postgresql.ExcludeConstraint((child_id, '='),
+                                                         (caretime_period(start_time, stop_time), '&&'),
+                                                         name='ex_caretimes_child_id_period', using='gist'),
+    )
+
+
+class CareDay(Base):
+    """
+    Table care_days, rollup of the care seconds per child and day
+    """
+    __tablename__ = 'care_days'
+
+    child_id = sqlalchemy.Column(sqlalchemy.dialects.postgresql.UUID(as_uuid=True),
+                                 sqlalchemy.ForeignKey('children.child_id', name='fk_care_days_child_id_children',
+                                                       ondelete='CASCADE'),
+                                 primary_key=True)
+    day = sqlalchemy.Column(sqlalchemy.Date(), primary_key=True)
+    care_seconds = sqlalchemy.Column(sqlalchemy.Integer(), nullable=False)
+
+    __table_args__ = (
+        sqlalchemy.Index('ix_care_days_day', 'day'),
+    )
+
+
+class CareDayDirty(Base):
+    """
+    Table care_days_dirty, days of changed caretimes, which are recomputed by the next refresh of care_days
+    """
+    __tablename__ = 'care_days_dirty'
+
+    child_id = sqlalchemy.Column(sqlalchemy.dialects.postgresql.UUID(as_uuid=True), primary_key=True)
+    day = sqlalchemy.Column(sqlalchemy.Date(), primary_key=True)
+
+
+# the days of the old and of the new state of every changed caretime are recorded for the next refresh of care_days,
+# created with the tables and by migration 7f3b9e2c5a18
+CARE_DAYS_MARK_DIRTY_FUNCTION = sqlalchemy.DDL("""
+    CREATE OR REPLACE FUNCTION care_days_mark_dirty() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            IF OLD.stop_time > OLD.start_time THEN
+                INSERT INTO care_days_dirty (child_id, day)
+                SELECT OLD.child_id, days.day::date
+                FROM generate_series(date_trunc('day', OLD.start_time), OLD.stop_time - interval '1 microsecond',
+                                     interval '1 day') AS days(day)
+                ON CONFLICT DO NOTHING;
+            END IF;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            IF NEW.stop_time > NEW.start_time THEN
+                INSERT INTO care_days_dirty (child_id, day)
+                SELECT NEW.child_id, days.day::date
+                FROM generate_series(date_trunc('day', NEW.start_time), NEW.stop_time - interval '1 microsecond',
+                                     interval '1 day') AS days(day)
+                ON CONFLICT DO NOTHING;
+            END IF;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+""")
+
+CARE_DAYS_DIRTY_TRIGGER = sqlalchemy.DDL("""
+    CREATE TRIGGER caretimes_care_days_dirty
+    AFTER INSERT OR UPDATE OR DELETE ON caretimes
+    FOR EACH ROW EXECUTE FUNCTION care_days_mark_dirty()
+""")
+
+sqlalchemy.event.listen(Caretime.__table__, 'after_create',
+                        CARE_DAYS_MARK_DIRTY_FUNCTION.execute_if(dialect='postgresql'))
+sqlalchemy.event.listen(Caretime.__table__, 'after_create',
+                        CARE_DAYS_DIRTY_TRIGGER.execute_if(dialect='postgresql'))
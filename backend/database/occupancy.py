@@ -0,0 +1,84 @@
+import datetime
+import typing
+
+import numpy
+
+
+MAX_SLOTS = 100_000
+
+
+class Occupancy(typing.NamedTuple):
+    slot_starts: numpy.ndarray
+    present: numpy.ndarray
+    peak: numpy.ndarray
+
+    def records(self) -> typing.List[dict]:
+        """
+
+        :return: one dict per slot with its start, the intervals present at its start and their peak during the slot
+        """
+        return [{'start': slot_start, 'present': present, 'peak': peak}
+                for slot_start, present, peak in zip(self.slot_starts.astype(datetime.datetime).tolist(),
+                                                     self.present.tolist(), self.peak.tolist())]
+
+
+def to_datetime64(values: typing.Iterable[typing.Optional[datetime.datetime]],
+                  default: datetime.datetime) -> numpy.ndarray:
+    """
+
+    :param values:
+    :param default: replaces None, i.e. the stop_time of open caretimes
+    :return:
+    """
+    return numpy.array([default if value is None else value for value in values], dtype='datetime64[us]')
+
+
+def compute_occupancy(starts: numpy.ndarray, stops: numpy.ndarray, start: datetime.datetime, end: datetime.datetime,
+                      slot: datetime.timedelta) -> Occupancy:
+    """
+    Number of intervals present per slot of [start, end), by a sweep over the start and stop events.
+
+    The events are sorted once, the cumulative sum of +1 for a start and -1 for a stop is the number of intervals
+    present after each event. Intervals are half-open, at equal times the stops are counted before the starts,
+    so back-to-back intervals never overlap.
+
+    :param starts: datetime64 start of each interval
+    :param stops: datetime64 stop of each interval
+    :param start:
+    :param end:
+    :param slot:
+    :return:
+    """
+    if slot <= datetime.timedelta(0):
+        raise ValueError('slot must be positive')
+    if end <= start:
+        raise ValueError('end must be after start')
+    slot_us = slot // datetime.timedelta(microseconds=1)
+    length_us = (end - start) // datetime.timedelta(microseconds=1)
+    slot_count = -(-length_us // slot_us)
+    if slot_count > MAX_SLOTS:
+        raise ValueError(f'at most {MAX_SLOTS} slots, use a larger slot or a shorter range')
+
+    origin = numpy.datetime64(start, 'us')
+    starts_us = (numpy.asarray(starts, dtype='datetime64[us]') - origin).astype(numpy.int64)
+    stops_us = (numpy.asarray(stops, dtype='datetime64[us]') - origin).astype(numpy.int64)
+    valid = (stops_us > starts_us) & (stops_us > 0) & (starts_us < length_us)
+    starts_us = numpy.maximum(starts_us[valid], 0)
+    stops_us = stops_us[valid]
+
+    times = numpy.concatenate([starts_us, stops_us])
+    deltas = numpy.concatenate([numpy.ones(len(starts_us), dtype=numpy.int64),
+                                numpy.full(len(stops_us), -1, dtype=numpy.int64)])
+    order = numpy.lexsort((deltas, times))
+    times = times[order]
+    levels = numpy.cumsum(deltas[order])
+
+    slot_offsets = numpy.arange(slot_count, dtype=numpy.int64) * slot_us
+    event_count = numpy.searchsorted(times, slot_offsets, side='right')
+    present = numpy.where(event_count > 0, levels[numpy.maximum(event_count - 1, 0)] if len(levels) else 0, 0)
+
+    peak = present.copy()
+    in_range = (times >= 0) & (times < length_us)
+    numpy.maximum.at(peak, times[in_range] // slot_us, levels[in_range])
+
+    return Occupancy(slot_starts=origin + slot_offsets.astype('timedelta64[us]'), present=present, peak=peak)
@@ -7,6 +7,7 @@ import sqlalchemy
 import sqlalchemy.orm
 
 import backend.database.models
+import backend.database.queries_v2
 
 
 def create_connection():
@@ -73,24 +74,21 @@ def edit_user(user_name: str, new_values: typing.Dict[str, typing.Any]):
     return
 
 
-def fetch_children(recent: bool, limit: int):
+def fetch_children(recent: bool, limit: int, **filters):
     """
-    Fetch all children.
+    Fetch the children with a single query.
 
-    :param recent:
+    :param recent: only children created within the last recent_days days
     :param limit:
+    :param filters: recent_days, name and sur_name prefixes, birth_day range and sort order, see children_statement
     :return:
     """
     connection = create_connection()
-    child_model = backend.database.models.Child
     with sqlalchemy.orm.Session(connection) as session:
         children = session.execute(
-            sqlalchemy.sql.select(
-                from_obj=child_model,
-                columns=child_model.__table__.columns,
-            ),
+            backend.database.queries_v2.children_statement(recent=recent, **filters).limit(limit),
         ).all()
-    return [child for child in children][:limit]
+    return children
 
 
 def create_child(child: dict):
@@ -0,0 +1,672 @@
+import datetime
+import threading
+import typing
+import uuid
+
+import asyncpg
+import sqlalchemy
+import sqlalchemy.dialects.postgresql
+import sqlalchemy.exc
+import sqlalchemy.ext.asyncio
+import sqlalchemy.pool
+
+import backend.database.cache
+import backend.database.models
+import backend.database.queries_v2
+import backend.database.reporting
+
+
+def create_url(db_config: dict[str, str]) -> sqlalchemy.engine.url.URL:
+    """
+
+    :return:
+    """
+    db_config['drivername'] = 'postgresql+asyncpg'
+    url = sqlalchemy.engine.url.URL.create(**db_config)
+    return url
+
+
+class TimedAsyncAdaptedQueuePool(sqlalchemy.pool.AsyncAdaptedQueuePool,
+                                 backend.database.queries_v2.TimedQueuePool):
+    """
+    AsyncAdaptedQueuePool keeping track of how long callers wait for a connection on checkout.
+    """
+
+
+def create_engine(url: sqlalchemy.engine.url.URL,
+                  pool_config: typing.Optional[dict[str, typing.Any]] = None) \
+        -> sqlalchemy.ext.asyncio.AsyncEngine:
+    """
+
+    :param url:
+    :param pool_config: pool settings, default: read from the environment
+    :return:
+    """
+    if pool_config is None:
+        pool_config = backend.database.queries_v2.get_pool_config()
+    engine = sqlalchemy.ext.asyncio.create_async_engine(url, poolclass=TimedAsyncAdaptedQueuePool, **pool_config)
+    return engine
+
+
+_engines: dict[tuple, sqlalchemy.ext.asyncio.AsyncEngine] = dict()
+_engines_lock = threading.Lock()
+
+
+def get_engine(db_config: dict[str, str]) -> sqlalchemy.ext.asyncio.AsyncEngine:
+    """
+    Return the process-wide async engine for the database config, creating it on first use.
+
+    :param db_config:
+    :return:
+    """
+    key = tuple(sorted((k, v) for k, v in db_config.items() if k != 'drivername'))
+    engine = _engines.get(key)
+    if engine is None:
+        with _engines_lock:
+            engine = _engines.get(key)
+            if engine is None:
+                engine = create_engine(create_url(db_config=dict(db_config)))
+                _engines[key] = engine
+    return engine
+
+
+def dispose_engines(close: bool = True) -> None:
+    """
+    Dispose the connection pools of all registered async engines, see queries_v2.dispose_engines.
+
+    :param close:
+    :return:
+    """
+    with _engines_lock:
+        for engine in _engines.values():
+            engine.sync_engine.dispose(close=close)
+
+
+def get_pool_statistics() -> list[dict[str, typing.Any]]:
+    """
+    Pool statistics of all registered async engines.
+
+    :return:
+    """
+    statistics = []
+    for engine in list(_engines.values()):
+        entry = {'host': engine.url.host, 'database': engine.url.database}
+        if isinstance(engine.pool, TimedAsyncAdaptedQueuePool):
+            entry.update(engine.pool.statistics())
+        statistics.append(entry)
+    return statistics
+
+
+def create_session(db_config: dict[str, str]) -> sqlalchemy.ext.asyncio.AsyncSession:
+    """
+
+    :return:
+    """
+    engine = get_engine(db_config=db_config)
+    session = sqlalchemy.ext.asyncio.AsyncSession(bind=engine, autoflush=False, expire_on_commit=False)
+
+    return session
+
+
+async def fetch_user(db: sqlalchemy.ext.asyncio.AsyncSession, user_name: str):
+    """
+    Fetch user.
+
+    :param db:
+    :param user_name:
+    :return:
+    """
+    user_model = backend.database.models.User
+    result = await db.execute(
+            sqlalchemy.sql.select(
+                from_obj=user_model,
+                columns=user_model.__table__.columns).
+            where(user_model.user_name == user_name))
+    return result.first()
+
+
+async def create_user(db: sqlalchemy.ext.asyncio.AsyncSession, user: dict):
+    """
+
+    :param db:
+    :param user:
+    :return:
+    """
+    await db.execute(sqlalchemy.insert(backend.database.models.User).values(**user))
+    await db.commit()
+    return
+
+
+async def edit_user(db: sqlalchemy.ext.asyncio.AsyncSession, user_name: str,
+                    new_values: typing.Dict[str, typing.Any]):
+    """
+
+    :param db:
+    :param user_name:
+    :param new_values:
+    :return:
+    """
+    await db.execute(sqlalchemy.update(backend.database.models.User).
+                     where(backend.database.models.User.user_name == user_name).
+                     values(**new_values))
+    await db.commit()
+    return
+
+
+async def write_logging(db: sqlalchemy.ext.asyncio.AsyncSession, log_entry: dict, insert: bool):
+    """
+
+    :param db:
+    :param log_entry:
+    :param insert:
+    :return:
+    """
+    if insert:
+        await db.execute(sqlalchemy.insert(backend.database.models.Log).values(**log_entry))
+    else:
+        await db.execute(sqlalchemy.update(backend.database.models.Log).
+                         where(backend.database.models.Log.request_id == log_entry['request_id']).
+                         values(**log_entry))
+    await db.commit()
+    return
+
+
+async def fetch_children(db: sqlalchemy.ext.asyncio.AsyncSession, recent: bool = False, skip: int = 0,
+                         limit: int = 10, after: typing.Optional[typing.Tuple[typing.Any, uuid.UUID]] = None,
+                         **filters):
+    """
+    Fetch the children with a single query.
+
+    :param db:
+    :param recent: only children created within the last recent_days days
+    :param skip:
+    :param limit:
+    :param after: (sort value, child_id) of the last child of the previous page, for keyset pagination
+    :param filters: recent_days, name and sur_name prefixes, birth_day range and sort order, see children_statement
+    :return:
+    """
+    statement = backend.database.queries_v2.children_statement(recent=recent, after=after, **filters)
+    result = await db.execute(statement.offset(skip).limit(limit))
+    return result.all()
+
+
+async def stream_children(db: sqlalchemy.ext.asyncio.AsyncSession, since: typing.Optional[datetime.datetime] = None,
+                          batch_size: int = 1000) -> typing.AsyncIterator[typing.List[sqlalchemy.engine.Row]]:
+    """
+    Stream all children in batches using a server-side cursor.
+
+    :param db:
+    :param since: only children created at or after this timestamp
+    :param batch_size:
+    :return: async iterator of row batches
+    """
+    child_model = backend.database.models.Child
+    statement = sqlalchemy.sql.select(
+        from_obj=child_model,
+        columns=child_model.__table__.columns).\
+        order_by(child_model.created_at, child_model.child_id)
+    if since is not None:
+        statement = statement.where(child_model.created_at >= since)
+    result = await db.stream(statement.execution_options(max_row_buffer=batch_size))
+    async for partition in result.partitions(batch_size):
+        yield partition
+
+
+async def create_child(db: sqlalchemy.ext.asyncio.AsyncSession, child: dict):
+    """
+
+    :param db:
+    :param child:
+    :return:
+    """
+    await db.execute(sqlalchemy.insert(backend.database.models.Child).values(**child))
+    await db.commit()
+    return
+
+
+async def fetch_child(db: sqlalchemy.ext.asyncio.AsyncSession, child_id: uuid.UUID):
+    """
+    Read-through the query cache, which holds existing children only.
+
+    :param db:
+    :param child_id:
+    :return:
+    """
+    cache = backend.database.cache.get_query_cache()
+    cache_key = backend.database.queries_v2.child_cache_key(child_id=child_id)
+    child = cache.get(cache_key)
+    if child is not None:
+        return child
+    child_model = backend.database.models.Child
+    result = await db.execute(
+        sqlalchemy.sql.select(
+            from_obj=child_model,
+            columns=child_model.__table__.columns).
+        where(child_model.child_id == child_id))
+    child = result.first()
+    if child is not None:
+        cache.set(cache_key, child)
+    return child
+
+
+async def update_child(db: sqlalchemy.ext.asyncio.AsyncSession, child_id: uuid.UUID,
+                       updates_for_child: typing.Dict):
+    """
+    Update the child in a single statement.
+
+    :param db:
+    :param child_id:
+    :param updates_for_child:
+    :return: child_id, if the child exists, else None
+    """
+    child_model = backend.database.models.Child
+    if not updates_for_child:
+        result = await db.execute(
+            sqlalchemy.sql.select(child_model.child_id).
+            where(child_model.child_id == child_id))
+        return result.scalar_one_or_none()
+    result = await db.execute(
+        sqlalchemy.update(child_model).
+        where(child_model.child_id == child_id).
+        values(**updates_for_child).
+        returning(child_model.child_id))
+    updated_child_id = result.scalar_one_or_none()
+    await db.commit()
+    backend.database.queries_v2.invalidate_child(child_id=child_id)
+    return updated_child_id
+
+
+async def delete_child(db: sqlalchemy.ext.asyncio.AsyncSession, child_id: uuid.UUID):
+    """
+    Delete the child in a single statement, its caretimes are deleted by the foreign key.
+
+    :param db:
+    :param child_id:
+    :return: child_id, if the child existed, else None
+    """
+    child_model = backend.database.models.Child
+    result = await db.execute(
+        sqlalchemy.delete(child_model).
+        where(child_model.child_id == child_id).
+        returning(child_model.child_id))
+    deleted_child_id = result.scalar_one_or_none()
+    await db.commit()
+    backend.database.queries_v2.invalidate_child(child_id=child_id, caretimes=True)
+    return deleted_child_id
+
+
+async def fetch_caretimes(db: sqlalchemy.ext.asyncio.AsyncSession, child_id: uuid.UUID, skip: int = 0,
+                          limit: int = 10, after: typing.Optional[typing.Tuple[typing.Any, uuid.UUID]] = None):
+    """
+
+    :param db:
+    :param child_id:
+    :param skip:
+    :param limit:
+    :param after: (start_time, caretime_id) of the last caretime of the previous page, for keyset pagination
+    :return:
+    """
+    caretime_model = backend.database.models.Caretime
+    statement = sqlalchemy.sql.select(
+        from_obj=caretime_model,
+        columns=caretime_model.__table__.columns).\
+        where(caretime_model.child_id == child_id).\
+        order_by(caretime_model.start_time, caretime_model.caretime_id)
+    if after is not None:
+        statement = statement.where(
+            backend.database.queries_v2.keyset_filter(caretime_model.start_time, caretime_model.caretime_id, after))
+    result = await db.execute(statement.offset(skip).limit(limit))
+    return result.all()
+
+
+async def stream_caretimes(db: sqlalchemy.ext.asyncio.AsyncSession, since: typing.Optional[datetime.datetime] = None,
+                           batch_size: int = 1000) -> typing.AsyncIterator[typing.List[sqlalchemy.engine.Row]]:
+    """
+    Stream the caretimes of all children in batches using a server-side cursor.
+
+    :param db:
+    :param since: only caretimes modified at or after this timestamp
+    :param batch_size:
+    :return: async iterator of row batches
+    """
+    caretime_model = backend.database.models.Caretime
+    statement = sqlalchemy.sql.select(
+        from_obj=caretime_model,
+        columns=caretime_model.__table__.columns).\
+        order_by(caretime_model.child_id, caretime_model.start_time, caretime_model.caretime_id)
+    if since is not None:
+        statement = statement.where(caretime_model.modified_at >= since)
+    result = await db.stream(statement.execution_options(max_row_buffer=batch_size))
+    async for partition in result.partitions(batch_size):
+        yield partition
+
+
+async def fetch_single_caretime(db: sqlalchemy.ext.asyncio.AsyncSession, caretime_id: uuid.UUID,
+                                child_id: uuid.UUID):
+    """
+    Read-through the query cache, which holds existing caretimes only.
+
+    :param db:
+    :param caretime_id:
+    :param child_id:
+    :return:
+    """
+    cache = backend.database.cache.get_query_cache()
+    cache_key = backend.database.queries_v2.caretime_cache_key(child_id=child_id, caretime_id=caretime_id)
+    caretime = cache.get(cache_key)
+    if caretime is not None:
+        return caretime
+    caretime_model = backend.database.models.Caretime
+    result = await db.execute(
+        sqlalchemy.sql.select(
+            from_obj=caretime_model,
+            columns=caretime_model.__table__.columns).
+        where(caretime_model.child_id == child_id, caretime_model.caretime_id == caretime_id))
+    caretime = result.first()
+    if caretime is not None:
+        cache.set(cache_key, caretime)
+    return caretime
+
+
+async def create_caretime(db: sqlalchemy.ext.asyncio.AsyncSession, caretime_entry: dict):
+    """
+
+    :param db:
+    :param caretime_entry:
+    :return:
+    """
+    try:
+        await db.execute(sqlalchemy.insert(backend.database.models.Caretime).values(**caretime_entry))
+    except sqlalchemy.exc.IntegrityError as error:
+        await db.rollback()
+        if backend.database.queries_v2.is_overlap_violation(error=error):
+            raise backend.database.queries_v2.OverlappingCaretimeError(str(caretime_entry['caretime_id'])) from error
+        if backend.database.queries_v2.is_inverted_violation(error=error):
+            raise backend.database.queries_v2.InvalidCaretimeError(str(caretime_entry['caretime_id'])) from error
+        raise
+    await db.commit()
+    return
+
+
+async def fetch_caretime_intervals(db: sqlalchemy.ext.asyncio.AsyncSession,
+                                   start: datetime.datetime, end: datetime.datetime) -> typing.List[typing.Any]:
+    """
+    Fetch start_time and stop_time of all caretimes overlapping [start, end) with a single query,
+    open caretimes have no stop_time.
+
+    :param db:
+    :param start:
+    :param end:
+    :return:
+    """
+    caretime_model = backend.database.models.Caretime
+    result = await db.execute(
+        sqlalchemy.sql.select(caretime_model.start_time, caretime_model.stop_time).
+        where(caretime_model.start_time < end,
+              sqlalchemy.or_(caretime_model.stop_time > start, caretime_model.stop_time.is_(None))))
+    return result.all()
+
+
+async def fetch_overlapping_caretimes(db: sqlalchemy.ext.asyncio.AsyncSession,
+                                      start: datetime.datetime, end: datetime.datetime,
+                                      child_id: typing.Optional[uuid.UUID] = None):
+    """
+    Fetch the caretimes overlapping [start, end], open caretimes overlap everything after their start.
+
+    :param db:
+    :param start:
+    :param end:
+    :param child_id: None for the caretimes of all children
+    :return:
+    """
+    caretime_model = backend.database.models.Caretime
+    statement = sqlalchemy.sql.select(
+        from_obj=caretime_model,
+        columns=caretime_model.__table__.columns).\
+        where(backend.database.queries_v2.overlap_filter(start=start, end=end)).\
+        order_by(caretime_model.start_time, caretime_model.caretime_id)
+    if child_id is not None:
+        statement = statement.where(caretime_model.child_id == child_id)
+    result = await db.execute(statement)
+    return result.all()
+
+
+async def fetch_checked_in_children(db: sqlalchemy.ext.asyncio.AsyncSession):
+    """
+    Fetch the children with an open caretime, served by the partial index of the open caretimes.
+
+    :param db:
+    :return: the children with caretime_id and checked_in_at of their open caretime
+    """
+    child_model = backend.database.models.Child
+    caretime_model = backend.database.models.Caretime
+    result = await db.execute(
+        sqlalchemy.sql.select(*child_model.__table__.columns, caretime_model.caretime_id,
+                              caretime_model.start_time.label('checked_in_at')).
+        join(caretime_model, caretime_model.child_id == child_model.child_id).
+        where(caretime_model.stop_time.is_(None)).
+        order_by(caretime_model.start_time, child_model.child_id))
+    return result.all()
+
+
+async def fetch_caretimes_of_children(db: sqlalchemy.ext.asyncio.AsyncSession,
+                                      child_ids: typing.Collection[uuid.UUID]) -> typing.List[typing.Any]:
+    """
+    Fetch the caretimes of many children with a single query, ordered by child and start_time.
+
+    :param db:
+    :param child_ids:
+    :return:
+    """
+    caretime_model = backend.database.models.Caretime
+    child_ids_param = sqlalchemy.bindparam(
+        'child_ids', value=list(child_ids),
+        type_=sqlalchemy.dialects.postgresql.ARRAY(sqlalchemy.dialects.postgresql.UUID(as_uuid=True)))
+    result = await db.execute(
+        sqlalchemy.sql.select(
+            from_obj=caretime_model,
+            columns=caretime_model.__table__.columns).
+        where(caretime_model.child_id == sqlalchemy.any_(child_ids_param)).
+        order_by(caretime_model.child_id, caretime_model.start_time, caretime_model.caretime_id))
+    return result.all()
+
+
+async def fetch_existing_child_ids(db: sqlalchemy.ext.asyncio.AsyncSession,
+                                   child_ids: typing.Collection[uuid.UUID]) -> set[uuid.UUID]:
+    """
+    Return those of the child_ids, which belong to an existing child, with a single query.
+
+    :param db:
+    :param child_ids:
+    :return:
+    """
+    child_model = backend.database.models.Child
+    child_ids_param = sqlalchemy.bindparam(
+        'child_ids', value=list(child_ids),
+        type_=sqlalchemy.dialects.postgresql.ARRAY(sqlalchemy.dialects.postgresql.UUID(as_uuid=True)))
+    result = await db.execute(sqlalchemy.sql.select(child_model.child_id).
+                              where(child_model.child_id == sqlalchemy.any_(child_ids_param)))
+    return set(result.scalars())
+
+
+async def create_caretimes_bulk(db: sqlalchemy.ext.asyncio.AsyncSession,
+                                caretime_entries: typing.List[dict]) -> typing.Dict[int, str]:
+    """
+    Insert many caretimes using COPY.
+    If the COPY violates a constraint, the caretimes are inserted one by one, each in a savepoint,
+    so that the valid caretimes are inserted and the others are reported.
+
+    :param db:
+    :param caretime_entries: entries with caretime_id, child_id, start_time and stop_time
+    :return: the errors of the rejected entries by their position in caretime_entries
+    """
+    columns = ('caretime_id', 'child_id', 'start_time', 'stop_time')
+    records = [(entry['caretime_id'], entry['child_id'], entry.get('start_time'), entry.get('stop_time'))
+               for entry in caretime_entries]
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    try:
+        await raw_connection.driver_connection.copy_records_to_table(
+            backend.database.models.Caretime.__tablename__, records=records, columns=columns)
+    except asyncpg.IntegrityConstraintViolationError:
+        await db.rollback()
+    else:
+        await db.commit()
+        return {}
+
+    errors = {}
+    for position, caretime_entry in enumerate(caretime_entries):
+        try:
+            async with db.begin_nested():
+                await db.execute(sqlalchemy.insert(backend.database.models.Caretime).values(**caretime_entry))
+        except sqlalchemy.exc.IntegrityError as error:
+            message = backend.database.queries_v2.caretime_violation_message(error=error)
+            if message is None:
+                await db.rollback()
+                raise
+            errors[position] = message
+    await db.commit()
+    return errors
+
+
+async def edit_caretime(db: sqlalchemy.ext.asyncio.AsyncSession, caretime_entry: dict):
+    """
+    Update the caretime of the child in a single statement.
+
+    :param db:
+    :param caretime_entry: caretime_id, child_id and the values to update
+    :return: caretime_id, if the caretime of the child exists, else None
+    """
+    caretime_model = backend.database.models.Caretime
+    try:
+        result = await db.execute(
+            sqlalchemy.update(caretime_model).
+            where(caretime_model.child_id == caretime_entry['child_id'],
+                  caretime_model.caretime_id == caretime_entry['caretime_id'],
+                  ).
+            values(**caretime_entry).
+            returning(caretime_model.caretime_id))
+    except sqlalchemy.exc.IntegrityError as error:
+        await db.rollback()
+        if backend.database.queries_v2.is_overlap_violation(error=error):
+            raise backend.database.queries_v2.OverlappingCaretimeError(str(caretime_entry['caretime_id'])) from error
+        if backend.database.queries_v2.is_inverted_violation(error=error):
+            raise backend.database.queries_v2.InvalidCaretimeError(str(caretime_entry['caretime_id'])) from error
+        raise
+    updated_caretime_id = result.scalar_one_or_none()
+    await db.commit()
+    backend.database.queries_v2.invalidate_caretime(child_id=caretime_entry['child_id'],
+                                                    caretime_id=caretime_entry['caretime_id'])
+    return updated_caretime_id
+
+
+async def delete_caretime(db: sqlalchemy.ext.asyncio.AsyncSession, caretime_id: uuid.UUID, child_id: uuid.UUID):
+    """
+    Delete the caretime of the child in a single statement.
+
+    :param db:
+    :param caretime_id:
+    :param child_id:
+    :return: caretime_id, if the caretime of the child existed, else None
+    """
+    caretime_model = backend.database.models.Caretime
+    result = await db.execute(
+        sqlalchemy.delete(caretime_model).
+        where(caretime_model.caretime_id == caretime_id,
+              caretime_model.child_id == child_id,
+              ).
+        returning(caretime_model.caretime_id))
+    deleted_caretime_id = result.scalar_one_or_none()
+    await db.commit()
+    backend.database.queries_v2.invalidate_caretime(child_id=child_id, caretime_id=caretime_id)
+    return deleted_caretime_id
+
+
+async def refresh_care_days(db: sqlalchemy.ext.asyncio.AsyncSession) -> bool:
+    """
+    Bring the rollup up to date with the caretimes, only the days of changed caretimes are recomputed.
+
+    :param db:
+    :return: False, if the rollup is refreshed by another transaction right now
+    """
+    reporting = backend.database.reporting
+    if not (await db.execute(reporting.LOCK_STATEMENT)).scalar():
+        await db.rollback()
+        return False
+    for statement in reporting.REFRESH_STATEMENTS:
+        await db.execute(statement)
+    await db.commit()
+    return True
+
+
+async def fetch_care_summary(db: sqlalchemy.ext.asyncio.AsyncSession, granularity: str = 'month',
+                             child_id: typing.Optional[uuid.UUID] = None,
+                             start: typing.Optional[datetime.date] = None, end: typing.Optional[datetime.date] = None):
+    """
+
+    :param db:
+    :param granularity:
+    :param child_id:
+    :param start:
+    :param end:
+    :return:
+    """
+    result = await db.execute(backend.database.reporting.summary_statement(granularity=granularity, child_id=child_id,
+                                                                           start=start, end=end))
+    return result.all()
+
+
+async def check_in(db: sqlalchemy.ext.asyncio.AsyncSession, child_id: uuid.UUID,
+                   start_time: typing.Optional[datetime.datetime] = None):
+    """
+    Open a caretime of the child in a single statement.
+
+    :param db:
+    :param child_id:
+    :param start_time:
+    :return: caretime_id, child_id and start_time of the new caretime, None if the child does not exist
+    :raises AlreadyCheckedInError: if the child has an open caretime
+    :raises OverlappingCaretimeError: if the start_time is within a closed caretime of the child
+    """
+    try:
+        result = await db.execute(backend.database.queries_v2.check_in_statement(child_id=child_id,
+                                                                                 start_time=start_time))
+    except sqlalchemy.exc.IntegrityError as error:
+        await db.rollback()
+        if backend.database.queries_v2.is_overlap_violation(error=error):
+            # the exclusion constraint does not tell, which caretime is overlapped
+            result = await db.execute(backend.database.queries_v2.open_caretime_statement(child_id=child_id))
+            if result.first() is not None:
+                raise backend.database.queries_v2.AlreadyCheckedInError(str(child_id)) from error
+            raise backend.database.queries_v2.OverlappingCaretimeError(str(child_id)) from error
+        if backend.database.queries_v2.constraint_violation(error=error) == \
+                (backend.database.queries_v2.FOREIGN_KEY_VIOLATION, backend.database.queries_v2.CHILD_FOREIGN_KEY):
+            return None
+        raise
+    caretime = result.one()
+    await db.commit()
+    return caretime
+
+
+async def check_out(db: sqlalchemy.ext.asyncio.AsyncSession, child_id: uuid.UUID,
+                    stop_time: typing.Optional[datetime.datetime] = None):
+    """
+    Close the open caretime of the child in a single statement.
+
+    :param db:
+    :param child_id:
+    :param stop_time:
+    :return: the closed caretime, None if the child is not checked in
+    :raises InvalidCaretimeError: if the stop_time is before the start of the open caretime
+    """
+    result = await db.execute(backend.database.queries_v2.check_out_statement(child_id=child_id, stop_time=stop_time))
+    caretime = result.one_or_none()
+    if caretime is None:
+        result = await db.execute(backend.database.queries_v2.open_caretime_statement(child_id=child_id))
+        if result.first() is not None:
+            await db.rollback()
+            raise backend.database.queries_v2.InvalidCaretimeError(str(child_id))
+    await db.commit()
+    if caretime is not None:
+        backend.database.queries_v2.invalidate_caretime(child_id=child_id, caretime_id=caretime.caretime_id)
+    return caretime
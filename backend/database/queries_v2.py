@@ -1,15 +1,49 @@
+import datetime
 import os
+import threading
+import time
 import typing
 import uuid
 
 import dotenv
 import sqlalchemy
+import sqlalchemy.dialects.postgresql
+import sqlalchemy.exc
 import sqlalchemy.orm
 import sqlalchemy.pool
 
+import backend.database.cache
 import backend.database.models
 
 
+CARETIME_EXCLUSION_CONSTRAINT = 'ex_caretimes_child_id_period'
+CARETIME_CHECK_CONSTRAINT = 'ck_caretimes_stop_time_after_start_time'
+EXCLUSION_VIOLATION = '23P01'
+CHECK_VIOLATION = '23514'
+CHILD_FOREIGN_KEY = 'fk_caretimes_child_id_children'
+FOREIGN_KEY_VIOLATION = '23503'
+RECENT_DAYS = 30
+CHILDREN_SORT_COLUMNS = ('created_at', 'name', 'sur_name', 'birth_day')
+
+
+class OverlappingCaretimeError(Exception):
+    """
+    The caretime overlaps another caretime of the child, e.g. the child already has an open caretime.
+    """
+
+
+class AlreadyCheckedInError(OverlappingCaretimeError):
+    """
+    The child already has an open caretime.
+    """
+
+
+class InvalidCaretimeError(Exception):
+    """
+    The stop_time of the caretime is before its start_time.
+    """
+
+
 def get_database_config() -> dict[str, str]:
     """
 
@@ -36,21 +70,137 @@ def create_url(db_config: dict[str, str]) -> sqlalchemy.engine.url.URL:
     return url
 
 
-def create_engine(url: sqlalchemy.engine.url.URL) -> sqlalchemy.engine.Engine:
+def get_pool_config() -> dict[str, typing.Any]:
     """
+    Read the connection pool settings from the environment.
 
+    :return: keyword arguments for sqlalchemy.create_engine
+    """
+    dotenv.load_dotenv()
+    pool_config = dict()
+
+    pool_config['pool_size'] = int(os.environ.get('DB_POOL_SIZE', 5))
+    pool_config['max_overflow'] = int(os.environ.get('DB_POOL_MAX_OVERFLOW', 10))
+    pool_config['pool_timeout'] = float(os.environ.get('DB_POOL_TIMEOUT', 30))
+    pool_config['pool_recycle'] = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    pool_config['pool_pre_ping'] = os.environ.get('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+    return pool_config
+
+
+class TimedQueuePool(sqlalchemy.pool.QueuePool):
+    """
+    QueuePool keeping track of how long callers wait for a connection on checkout.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._statistics_lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_wait_total = 0.0
+        self.checkout_wait_max = 0.0
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            waited = time.perf_counter() - start
+            with self._statistics_lock:
+                self.checkouts += 1
+                self.checkout_wait_total += waited
+                self.checkout_wait_max = max(self.checkout_wait_max, waited)
+
+    def statistics(self) -> dict[str, typing.Any]:
+        """
+        Snapshot of the pool usage and the checkout wait times (in seconds).
+
+        :return:
+        """
+        with self._statistics_lock:
+            checkouts = self.checkouts
+            wait_total = self.checkout_wait_total
+            wait_max = self.checkout_wait_max
+        return {'size': self.size(),
+                'checked_in': self.checkedin(),
+                'checked_out': self.checkedout(),
+                'overflow': self.overflow(),
+                'checkouts': checkouts,
+                'checkout_wait_avg': wait_total / checkouts if checkouts else 0.0,
+                'checkout_wait_max': wait_max}
+
+
+def create_engine(url: sqlalchemy.engine.url.URL,
+                  pool_config: typing.Optional[dict[str, typing.Any]] = None) -> sqlalchemy.engine.Engine:
+    """
+
+    :param url:
+    :param pool_config: pool settings, default: read from the environment
+    :return:
+    """
+    if pool_config is None:
+        pool_config = get_pool_config()
+    engine = sqlalchemy.create_engine(url, poolclass=TimedQueuePool, **pool_config)
+    return engine
+
+
+_engines: dict[tuple, sqlalchemy.engine.Engine] = dict()
+_engines_lock = threading.Lock()
+
+
+def get_engine(db_config: dict[str, str]) -> sqlalchemy.engine.Engine:
+    """
+    Return the process-wide engine for the database config, creating it on first use.
+
+    :param db_config:
     :return:
     """
-    engine = sqlalchemy.create_engine(url, poolclass=sqlalchemy.pool.NullPool)
+    key = tuple(sorted((k, v) for k, v in db_config.items() if k != 'drivername'))
+    engine = _engines.get(key)
+    if engine is None:
+        with _engines_lock:
+            engine = _engines.get(key)
+            if engine is None:
+                engine = create_engine(create_url(db_config=dict(db_config)))
+                _engines[key] = engine
     return engine
 
 
+def dispose_engines(close: bool = True) -> None:
+    """
+    Dispose the connection pools of all registered engines.
+
+    In a freshly forked worker process use close=False, so that the connections
+    inherited from the parent are dropped without closing them underneath the parent.
+
+    :param close:
+    :return:
+    """
+    with _engines_lock:
+        for engine in _engines.values():
+            engine.dispose(close=close)
+
+
+def get_pool_statistics() -> list[dict[str, typing.Any]]:
+    """
+    Pool statistics of all registered engines.
+
+    :return:
+    """
+    statistics = []
+    for engine in list(_engines.values()):
+        entry = {'host': engine.url.host, 'database': engine.url.database}
+        if isinstance(engine.pool, TimedQueuePool):
+            entry.update(engine.pool.statistics())
+        statistics.append(entry)
+    return statistics
+
+
 def create_session(db_config: dict[str, str]) -> sqlalchemy.orm.Session:
     """
 
     :return:
     """
-    engine = create_engine(create_url(db_config=db_config))
+    engine = get_engine(db_config=db_config)
     session = sqlalchemy.orm.Session(autocommit=False, autoflush=False, bind=engine)
 
     return session
@@ -118,22 +268,210 @@ def write_logging(db: sqlalchemy.orm.Session, log_entry: dict, insert: bool):
     return
 
 
-def fetch_children(db: sqlalchemy.orm.Session, recent: bool = False, skip: int = 0, limit: int = 10):
+def write_logging_batch(db: sqlalchemy.orm.Session, log_entries: typing.List[dict]):
+    """
+    Upsert several log entries with one multi-row statement.
+
+    Entries may carry only a part of the columns, e.g. only the response of a request,
+    already stored values are not overwritten by missing ones.
+
+    :param db:
+    :param log_entries: entries with distinct request_ids
+    :return:
+    """
+    log_table = backend.database.models.Log.__table__
+    columns = [column.name for column in log_table.columns]
+    rows = [{column: log_entry.get(column) for column in columns} for log_entry in log_entries]
+    statement = sqlalchemy.dialects.postgresql.insert(log_table).values(rows)
+    statement = statement.on_conflict_do_update(
+        index_elements=[log_table.c.request_id],
+        set_={column: sqlalchemy.func.coalesce(statement.excluded[column], log_table.c[column])
+              for column in columns if column != 'request_id'})
+    db.execute(statement)
+    db.commit()
+    return
+
+
+def keyset_filter(sort_column: sqlalchemy.sql.ColumnElement, id_column: sqlalchemy.sql.ColumnElement,
+                  after: typing.Tuple[typing.Any, typing.Any],
+                  descending: bool = False) -> sqlalchemy.sql.ColumnElement:
+    """
+    Condition selecting the rows following the row (sort value, id) in the ordering sort_column, id_column
+    or in its reverse, used for keyset (cursor) pagination.
+    A plain row comparison is served by a range scan of the index on (sort_column, id_column),
+    so the sort column must not be nullable.
+
+    :param sort_column:
+    :param id_column: unique column breaking ties of the sort column
+    :param after: sort value and id of the last row of the previous page
+    :param descending:
+    :return:
+    """
+    if descending:
+        return sqlalchemy.tuple_(sort_column, id_column) < sqlalchemy.tuple_(*after)
+    return sqlalchemy.tuple_(sort_column, id_column) > sqlalchemy.tuple_(*after)
+
+
+def prefix_filter(column: sqlalchemy.sql.ColumnElement, prefix: str) -> sqlalchemy.sql.ColumnElement:
+    """
+    Case-insensitive condition on the start of the column, served by the index of lower(column) text_pattern_ops.
+    Wildcards in the prefix are matched literally.
+
+    :param column:
+    :param prefix:
+    :return:
+    """
+    pattern = prefix.lower().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+    return sqlalchemy.func.lower(column).like(pattern, escape='\\')
+
+
+def children_statement(recent: bool = False, recent_days: int = RECENT_DAYS,
+                       name_prefix: typing.Optional[str] = None, sur_name_prefix: typing.Optional[str] = None,
+                       birth_day_from: typing.Optional[datetime.date] = None,
+                       birth_day_to: typing.Optional[datetime.date] = None,
+                       sort: str = 'created_at', descending: bool = False,
+                       after: typing.Optional[typing.Tuple[typing.Any, uuid.UUID]] = None):
+    """
+    Select statement of the children, filtered and ordered in the database, shared by all query modules.
+
+    :param recent: only children created within the last recent_days days
+    :param recent_days:
+    :param name_prefix: case-insensitive prefix of the name
+    :param sur_name_prefix: case-insensitive prefix of the sur_name
+    :param birth_day_from: first birth_day included
+    :param birth_day_to: last birth_day included
+    :param sort: one of CHILDREN_SORT_COLUMNS, ties are broken by child_id
+    :param descending:
+    :param after: (sort value, child_id) of the last child of the previous page, for keyset pagination
+    :return:
+    :raises ValueError: if the sort column is not sortable
+    """
+    if sort not in CHILDREN_SORT_COLUMNS:
+        raise ValueError(f'sort must be one of {", ".join(CHILDREN_SORT_COLUMNS)}')
+    child_model = backend.database.models.Child
+    sort_column = getattr(child_model, sort)
+    statement = sqlalchemy.sql.select(
+        from_obj=child_model,
+        columns=child_model.__table__.columns)
+    if recent:
+        statement = statement.where(
+            child_model.created_at >= sqlalchemy.func.localtimestamp() - datetime.timedelta(days=recent_days))
+    if name_prefix:
+        statement = statement.where(prefix_filter(child_model.name, prefix=name_prefix))
+    if sur_name_prefix:
+        statement = statement.where(prefix_filter(child_model.sur_name, prefix=sur_name_prefix))
+    if birth_day_from is not None:
+        statement = statement.where(child_model.birth_day >= birth_day_from)
+    if birth_day_to is not None:
+        statement = statement.where(child_model.birth_day <= birth_day_to)
+    if after is not None:
+        statement = statement.where(keyset_filter(sort_column, child_model.child_id, after, descending=descending))
+    if descending:
+        return statement.order_by(sort_column.desc(), child_model.child_id.desc())
+    return statement.order_by(sort_column, child_model.child_id)
+
+
+def constraint_violation(error: Exception) -> typing.Tuple[typing.Optional[str], typing.Optional[str]]:
+    """
+    SQLSTATE and name of the violated constraint of a database error, raised by psycopg2 or asyncpg,
+    either directly or wrapped by SQLAlchemy.
+
+    :param error:
+    :return: (None, None), if the error does not come from the database
+    """
+    error = getattr(error, 'orig', error)
+    diag = getattr(error, 'diag', None)
+    if diag is not None:
+        # psycopg2
+        return error.pgcode, diag.constraint_name
+    if not hasattr(error, 'constraint_name'):
+        # asyncpg, wrapped by the DBAPI adaption of SQLAlchemy
+        error = error.__cause__
+    return getattr(error, 'sqlstate', None), getattr(error, 'constraint_name', None)
+
+
+def is_overlap_violation(error: Exception) -> bool:
+    """
+    Whether the database error is a violation of the exclusion constraint against overlapping caretimes.
+
+    :param error:
+    :return:
+    """
+    return constraint_violation(error=error) == (EXCLUSION_VIOLATION, CARETIME_EXCLUSION_CONSTRAINT)
+
+
+def is_inverted_violation(error: Exception) -> bool:
+    """
+    Whether the database error is a violation of the check constraint against caretimes stopping before they start.
+
+    :param error:
+    :return:
+    """
+    return constraint_violation(error=error) == (CHECK_VIOLATION, CARETIME_CHECK_CONSTRAINT)
+
+
+def caretime_violation_message(error: Exception) -> typing.Optional[str]:
+    """
+    Explanation of a rejected caretime for the client.
+
+    :param error:
+    :return: None, if the error is not a violation of a constraint of the caretimes
+    """
+    return {(EXCLUSION_VIOLATION, CARETIME_EXCLUSION_CONSTRAINT): 'Caretime overlaps another caretime of the child',
+            (CHECK_VIOLATION, CARETIME_CHECK_CONSTRAINT): 'stop_time must not be before start_time',
+            (FOREIGN_KEY_VIOLATION, CHILD_FOREIGN_KEY): 'Child not found',
+            }.get(constraint_violation(error=error))
+
+
+def overlap_filter(start: datetime.datetime, end: datetime.datetime) -> sqlalchemy.sql.ColumnElement:
+    """
+    Condition selecting the caretimes overlapping [start, end], served by the GiST index of the exclusion constraint.
+
+    :param start:
+    :param end:
+    :return:
+    """
+    caretime_model = backend.database.models.Caretime
+    return backend.database.models.caretime_period(caretime_model.start_time, caretime_model.stop_time).\
+        op('&&')(sqlalchemy.func.tsrange(start, end, sqlalchemy.literal_column("'[]'")))
+
+
+def fetch_children(db: sqlalchemy.orm.Session, recent: bool = False, skip: int = 0, limit: int = 10,
+                   after: typing.Optional[typing.Tuple[typing.Any, uuid.UUID]] = None, **filters):
     """
-    Fetch all children.
+    Fetch the children with a single query.
 
     :param db:
-    :param recent: boolean flag for fetching only recent children, default: False; currently unused
+    :param recent: only children created within the last recent_days days
     :param skip:
     :param limit:
+    :param after: (sort value, child_id) of the last child of the previous page, for keyset pagination
+    :param filters: recent_days, name and sur_name prefixes, birth_day range and sort order, see children_statement
     :return:
     """
+    statement = children_statement(recent=recent, after=after, **filters)
+    return db.execute(statement.offset(skip).limit(limit)).all()
+
+
+def stream_children(db: sqlalchemy.orm.Session, since: typing.Optional[datetime.datetime] = None,
+                    batch_size: int = 1000) -> typing.Iterator[typing.List[sqlalchemy.engine.Row]]:
+    """
+    Stream all children in batches using a server-side cursor.
+
+    :param db:
+    :param since: only children created at or after this timestamp
+    :param batch_size:
+    :return: iterator of row batches
+    """
     child_model = backend.database.models.Child
-    return db.execute(
-        sqlalchemy.sql.select(
-            from_obj=child_model,
-            columns=child_model.__table__.columns).
-        where(1 == 1).offset(skip).limit(limit)).all()
+    statement = sqlalchemy.sql.select(
+        from_obj=child_model,
+        columns=child_model.__table__.columns).\
+        order_by(child_model.created_at, child_model.child_id)
+    if since is not None:
+        statement = statement.where(child_model.created_at >= since)
+    result = db.execute(statement.execution_options(stream_results=True, max_row_buffer=batch_size))
+    yield from result.partitions(batch_size)
 
 
 def create_child(db: sqlalchemy.orm.Session, child: dict):
@@ -148,81 +486,187 @@ def create_child(db: sqlalchemy.orm.Session, child: dict):
     return
 
 
+def child_cache_key(child_id: typing.Union[uuid.UUID, str]) -> str:
+    """
+    Key of the child in the query cache.
+
+    :param child_id:
+    :return:
+    """
+    return f'child:{uuid.UUID(str(child_id))}'
+
+
+def caretime_cache_key(child_id: typing.Union[uuid.UUID, str], caretime_id: typing.Union[uuid.UUID, str]) -> str:
+    """
+    Key of the caretime in the query cache, prefixed by the child, so all caretimes of a child can be invalidated.
+
+    :param child_id:
+    :param caretime_id:
+    :return:
+    """
+    return f'caretime:{uuid.UUID(str(child_id))}:{uuid.UUID(str(caretime_id))}'
+
+
+def invalidate_child(child_id: typing.Union[uuid.UUID, str], caretimes: bool = False) -> None:
+    """
+    Remove the child and optionally all its caretimes from the query cache.
+
+    :param child_id:
+    :param caretimes:
+    :return:
+    """
+    cache = backend.database.cache.get_query_cache()
+    cache.delete(child_cache_key(child_id=child_id))
+    if caretimes:
+        cache.delete_prefix(f'caretime:{uuid.UUID(str(child_id))}:')
+
+
+def invalidate_caretime(child_id: typing.Union[uuid.UUID, str], caretime_id: typing.Union[uuid.UUID, str]) -> None:
+    """
+    Remove the caretime from the query cache.
+
+    :param child_id:
+    :param caretime_id:
+    :return:
+    """
+    backend.database.cache.get_query_cache().delete(caretime_cache_key(child_id=child_id, caretime_id=caretime_id))
+
+
 def fetch_child(db: sqlalchemy.orm.Session, child_id: uuid.UUID):
     """
+    Read-through the query cache, which holds existing children only.
 
     :param db:
     :param child_id:
     :return:
     """
+    cache = backend.database.cache.get_query_cache()
+    cache_key = child_cache_key(child_id=child_id)
+    child = cache.get(cache_key)
+    if child is not None:
+        return child
     child_model = backend.database.models.Child
-    return db.execute(
+    child = db.execute(
         sqlalchemy.sql.select(
             from_obj=child_model,
             columns=child_model.__table__.columns).
         where(child_model.child_id == child_id)).first()
+    if child is not None:
+        cache.set(cache_key, child)
+    return child
 
 
 def update_child(db: sqlalchemy.orm.Session, child_id: uuid.UUID, updates_for_child: typing.Dict):
     """
+    Update the child in a single statement.
 
     :param db:
     :param child_id:
     :param updates_for_child:
-    :return:
+    :return: child_id, if the child exists, else None
     """
     child_model = backend.database.models.Child
-    db.execute(sqlalchemy.update(child_model).
-               where(child_model.child_id == child_id).
-               values(**updates_for_child))
+    if not updates_for_child:
+        result = db.execute(
+            sqlalchemy.sql.select(child_model.child_id).
+            where(child_model.child_id == child_id))
+        return result.scalar_one_or_none()
+    result = db.execute(
+        sqlalchemy.update(child_model).
+        where(child_model.child_id == child_id).
+        values(**updates_for_child).
+        returning(child_model.child_id))
+    updated_child_id = result.scalar_one_or_none()
     db.commit()
-    return
+    invalidate_child(child_id=child_id)
+    return updated_child_id
 
 
 def delete_child(db: sqlalchemy.orm.Session, child_id: uuid.UUID):
     """
+    Delete the child in a single statement, its caretimes are deleted by the foreign key.
 
     :param db:
     :param child_id:
-    :return:
+    :return: child_id, if the child existed, else None
     """
     child_model = backend.database.models.Child
-    db.execute(sqlalchemy.delete(child_model).where(child_model.child_id == child_id))
+    result = db.execute(
+        sqlalchemy.delete(child_model).
+        where(child_model.child_id == child_id).
+        returning(child_model.child_id))
+    deleted_child_id = result.scalar_one_or_none()
     db.commit()
-    return
+    invalidate_child(child_id=child_id, caretimes=True)
+    return deleted_child_id
 
 
-def fetch_caretimes(db: sqlalchemy.orm.Session, child_id: uuid.UUID, skip: int = 0, limit: int = 10):
+def fetch_caretimes(db: sqlalchemy.orm.Session, child_id: uuid.UUID, skip: int = 0, limit: int = 10,
+                    after: typing.Optional[typing.Tuple[typing.Any, uuid.UUID]] = None):
     """
 
     :param db:
     :param child_id:
     :param skip:
     :param limit:
+    :param after: (start_time, caretime_id) of the last caretime of the previous page, for keyset pagination
     :return:
     """
     caretime_model = backend.database.models.Caretime
-    return db.execute(
-        sqlalchemy.sql.select(
-            from_obj=caretime_model,
-            columns=caretime_model.__table__.columns).
-        where(caretime_model.child_id == child_id).offset(skip).limit(limit)).all()
+    statement = sqlalchemy.sql.select(
+        from_obj=caretime_model,
+        columns=caretime_model.__table__.columns).\
+        where(caretime_model.child_id == child_id).\
+        order_by(caretime_model.start_time, caretime_model.caretime_id)
+    if after is not None:
+        statement = statement.where(keyset_filter(caretime_model.start_time, caretime_model.caretime_id, after))
+    return db.execute(statement.offset(skip).limit(limit)).all()
+
+
+def stream_caretimes(db: sqlalchemy.orm.Session, since: typing.Optional[datetime.datetime] = None,
+                     batch_size: int = 1000) -> typing.Iterator[typing.List[sqlalchemy.engine.Row]]:
+    """
+    Stream the caretimes of all children in batches using a server-side cursor.
+
+    :param db:
+    :param since: only caretimes modified at or after this timestamp
+    :param batch_size:
+    :return: iterator of row batches
+    """
+    caretime_model = backend.database.models.Caretime
+    statement = sqlalchemy.sql.select(
+        from_obj=caretime_model,
+        columns=caretime_model.__table__.columns).\
+        order_by(caretime_model.child_id, caretime_model.start_time, caretime_model.caretime_id)
+    if since is not None:
+        statement = statement.where(caretime_model.modified_at >= since)
+    result = db.execute(statement.execution_options(stream_results=True, max_row_buffer=batch_size))
+    yield from result.partitions(batch_size)
 
 
 def fetch_single_caretime(db: sqlalchemy.orm.Session, caretime_id: uuid.UUID, child_id: uuid.UUID):
     """
+    Read-through the query cache, which holds existing caretimes only.
 
     :param db:
     :param caretime_id:
     :param child_id:
     :return:
     """
+    cache = backend.database.cache.get_query_cache()
+    cache_key = caretime_cache_key(child_id=child_id, caretime_id=caretime_id)
+    caretime = cache.get(cache_key)
+    if caretime is not None:
+        return caretime
     caretime_model = backend.database.models.Caretime
-    return db.execute(
+    caretime = db.execute(
         sqlalchemy.sql.select(
             from_obj=caretime_model,
             columns=caretime_model.__table__.columns).
         where(caretime_model.child_id == child_id, caretime_model.caretime_id == caretime_id)).first()
+    if caretime is not None:
+        cache.set(cache_key, caretime)
+    return caretime
 
 
 def create_caretime(db: sqlalchemy.orm.Session, caretime_entry: dict):
@@ -232,43 +676,258 @@ def create_caretime(db: sqlalchemy.orm.Session, caretime_entry: dict):
     :param caretime_entry:
     :return:
     """
-    db.execute(sqlalchemy.insert(backend.database.models.Caretime).values(**caretime_entry))
+    try:
+        db.execute(sqlalchemy.insert(backend.database.models.Caretime).values(**caretime_entry))
+    except sqlalchemy.exc.IntegrityError as error:
+        db.rollback()
+        if is_overlap_violation(error=error):
+            raise OverlappingCaretimeError(str(caretime_entry['caretime_id'])) from error
+        if is_inverted_violation(error=error):
+            raise InvalidCaretimeError(str(caretime_entry['caretime_id'])) from error
+        raise
     db.commit()
     return
 
 
-def edit_caretime(db: sqlalchemy.orm.Session, caretime_entry: dict):
+def fetch_caretime_intervals(db: sqlalchemy.orm.Session,
+                             start: datetime.datetime, end: datetime.datetime) -> typing.List[typing.Any]:
     """
+    Fetch start_time and stop_time of all caretimes overlapping [start, end) with a single query,
+    open caretimes have no stop_time.
 
     :param db:
-    :param caretime_entry:
+    :param start:
+    :param end:
     :return:
     """
     caretime_model = backend.database.models.Caretime
-    db.execute(
-        sqlalchemy.update(caretime_model).
-        where(caretime_model.child_id == caretime_entry['child_id'],
-              caretime_model.caretime_id == caretime_entry['caretime_id'],
-              ).
-        values(**caretime_entry))
+    result = db.execute(
+        sqlalchemy.sql.select(caretime_model.start_time, caretime_model.stop_time).
+        where(caretime_model.start_time < end,
+              sqlalchemy.or_(caretime_model.stop_time > start, caretime_model.stop_time.is_(None))))
+    return result.all()
+
+
+def fetch_overlapping_caretimes(db: sqlalchemy.orm.Session, start: datetime.datetime, end: datetime.datetime,
+                                child_id: typing.Optional[uuid.UUID] = None):
+    """
+    Fetch the caretimes overlapping [start, end], open caretimes overlap everything after their start.
+
+    :param db:
+    :param start:
+    :param end:
+    :param child_id: None for the caretimes of all children
+    :return:
+    """
+    caretime_model = backend.database.models.Caretime
+    statement = sqlalchemy.sql.select(
+        from_obj=caretime_model,
+        columns=caretime_model.__table__.columns).\
+        where(overlap_filter(start=start, end=end)).\
+        order_by(caretime_model.start_time, caretime_model.caretime_id)
+    if child_id is not None:
+        statement = statement.where(caretime_model.child_id == child_id)
+    return db.execute(statement).all()
+
+
+def fetch_checked_in_children(db: sqlalchemy.orm.Session):
+    """
+    Fetch the children with an open caretime, served by the partial index of the open caretimes.
+
+    :param db:
+    :return: the children with caretime_id and checked_in_at of their open caretime
+    """
+    child_model = backend.database.models.Child
+    caretime_model = backend.database.models.Caretime
+    return db.execute(
+        sqlalchemy.sql.select(*child_model.__table__.columns, caretime_model.caretime_id,
+                              caretime_model.start_time.label('checked_in_at')).
+        join(caretime_model, caretime_model.child_id == child_model.child_id).
+        where(caretime_model.stop_time.is_(None)).
+        order_by(caretime_model.start_time, child_model.child_id)).all()
+
+
+def fetch_caretimes_of_children(db: sqlalchemy.orm.Session,
+                                child_ids: typing.Collection[uuid.UUID]) -> typing.List[typing.Any]:
+    """
+    Fetch the caretimes of many children with a single query, ordered by child and start_time.
+
+    :param db:
+    :param child_ids:
+    :return:
+    """
+    caretime_model = backend.database.models.Caretime
+    child_ids_param = sqlalchemy.bindparam(
+        'child_ids', value=list(child_ids),
+        type_=sqlalchemy.dialects.postgresql.ARRAY(sqlalchemy.dialects.postgresql.UUID(as_uuid=True)))
+    result = db.execute(
+        sqlalchemy.sql.select(
+            from_obj=caretime_model,
+            columns=caretime_model.__table__.columns).
+        where(caretime_model.child_id == sqlalchemy.any_(child_ids_param)).
+        order_by(caretime_model.child_id, caretime_model.start_time, caretime_model.caretime_id))
+    return result.all()
+
+
+def fetch_existing_child_ids(db: sqlalchemy.orm.Session, child_ids: typing.Collection[uuid.UUID]) -> set[uuid.UUID]:
+    """
+    Return those of the child_ids, which belong to an existing child, with a single query.
+
+    :param db:
+    :param child_ids:
+    :return:
+    """
+    child_model = backend.database.models.Child
+    child_ids_param = sqlalchemy.bindparam(
+        'child_ids', value=list(child_ids),
+        type_=sqlalchemy.dialects.postgresql.ARRAY(sqlalchemy.dialects.postgresql.UUID(as_uuid=True)))
+    result = db.execute(sqlalchemy.sql.select(child_model.child_id).
+                        where(child_model.child_id == sqlalchemy.any_(child_ids_param)))
+    return set(result.scalars())
+
+
+def edit_caretime(db: sqlalchemy.orm.Session, caretime_entry: dict):
+    """
+    Update the caretime of the child in a single statement.
+
+    :param db:
+    :param caretime_entry: caretime_id, child_id and the values to update
+    :return: caretime_id, if the caretime of the child exists, else None
+    """
+    caretime_model = backend.database.models.Caretime
+    try:
+        result = db.execute(
+            sqlalchemy.update(caretime_model).
+            where(caretime_model.child_id == caretime_entry['child_id'],
+                  caretime_model.caretime_id == caretime_entry['caretime_id'],
+                  ).
+            values(**caretime_entry).
+            returning(caretime_model.caretime_id))
+    except sqlalchemy.exc.IntegrityError as error:
+        db.rollback()
+        if is_overlap_violation(error=error):
+            raise OverlappingCaretimeError(str(caretime_entry['caretime_id'])) from error
+        if is_inverted_violation(error=error):
+            raise InvalidCaretimeError(str(caretime_entry['caretime_id'])) from error
+        raise
+    updated_caretime_id = result.scalar_one_or_none()
     db.commit()
-    return
+    invalidate_caretime(child_id=caretime_entry['child_id'],
+                        caretime_id=caretime_entry['caretime_id'])
+    return updated_caretime_id
 
 
 def delete_caretime(db: sqlalchemy.orm.Session, caretime_id: uuid.UUID, child_id: uuid.UUID):
     """
+    Delete the caretime of the child in a single statement.
 
     :param db:
     :param caretime_id:
     :param child_id:
+    :return: caretime_id, if the caretime of the child existed, else None
+    """
+    caretime_model = backend.database.models.Caretime
+    result = db.execute(
+        sqlalchemy.delete(caretime_model).
+        where(caretime_model.caretime_id == caretime_id,
+              caretime_model.child_id == child_id,
+              ).
+        returning(caretime_model.caretime_id))
+    deleted_caretime_id = result.scalar_one_or_none()
+    db.commit()
+    invalidate_caretime(child_id=child_id, caretime_id=caretime_id)
+    return deleted_caretime_id
+
+
+def check_in_statement(child_id: uuid.UUID, start_time: typing.Optional[datetime.datetime] = None):
+    """
+    Insert statement of an open caretime, the exclusion constraint rejects it, if the child is already checked in.
+
+    :param child_id:
+    :param start_time: defaults to the time of the database
     :return:
     """
     caretime_model = backend.database.models.Caretime
-    db.execute(sqlalchemy.delete(
-        caretime_model).
-               where(
-        caretime_model.caretime_id == caretime_id,
-        caretime_model.child_id == child_id,
-    ))
+    return sqlalchemy.insert(caretime_model).\
+        values(caretime_id=uuid.uuid4(), child_id=child_id,
+               start_time=start_time if start_time is not None else sqlalchemy.func.localtimestamp()).\
+        returning(caretime_model.caretime_id, caretime_model.child_id, caretime_model.start_time)
+
+
+def check_out_statement(child_id: uuid.UUID, stop_time: typing.Optional[datetime.datetime] = None):
+    """
+    Update statement closing the open caretime of the child, served by the partial index of the open caretimes.
+
+    :param child_id:
+    :param stop_time: defaults to the time of the database
+    :return:
+    """
+    caretime_model = backend.database.models.Caretime
+    stop_time = stop_time if stop_time is not None else sqlalchemy.func.localtimestamp()
+    return sqlalchemy.update(caretime_model).\
+        where(caretime_model.child_id == child_id,
+              caretime_model.stop_time.is_(None),
+              caretime_model.start_time <= stop_time,
+              ).\
+        values(stop_time=stop_time).\
+        returning(caretime_model.caretime_id, caretime_model.child_id, caretime_model.start_time,
+                  caretime_model.stop_time)
+
+
+def open_caretime_statement(child_id: uuid.UUID):
+    """
+    Select statement of the open caretime of the child, served by the partial index of the open caretimes.
+
+    :param child_id:
+    :return:
+    """
+    caretime_model = backend.database.models.Caretime
+    return sqlalchemy.sql.select(caretime_model.caretime_id, caretime_model.start_time).\
+        where(caretime_model.child_id == child_id, caretime_model.stop_time.is_(None))
+
+
+def check_in(db: sqlalchemy.orm.Session, child_id: uuid.UUID, start_time: typing.Optional[datetime.datetime] = None):
+    """
+    Open a caretime of the child in a single statement.
+
+    :param db:
+    :param child_id:
+    :param start_time:
+    :return: caretime_id, child_id and start_time of the new caretime, None if the child does not exist
+    :raises AlreadyCheckedInError: if the child has an open caretime
+    :raises OverlappingCaretimeError: if the start_time is within a closed caretime of the child
+    """
+    try:
+        caretime = db.execute(check_in_statement(child_id=child_id, start_time=start_time)).one()
+    except sqlalchemy.exc.IntegrityError as error:
+        db.rollback()
+        if is_overlap_violation(error=error):
+            # the exclusion constraint does not tell, which caretime is overlapped
+            if db.execute(open_caretime_statement(child_id=child_id)).first() is not None:
+                raise AlreadyCheckedInError(str(child_id)) from error
+            raise OverlappingCaretimeError(str(child_id)) from error
+        if constraint_violation(error=error) == (FOREIGN_KEY_VIOLATION, CHILD_FOREIGN_KEY):
+            return None
+        raise
     db.commit()
-    return
+    return caretime
+
+
+def check_out(db: sqlalchemy.orm.Session, child_id: uuid.UUID, stop_time: typing.Optional[datetime.datetime] = None):
+    """
+    Close the open caretime of the child in a single statement.
+
+    :param db:
+    :param child_id:
+    :param stop_time:
+    :return: the closed caretime, None if the child is not checked in
+    :raises InvalidCaretimeError: if the stop_time is before the start of the open caretime
+    """
+    caretime = db.execute(check_out_statement(child_id=child_id, stop_time=stop_time)).one_or_none()
+    if caretime is None and db.execute(open_caretime_statement(child_id=child_id)).first() is not None:
+        db.rollback()
+        raise InvalidCaretimeError(str(child_id))
+    db.commit()
+    if caretime is not None:
+        invalidate_caretime(child_id=child_id, caretime_id=caretime.caretime_id)
+    return caretime
@@ -0,0 +1,124 @@
+import datetime
+import typing
+import uuid
+
+import sqlalchemy
+import sqlalchemy.orm
+
+import backend.database.models
+
+
+GRANULARITIES = ('day', 'week', 'month')
+# advisory lock serialising the refreshes of the rollup, concurrent callers skip the refresh
+ROLLUP_LOCK_ID = 20261018
+
+
+LOCK_STATEMENT = sqlalchemy.text('SELECT pg_try_advisory_xact_lock(:lock_id)').\
+    bindparams(lock_id=ROLLUP_LOCK_ID)
+
+CREATE_AFFECTED_STATEMENT = sqlalchemy.text(
+    'CREATE TEMPORARY TABLE care_days_affected (child_id uuid, day date, PRIMARY KEY (child_id, day)) '
+    'ON COMMIT DROP')
+
+# the days of inserted, updated and deleted caretimes are recorded by a trigger, claiming them deletes them,
+# so that days dirtied by transactions committing meanwhile are kept for the next refresh
+CLAIM_DIRTY_STATEMENT = sqlalchemy.text(
+    'WITH dirty AS (DELETE FROM care_days_dirty RETURNING child_id, day) '
+    'INSERT INTO care_days_affected SELECT DISTINCT child_id, day FROM dirty')
+
+CLEAR_STATEMENT = sqlalchemy.text(
+    'DELETE FROM care_days USING care_days_affected '
+    'WHERE care_days.child_id = care_days_affected.child_id AND care_days.day = care_days_affected.day')
+
+# the caretimes are clipped to the day, overlapping caretimes of a child are counted once: each piece only counts
+# from the latest stop_time of the pieces started before it
+ROLLUP_STATEMENT = sqlalchemy.text(
+    'WITH pieces AS ('
+    '    SELECT care_days_affected.child_id, care_days_affected.day, '
+    '           greatest(caretimes.start_time, care_days_affected.day) AS start_time, '
+    "           least(caretimes.stop_time, care_days_affected.day + interval '1 day') AS stop_time "
+    '    FROM care_days_affected '
+    '    JOIN caretimes ON caretimes.child_id = care_days_affected.child_id '
+    "        AND caretimes.start_time < care_days_affected.day + interval '1 day' "
+    '        AND caretimes.stop_time > care_days_affected.day '
+    '        AND caretimes.stop_time > caretimes.start_time'
+    '), covered AS ('
+    '    SELECT child_id, day, stop_time, '
+    '           greatest(start_time, max(stop_time) OVER (PARTITION BY child_id, day ORDER BY start_time, stop_time '
+    '                    ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING)) AS start_time '
+    '    FROM pieces'
+    ') '
+    'INSERT INTO care_days (child_id, day, care_seconds) '
+    'SELECT child_id, day, round(sum(greatest(extract(epoch FROM stop_time - start_time), 0)))::integer '
+    'FROM covered '
+    'GROUP BY child_id, day')
+
+REFRESH_STATEMENTS = (CREATE_AFFECTED_STATEMENT,
+                      CLAIM_DIRTY_STATEMENT,
+                      CLEAR_STATEMENT,
+                      ROLLUP_STATEMENT)
+
+
+def summary_statement(granularity: str = 'month', child_id: typing.Optional[uuid.UUID] = None,
+                      start: typing.Optional[datetime.date] = None, end: typing.Optional[datetime.date] = None):
+    """
+    Care seconds and hours per period, of one child or of the whole facility.
+
+    :param granularity: one of GRANULARITIES
+    :param child_id: None for the whole facility, which adds the number of children cared for in the period
+    :param start: first day included
+    :param end: first day excluded
+    :return:
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f'granularity must be one of {", ".join(GRANULARITIES)}')
+    care_day_model = backend.database.models.CareDay
+    # rendered inline, a bound granularity is a different parameter in the select list and in the group by
+    period = sqlalchemy.cast(sqlalchemy.func.date_trunc(sqlalchemy.literal_column(f"'{granularity}'"),
+                                                        care_day_model.day), sqlalchemy.Date())
+    care_seconds = sqlalchemy.func.sum(care_day_model.care_seconds)
+    columns = [period.label('period'),
+               care_seconds.label('care_seconds'),
+               sqlalchemy.func.round(care_seconds / sqlalchemy.literal_column('3600.0'), 2).label('care_hours'),
+               sqlalchemy.func.count().label('care_days')]
+    if child_id is None:
+        columns.append(sqlalchemy.func.count(sqlalchemy.distinct(care_day_model.child_id)).label('children'))
+    statement = sqlalchemy.sql.select(columns).select_from(care_day_model)
+    if child_id is not None:
+        statement = statement.where(care_day_model.child_id == child_id)
+    if start is not None:
+        statement = statement.where(care_day_model.day >= start)
+    if end is not None:
+        statement = statement.where(care_day_model.day < end)
+    return statement.group_by(period).order_by(period)
+
+
+def refresh_care_days(db: sqlalchemy.orm.Session) -> bool:
+    """
+    Bring the rollup up to date with the caretimes, only the days of changed caretimes are recomputed.
+
+    :param db:
+    :return: False, if the rollup is refreshed by another transaction right now
+    """
+    if not db.execute(LOCK_STATEMENT).scalar():
+        db.rollback()
+        return False
+    for statement in REFRESH_STATEMENTS:
+        db.execute(statement)
+    db.commit()
+    return True
+
+
+def fetch_care_summary(db: sqlalchemy.orm.Session, granularity: str = 'month',
+                       child_id: typing.Optional[uuid.UUID] = None,
+                       start: typing.Optional[datetime.date] = None, end: typing.Optional[datetime.date] = None):
+    """
+
+    :param db:
+    :param granularity:
+    :param child_id:
+    :param start:
+    :param end:
+    :return:
+    """
+    return db.execute(summary_statement(granularity=granularity, child_id=child_id, start=start, end=end)).all()
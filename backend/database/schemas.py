@@ -29,6 +29,11 @@ class Child(ChildIdentification, ChildBase):
         orm_mode = True
 
 
+class CheckedInChild(Child):
+    caretime_id: uuid.UUID
+    checked_in_at: datetime.datetime
+
+
 class ChildUpdate(pydantic.BaseModel):
     name: typing.Optional[str] = pydantic.Field(None)
     sur_name: typing.Optional[str] = pydantic.Field(None)
@@ -47,6 +52,18 @@ class CaretimeBase(pydantic.BaseModel):
     start_time: typing.Optional[datetime.datetime] = pydantic.Field(None)
     stop_time: typing.Optional[datetime.datetime] = pydantic.Field(None)
 
+    @pydantic.root_validator()
+    def is_stop_time_not_before_start_time(cls, values):
+        """the stop_time must not be before the start_time"""
+        start_time, stop_time = values.get('start_time'), values.get('stop_time')
+        if start_time is not None and stop_time is not None and stop_time < start_time:
+            raise ValueError('stop_time must not be before start_time')
+        return values
+
+
+class CaretimeCreate(CaretimeBase):
+    start_time: datetime.datetime
+
 
 class Caretime(CaretimeBase):
     caretime_id: uuid.UUID
@@ -56,3 +73,50 @@ class Caretime(CaretimeBase):
 
     class Config:
         orm_mode = True
+
+
+class CheckIn(pydantic.BaseModel):
+    caretime_id: uuid.UUID
+    child_id: uuid.UUID
+    start_time: datetime.datetime
+
+    class Config:
+        orm_mode = True
+
+
+class CheckOut(CheckIn):
+    stop_time: datetime.datetime
+
+
+class Presence(pydantic.BaseModel):
+    child_id: uuid.UUID
+    caretime_id: uuid.UUID
+    checked_in_at: datetime.datetime
+
+
+class CaretimeEntry(CaretimeCreate):
+    child_id: uuid.UUID
+
+
+class CaretimeBulkError(pydantic.BaseModel):
+    index: int
+    error: str
+
+
+class CaretimeBulkResult(pydantic.BaseModel):
+    inserted: int
+    errors: typing.List[CaretimeBulkError]
+
+
+class CareSummary(pydantic.BaseModel):
+    period: datetime.date
+    care_seconds: int
+    care_hours: float
+    care_days: int
+
+    class Config:
+        orm_mode = True
+
+
+class FacilityCareSummary(CareSummary):
+    children: int
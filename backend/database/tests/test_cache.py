@@ -0,0 +1,45 @@
+import pytest
+
+import backend.database.cache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('backend.database.cache.time.monotonic', lambda: now[0])
+    return now
+
+
+def test_ttl_cache_expiry(clock):
+    cache = backend.database.cache.TTLCache(maxsize=2, ttl=10)
+    cache.set('key', 'value')
+
+    clock[0] += 9
+    assert cache.get('key') == 'value'
+    clock[0] += 1
+    assert cache.get('key') is None
+    assert len(cache) == 0
+
+
+def test_ttl_cache_lru_eviction(clock):
+    cache = backend.database.cache.TTLCache(maxsize=2, ttl=10)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+
+
+def test_ttl_cache_delete_prefix(clock):
+    cache = backend.database.cache.TTLCache()
+    cache.set('user_a:1', 1)
+    cache.set('user_a:2', 2)
+    cache.set('user_b:1', 3)
+
+    cache.delete_prefix('user_a:')
+
+    assert len(cache) == 1
+    assert cache.get('user_b:1') == 3
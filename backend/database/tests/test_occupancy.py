@@ -0,0 +1,81 @@
+import datetime
+
+import numpy
+import pytest
+
+import backend.database.occupancy
+
+
+def naive_occupancy(intervals, start, end, slot):
+    """Row by row reference of present at the slot starts."""
+    slot_starts = []
+    while start < end:
+        slot_starts.append(start)
+        start += slot
+    return [sum(1 for interval_start, interval_stop in intervals if interval_start <= slot_start < interval_stop)
+            for slot_start in slot_starts]
+
+
+def compute(intervals, start, end, slot):
+    return backend.database.occupancy.compute_occupancy(
+        starts=backend.database.occupancy.to_datetime64([interval[0] for interval in intervals], default=start),
+        stops=backend.database.occupancy.to_datetime64([interval[1] for interval in intervals], default=end),
+        start=start, end=end, slot=slot)
+
+
+def test_occupancy_present_and_peak():
+    day = datetime.datetime(2023, 7, 24)
+    intervals = [(day + datetime.timedelta(hours=7), day + datetime.timedelta(hours=8)),
+                 (day + datetime.timedelta(hours=7, minutes=20), day + datetime.timedelta(hours=7, minutes=25)),
+                 # back to back, never two at once
+                 (day + datetime.timedelta(hours=8), day + datetime.timedelta(hours=9)),
+                 # started the day before
+                 (day - datetime.timedelta(hours=1), day + datetime.timedelta(minutes=10)),
+                 # open caretime
+                 (day + datetime.timedelta(hours=10), None)]
+
+    occupancy = compute(intervals, start=day, end=day + datetime.timedelta(hours=11),
+                        slot=datetime.timedelta(minutes=15))
+    by_start = {record['start']: record for record in occupancy.records()}
+
+    assert len(occupancy.slot_starts) == 44
+    assert by_start[day] == {'start': day, 'present': 1, 'peak': 1}
+    assert by_start[day + datetime.timedelta(minutes=15)]['present'] == 0
+    assert by_start[day + datetime.timedelta(hours=7, minutes=15)] == \
+        {'start': day + datetime.timedelta(hours=7, minutes=15), 'present': 1, 'peak': 2}
+    assert by_start[day + datetime.timedelta(hours=7, minutes=45)]['peak'] == 1
+    assert by_start[day + datetime.timedelta(hours=8)]['present'] == 1
+    assert by_start[day + datetime.timedelta(hours=10, minutes=45)]['present'] == 1
+
+
+def test_occupancy_matches_row_by_row():
+    rng = numpy.random.default_rng(seed=7)
+    start = datetime.datetime(2023, 1, 1)
+    offsets = rng.integers(0, 3 * 24 * 60, size=(500, 2))
+    intervals = [(start + datetime.timedelta(minutes=int(min(offset))),
+                  start + datetime.timedelta(minutes=int(max(offset)))) for offset in offsets]
+    end = start + datetime.timedelta(days=3)
+    slot = datetime.timedelta(minutes=15)
+
+    occupancy = compute(intervals, start=start, end=end, slot=slot)
+
+    assert occupancy.present.tolist() == naive_occupancy(intervals, start=start, end=end, slot=slot)
+    assert (occupancy.peak >= occupancy.present).all()
+
+
+def test_occupancy_without_intervals():
+    start = datetime.datetime(2023, 1, 1)
+
+    occupancy = compute([], start=start, end=start + datetime.timedelta(hours=1), slot=datetime.timedelta(minutes=20))
+
+    assert occupancy.present.tolist() == [0, 0, 0]
+    assert occupancy.peak.tolist() == [0, 0, 0]
+
+
+def test_occupancy_limits():
+    start = datetime.datetime(2023, 1, 1)
+
+    with pytest.raises(ValueError):
+        compute([], start=start, end=start, slot=datetime.timedelta(minutes=15))
+    with pytest.raises(ValueError):
+        compute([], start=start, end=start + datetime.timedelta(days=3650), slot=datetime.timedelta(minutes=1))
@@ -0,0 +1,308 @@
+import datetime
+import sqlite3
+import unittest.mock
+import uuid
+
+import asyncpg
+import pytest
+import sqlalchemy.dialects.postgresql
+import sqlalchemy.exc
+
+import backend.database.cache
+import backend.database.models
+import backend.database.queries_v2
+
+
+@pytest.fixture
+def db_config():
+    return {'username': 'test_user', 'password': 'secret', 'host': 'localhost', 'port': '5432',
+            'database': 'test_db'}
+
+
+@pytest.fixture(autouse=True)
+def empty_engine_registry(monkeypatch):
+    monkeypatch.setattr('backend.database.queries_v2._engines', dict())
+
+
+# Testing of the engine registry
+def test_get_engine_is_cached(db_config):
+    engine = backend.database.queries_v2.get_engine(db_config=db_config)
+
+    assert backend.database.queries_v2.get_engine(db_config=dict(db_config)) is engine
+    assert isinstance(engine.pool, backend.database.queries_v2.TimedQueuePool)
+    assert 'drivername' not in db_config
+
+
+def test_get_engine_per_config(db_config):
+    engine = backend.database.queries_v2.get_engine(db_config=db_config)
+    other_engine = backend.database.queries_v2.get_engine(db_config={**db_config, 'database': 'other_db'})
+
+    assert other_engine is not engine
+    assert [entry['database'] for entry in backend.database.queries_v2.get_pool_statistics()] == \
+        ['test_db', 'other_db']
+
+
+def test_create_engine_pool_config(monkeypatch, db_config):
+    monkeypatch.setenv('DB_POOL_SIZE', '3')
+    monkeypatch.setenv('DB_POOL_MAX_OVERFLOW', '1')
+
+    engine = backend.database.queries_v2.get_engine(db_config=db_config)
+
+    assert engine.pool.size() == 3
+    assert engine.pool._max_overflow == 1
+
+
+def test_timed_queue_pool_statistics():
+    pool = backend.database.queries_v2.TimedQueuePool(creator=lambda: sqlite3.connect(':memory:'),
+                                                      pool_size=2, max_overflow=0)
+
+    connection = pool.connect()
+    statistics = pool.statistics()
+    connection.close()
+
+    assert statistics['checkouts'] == 1
+    assert statistics['checked_out'] == 1
+    assert statistics['checkout_wait_max'] >= statistics['checkout_wait_avg'] > 0
+    assert pool.statistics()['checked_in'] == 1
+
+
+# Testing of keyset pagination
+def test_fetch_children_keyset():
+    db = unittest.mock.MagicMock()
+    after = (datetime.datetime(2023, 7, 24, 18), uuid.UUID('7d90a67b-282b-431f-b090-8f3f0cf78eb3'))
+
+    backend.database.queries_v2.fetch_children(db=db, limit=5, after=after)
+
+    statement = db.execute.call_args.args[0].compile(dialect=sqlalchemy.dialects.postgresql.dialect())
+    assert 'WHERE (children.created_at, children.child_id) > (%(param_1)s, %(param_2)s) ' in str(statement)
+    assert 'ORDER BY children.created_at, children.child_id' in str(statement)
+
+
+def test_fetch_caretimes_keyset():
+    db = unittest.mock.MagicMock()
+    after = (datetime.datetime(2023, 7, 24, 8), uuid.UUID('7d90a67b-282b-431f-b090-8f3f0cf78eb3'))
+
+    backend.database.queries_v2.fetch_caretimes(db=db, child_id=uuid.uuid4(), limit=5, after=after)
+
+    statement = db.execute.call_args.args[0].compile(dialect=sqlalchemy.dialects.postgresql.dialect())
+    assert '(caretimes.start_time, caretimes.caretime_id) > (%(param_1)s, %(param_2)s)' in str(statement)
+    assert 'IS NULL' not in str(statement)
+
+
+def test_keyset_filter_descending():
+    child_model = backend.database.models.Child
+    child_id = uuid.UUID('7d90a67b-282b-431f-b090-8f3f0cf78eb3')
+
+    condition = backend.database.queries_v2.keyset_filter(child_model.name, child_model.child_id, ('Anna', child_id),
+                                                          descending=True)
+
+    assert str(condition) == '(children.name, children.child_id) < (:param_1, :param_2)'
+
+
+# Testing of filtering and sorting of the children
+def test_fetch_children_filters():
+    db = unittest.mock.MagicMock()
+
+    backend.database.queries_v2.fetch_children(db=db, recent=True, limit=5, recent_days=7, name_prefix='An_',
+                                               birth_day_from=datetime.date(2020, 1, 1), sort='birth_day',
+                                               descending=True)
+
+    statement = db.execute.call_args.args[0].compile(dialect=sqlalchemy.dialects.postgresql.dialect())
+    assert 'children.created_at >= LOCALTIMESTAMP - %(localtimestamp_1)s' in str(statement)
+    assert "lower(children.name) LIKE %(lower_1)s ESCAPE '\\\\'" in str(statement)
+    assert 'sur_name) LIKE' not in str(statement)
+    assert 'children.birth_day >= %(birth_day_1)s' in str(statement)
+    assert 'ORDER BY children.birth_day DESC, children.child_id DESC' in str(statement)
+    assert statement.params['localtimestamp_1'] == datetime.timedelta(days=7)
+    assert statement.params['lower_1'] == 'an\\_%'
+
+
+def test_fetch_children_sort_whitelist():
+    with pytest.raises(ValueError):
+        backend.database.queries_v2.fetch_children(db=unittest.mock.MagicMock(), sort='hashed_password')
+
+
+# Testing of single-statement mutations
+def test_delete_caretime_returning():
+    db = unittest.mock.MagicMock()
+    db.execute.return_value.scalar_one_or_none.return_value = None
+
+    result = backend.database.queries_v2.delete_caretime(db=db, caretime_id=uuid.uuid4(), child_id=uuid.uuid4())
+
+    statement = db.execute.call_args.args[0].compile(dialect=sqlalchemy.dialects.postgresql.dialect())
+    assert str(statement).startswith('DELETE FROM caretimes WHERE caretimes.caretime_id = ')
+    assert str(statement).endswith('RETURNING caretimes.caretime_id')
+    assert result is None
+    db.commit.assert_called_once()
+
+
+# Testing of the query cache
+@pytest.fixture
+def query_cache(monkeypatch):
+    cache = backend.database.cache.TTLCache()
+    monkeypatch.setattr(backend.database.cache, '_query_cache', cache)
+    return cache
+
+
+def test_fetch_child_read_through(query_cache):
+    db = unittest.mock.MagicMock()
+    child_id = uuid.uuid4()
+
+    first = backend.database.queries_v2.fetch_child(db=db, child_id=child_id)
+    second = backend.database.queries_v2.fetch_child(db=db, child_id=str(child_id))
+
+    assert first is second
+    assert db.execute.call_count == 1
+
+    backend.database.queries_v2.update_child(db=db, child_id=child_id, updates_for_child={'name': 'Anna'})
+    backend.database.queries_v2.fetch_child(db=db, child_id=child_id)
+
+    assert db.execute.call_count == 3
+
+
+def test_fetch_child_misses_are_not_cached(query_cache):
+    db = unittest.mock.MagicMock()
+    db.execute.return_value.first.return_value = None
+
+    backend.database.queries_v2.fetch_child(db=db, child_id=uuid.uuid4())
+
+    assert len(query_cache) == 0
+
+
+def test_delete_child_invalidates_caretimes(query_cache):
+    db = unittest.mock.MagicMock()
+    child_id, other_child_id = uuid.uuid4(), uuid.uuid4()
+    for caretime_id in (uuid.uuid4(), uuid.uuid4()):
+        backend.database.queries_v2.fetch_single_caretime(db=db, caretime_id=caretime_id, child_id=child_id)
+    backend.database.queries_v2.fetch_single_caretime(db=db, caretime_id=uuid.uuid4(), child_id=other_child_id)
+    backend.database.queries_v2.fetch_child(db=db, child_id=child_id)
+    assert len(query_cache) == 4
+
+    backend.database.queries_v2.delete_child(db=db, child_id=child_id)
+
+    assert len(query_cache) == 1
+
+
+# Testing of overlapping caretimes
+def psycopg2_error(pgcode: str, constraint_name: str):
+    return unittest.mock.Mock(pgcode=pgcode, diag=unittest.mock.Mock(constraint_name=constraint_name))
+
+
+def test_is_overlap_violation():
+    asyncpg_error = asyncpg.ExclusionViolationError('conflicting key value violates exclusion constraint')
+    asyncpg_error.constraint_name = 'ex_caretimes_child_id_period'
+    adapted_error = Exception('asyncpg error')
+    adapted_error.__cause__ = asyncpg_error
+    message_only = Exception('conflicting key value violates exclusion constraint "ex_caretimes_child_id_period"')
+
+    assert backend.database.queries_v2.is_overlap_violation(error=asyncpg_error)
+    assert backend.database.queries_v2.is_overlap_violation(
+        error=sqlalchemy.exc.IntegrityError('INSERT', {}, adapted_error))
+    assert not backend.database.queries_v2.is_overlap_violation(
+        error=sqlalchemy.exc.IntegrityError('INSERT', {}, message_only))
+    assert not backend.database.queries_v2.is_overlap_violation(
+        error=sqlalchemy.exc.IntegrityError('INSERT', {}, psycopg2_error(pgcode='23505',
+                                                                         constraint_name='caretimes_pkey')))
+
+
+def test_fetch_overlapping_caretimes_uses_indexed_range():
+    db = unittest.mock.MagicMock()
+
+    backend.database.queries_v2.fetch_overlapping_caretimes(db=db, start=datetime.datetime(2023, 7, 24, 7),
+                                                            end=datetime.datetime(2023, 7, 24, 9))
+
+    statement = db.execute.call_args.args[0].compile(dialect=sqlalchemy.dialects.postgresql.dialect())
+    assert "tsrange(caretimes.start_time, coalesce(caretimes.stop_time, 'infinity'), '[)') && " \
+           "tsrange(%(tsrange_1)s, %(tsrange_2)s, '[]')" in str(statement)
+
+
+def test_caretime_violation_message():
+    overlap = sqlalchemy.exc.IntegrityError(
+        'INSERT', {}, psycopg2_error(pgcode='23P01', constraint_name='ex_caretimes_child_id_period'))
+    duplicate = sqlalchemy.exc.IntegrityError(
+        'INSERT', {}, psycopg2_error(pgcode='23505', constraint_name='caretimes_pkey'))
+
+    assert backend.database.queries_v2.caretime_violation_message(error=overlap) == \
+        'Caretime overlaps another caretime of the child'
+    assert backend.database.queries_v2.caretime_violation_message(error=duplicate) is None
+
+
+def test_create_overlapping_caretime():
+    db = unittest.mock.MagicMock()
+    db.execute.side_effect = sqlalchemy.exc.IntegrityError(
+        'INSERT', {}, psycopg2_error(pgcode='23P01', constraint_name='ex_caretimes_child_id_period'))
+
+    with pytest.raises(backend.database.queries_v2.OverlappingCaretimeError):
+        backend.database.queries_v2.create_caretime(db=db, caretime_entry={'caretime_id': uuid.uuid4()})
+
+    db.rollback.assert_called_once()
+    db.commit.assert_not_called()
+
+
+def test_create_caretime_other_integrity_error():
+    db = unittest.mock.MagicMock()
+    db.execute.side_effect = sqlalchemy.exc.IntegrityError(
+        'INSERT', {}, psycopg2_error(pgcode='23503', constraint_name='fk_caretimes_child_id_children'))
+
+    with pytest.raises(sqlalchemy.exc.IntegrityError):
+        backend.database.queries_v2.create_caretime(db=db, caretime_entry={'caretime_id': uuid.uuid4()})
+
+
+def test_edit_inverted_caretime():
+    db = unittest.mock.MagicMock()
+    db.execute.side_effect = sqlalchemy.exc.IntegrityError(
+        'UPDATE', {}, psycopg2_error(pgcode='23514', constraint_name='ck_caretimes_stop_time_after_start_time'))
+
+    with pytest.raises(backend.database.queries_v2.InvalidCaretimeError):
+        backend.database.queries_v2.edit_caretime(db=db, caretime_entry={'caretime_id': uuid.uuid4(),
+                                                                         'child_id': uuid.uuid4(),
+                                                                         'stop_time': datetime.datetime(2023, 7, 24)})
+
+    db.rollback.assert_called_once()
+
+
+# Testing of check-in and check-out
+def test_check_in_unknown_child():
+    db = unittest.mock.MagicMock()
+    db.execute.side_effect = sqlalchemy.exc.IntegrityError(
+        'INSERT', {}, psycopg2_error(pgcode='23503', constraint_name='fk_caretimes_child_id_children'))
+
+    assert backend.database.queries_v2.check_in(db=db, child_id=uuid.uuid4()) is None
+    db.rollback.assert_called_once()
+
+
+@pytest.mark.parametrize('open_caretime, expected_error', [
+    ((uuid.uuid4(), datetime.datetime(2023, 7, 24, 7)), backend.database.queries_v2.AlreadyCheckedInError),
+    (None, backend.database.queries_v2.OverlappingCaretimeError),
+])
+def test_check_in_overlapping(open_caretime, expected_error):
+    db = unittest.mock.MagicMock()
+    db.execute.side_effect = [sqlalchemy.exc.IntegrityError(
+        'INSERT', {}, psycopg2_error(pgcode='23P01', constraint_name='ex_caretimes_child_id_period')),
+        unittest.mock.Mock(first=unittest.mock.Mock(return_value=open_caretime))]
+
+    with pytest.raises(expected_error) as error_info:
+        backend.database.queries_v2.check_in(db=db, child_id=uuid.uuid4(), start_time=datetime.datetime(2023, 7, 24, 8))
+
+    assert (error_info.type is backend.database.queries_v2.AlreadyCheckedInError) == (open_caretime is not None)
+    db.rollback.assert_called_once()
+    db.commit.assert_not_called()
+
+
+def test_check_out_before_check_in():
+    db = unittest.mock.MagicMock()
+    db.execute.return_value.one_or_none.return_value = None
+    db.execute.return_value.first.return_value = (uuid.uuid4(), datetime.datetime(2023, 7, 24, 9))
+
+    with pytest.raises(backend.database.queries_v2.InvalidCaretimeError):
+        backend.database.queries_v2.check_out(db=db, child_id=uuid.uuid4(), stop_time=datetime.datetime(2023, 7, 24, 8))
+
+    db.commit.assert_not_called()
+
+
+def test_check_out_not_checked_in():
+    db = unittest.mock.MagicMock()
+    db.execute.return_value.one_or_none.return_value = None
+    db.execute.return_value.first.return_value = None
+
+    assert backend.database.queries_v2.check_out(db=db, child_id=uuid.uuid4()) is None
@@ -0,0 +1,49 @@
+import types
+import unittest.mock
+
+import pytest
+
+import backend.database.cache
+import backend.database.usermanagement
+
+
+@pytest.fixture
+def stored_user(monkeypatch):
+    monkeypatch.setattr('backend.database.usermanagement._authentication_cache',
+                        backend.database.cache.TTLCache())
+    pw_hash, salt = backend.database.usermanagement.hash_password(password='secret')
+    user = types.SimpleNamespace(user_name='test_user', salt=salt, hashed_password=pw_hash, role='admin')
+    fetch_user = unittest.mock.MagicMock(return_value=user)
+    monkeypatch.setattr('backend.database.queries_v2.fetch_user', fetch_user)
+    monkeypatch.setattr('backend.database.queries_v2.edit_user', unittest.mock.MagicMock())
+    return fetch_user
+
+
+def test_authenticate_user_is_cached(stored_user):
+    for _ in range(3):
+        authenticated, role = backend.database.usermanagement.authenticate_user(db=None, user_name='test_user',
+                                                                                password='secret')
+        assert (authenticated, role) == (True, 'admin')
+
+    assert stored_user.call_count == 1
+
+
+def test_authenticate_user_wrong_password_not_cached(stored_user):
+    for _ in range(2):
+        authenticated, role = backend.database.usermanagement.authenticate_user(db=None, user_name='test_user',
+                                                                                password='wrong')
+        assert (authenticated, role) == (False, None)
+
+    assert stored_user.call_count == 2
+
+
+@pytest.mark.parametrize('reset', [
+    lambda: backend.database.usermanagement.reset_password(db=None, user_name='test_user', password='new'),
+    lambda: backend.database.usermanagement.reset_role(db=None, user_name='test_user', role='user'),
+])
+def test_reset_invalidates_cache(stored_user, reset):
+    backend.database.usermanagement.authenticate_user(db=None, user_name='test_user', password='secret')
+    reset()
+    backend.database.usermanagement.authenticate_user(db=None, user_name='test_user', password='secret')
+
+    assert stored_user.call_count == 2
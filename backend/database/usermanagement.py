@@ -1,14 +1,61 @@
 import base64
 import hashlib
+import os
 import secrets
 import string
 import typing
 
+import dotenv
 import sqlalchemy.orm
 
+import backend.database.cache
 import backend.database.queries_v2
 
 
+_authentication_cache: typing.Optional[backend.database.cache.TTLCache] = None
+_authentication_cache_key = secrets.token_bytes(32)
+
+
+def get_authentication_cache() -> backend.database.cache.TTLCache:
+    """
+    Return the cache of successful authentications, creating it on first use.
+
+    Only successful authentications are cached. The cache is local to the process,
+    so a password or role change made by another process is picked up after the TTL.
+
+    :return:
+    """
+    global _authentication_cache
+    if _authentication_cache is None:
+        dotenv.load_dotenv()
+        _authentication_cache = backend.database.cache.TTLCache(
+            maxsize=int(os.environ.get('AUTH_CACHE_SIZE', 1024)),
+            ttl=float(os.environ.get('AUTH_CACHE_TTL', 60)))
+    return _authentication_cache
+
+
+def authentication_cache_key(user_name: str, password: str) -> str:
+    """
+    Key of the authentication cache, the password is only stored as keyed hash.
+
+    :param user_name:
+    :param password:
+    :return:
+    """
+    digest = hashlib.blake2b(bytes(f'{user_name}\x00{password}', 'utf8'), key=_authentication_cache_key).hexdigest()
+    return f'{user_name}:{digest}'
+
+
+def invalidate_authentication_cache(user_name: str) -> None:
+    """
+    Remove all cached authentications of the user.
+
+    :param user_name:
+    :return:
+    """
+    get_authentication_cache().delete_prefix(f'{user_name}:')
+
+
 def hash_password(password: str) -> typing.Tuple[str, str]:
     """
 
@@ -61,6 +108,7 @@ def reset_password(db: sqlalchemy.orm.Session, user_name: str, password: str) ->
     new_values['hashed_password'] = pw_hash
 
     backend.database.queries_v2.edit_user(db=db, user_name=user_name, new_values=new_values)
+    invalidate_authentication_cache(user_name=user_name)
 
 
 def reset_role(db: sqlalchemy.orm.Session, user_name: str, role: str) -> None:
@@ -76,12 +124,14 @@ def reset_role(db: sqlalchemy.orm.Session, user_name: str, role: str) -> None:
     new_values['role'] = role
 
     backend.database.queries_v2.edit_user(db=db, user_name=user_name, new_values=new_values)
+    invalidate_authentication_cache(user_name=user_name)
 
 
 def authenticate_user(db: sqlalchemy.orm.Session, user_name: str, password: str) \
         -> typing.Tuple[bool, typing.Optional[str]]:
     """
     Authenticate the user using the password and the role.
+    Successful authentications are served from the authentication cache until they expire.
 
     :param db: DB session
     :param user_name: name of the user to be authenticated
@@ -89,6 +139,11 @@ def authenticate_user(db: sqlalchemy.orm.Session, user_name: str, password: str)
     :return:  boolean flag, if the user is successfully authenticated or not.
     """
 
+    cache_key = authentication_cache_key(user_name=user_name, password=password)
+    cached = get_authentication_cache().get(cache_key)
+    if cached is not None:
+        return cached
+
     user = backend.database.queries_v2.fetch_user(db=db, user_name=user_name)
     if not user:
         return False, None
@@ -98,4 +153,6 @@ def authenticate_user(db: sqlalchemy.orm.Session, user_name: str, password: str)
 
     authenticated = secrets.compare_digest(pw_hash, user.hashed_password)
     role = user.role if authenticated else None
+    if authenticated:
+        get_authentication_cache().set(cache_key, (authenticated, role))
     return authenticated, role